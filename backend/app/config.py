@@ -6,6 +6,7 @@ class Settings(BaseSettings):
     BASE_DIR: Path = Path(__file__).resolve().parent.parent
     DOCS_PATH: Path = BASE_DIR.parent / "docs"
     STORAGE_PATH: Path = BASE_DIR / "storage"
+    UPLOAD_PATH: Path = BASE_DIR / "uploads"
 
     # Chunking
     CHUNK_SIZE: int = 500
@@ -14,6 +15,124 @@ class Settings(BaseSettings):
     # Embeddings
     EMBEDDING_MODEL: str = "gemini-embedding-001"
     EMBEDDING_DIMENSION: int = 3072  # Gemini embedding-001 dimension
+    EMBEDDING_BACKEND: str = "gemini"  # "gemini" or "fake" (deterministic, offline)
+    EMBEDDING_BATCH_SIZE: int = 100  # Texts per embed_content call
+    EMBEDDING_MAX_CONCURRENCY: int = 4  # Batches in flight at once
+    EMBEDDING_CACHE_ENABLED: bool = True
+    EMBEDDING_CACHE_MAX_ENTRIES: int = 200_000  # ~2.4 GB at 3072 float32 dims
+
+    # Vector index
+    VECTOR_INDEX_TYPE: str = "flat"  # "flat", "ivf_flat", "ivf_pq" or "hnsw"
+    IVF_NLIST: int = 256  # Inverted lists; trained once 39 * nlist vectors exist
+    IVF_NPROBE: int = 16  # Default lists scanned per query
+    IVF_PQ_M: int = 64  # Sub-quantizers for IVF-PQ (rounded to a divisor of the dimension)
+    HNSW_M: int = 32
+    HNSW_EF_CONSTRUCTION: int = 40
+    HNSW_EF_SEARCH: int = 64  # Default candidate list size per query
+
+    # Storage size per vector: EMBEDDING_OUTPUT_DIMENSION (0 = full
+    # EMBEDDING_DIMENSION) is requested from the model, or the vectors are
+    # truncated and renormalized; VECTOR_QUANTIZATION is "none", "fp16" or "int8"
+    EMBEDDING_OUTPUT_DIMENSION: int = 0
+    VECTOR_QUANTIZATION: str = "none"
+
+    # Vector store persistence: the WAL is compacted into the snapshot once it
+    # holds max(MIN_ROWS, RATIO * snapshot rows), keeping saves O(batch) amortized.
+    # Deleted chunks are tombstoned and purged by a compaction once they reach
+    # TOMBSTONE_RATIO of the index
+    VECTOR_STORE_COMPACT_MIN_ROWS: int = 2000
+    VECTOR_STORE_COMPACT_RATIO: float = 0.5
+    VECTOR_STORE_TOMBSTONE_RATIO: float = 0.2
+
+    # Named collections: each has its own index, metadata and dedup state in
+    # STORAGE_PATH/collections/<name> (DEFAULT_COLLECTION keeps the top-level
+    # files). Collections are opened on first use; once the open ones are
+    # estimated above the budget, the least recently used idle ones are closed
+    DEFAULT_COLLECTION: str = "default"
+    COLLECTIONS_MEMORY_BUDGET_MB: int = 4096
+
+    # Request path concurrency: max in-flight operations per stage across all
+    # requests, and the thread pool size for blocking work
+    STAGE_LIMIT_EMBED: int = 8
+    STAGE_LIMIT_SEARCH: int = 4
+    STAGE_LIMIT_LLM: int = 16
+    STAGE_LIMIT_INGEST: int = 2
+    BLOCKING_POOL_WORKERS: int = 16
+
+    # Semantic quiz cache: topics whose embeddings are at least this cosine-similar
+    # (with the same num_questions / use_rag) reuse a previous quiz
+    QUIZ_CACHE_ENABLED: bool = True
+    QUIZ_CACHE_SIMILARITY: float = 0.92
+    QUIZ_CACHE_TTL_SECONDS: float = 3600
+    QUIZ_CACHE_MAX_ENTRIES: int = 1000
+
+    # Concurrent identical embedding (per text) and generation (per prompt)
+    # calls share one upstream call; the other callers wait for its result
+    COALESCE_REQUESTS: bool = True
+
+    # Background ingestion jobs: chunks per embed/index batch (the resume
+    # checkpoint granularity) and the bound on each inter-stage queue
+    INGEST_BATCH_SIZE: int = 256
+    INGEST_QUEUE_SIZE: int = 4
+
+    # Parallel parsing: worker processes for text extraction (0 = one per CPU)
+    # and how many pages of a large PDF each task extracts
+    INGEST_WORKERS: int = 0
+    PDF_PAGES_PER_TASK: int = 16
+
+    # Near-duplicate chunks (MinHash estimated Jaccard >= threshold) are not
+    # embedded or indexed: "skip" drops them, "link" records the chunk they copy
+    DEDUP_ENABLED: bool = True
+    DEDUP_THRESHOLD: float = 0.85
+    DEDUP_MODE: str = "link"
+    DEDUP_NUM_PERM: int = 128
+    DEDUP_BANDS: int = 16
+
+    # Retrieval: "vector" (embedding + FAISS), "lexical" (BM25 only, no
+    # embedding call) or "hybrid" (both, fused with reciprocal rank fusion)
+    RETRIEVAL_MODE: str = "hybrid"
+    RRF_K: int = 60
+    HYBRID_CANDIDATES: int = 4  # Each ranker returns top_k * this before fusion
+    BM25_K1: float = 1.5
+    BM25_B: float = 0.75
+
+    # Context packing: overlapping neighbour chunks are merged, then chunks are
+    # picked by maximal marginal relevance until CONTEXT_TOKEN_BUDGET is used
+    CONTEXT_TOKEN_BUDGET: int = 2000
+    CONTEXT_CANDIDATES: int = 2  # Retrieve top_k * this chunks for the packer to choose from
+    MMR_LAMBDA: float = 0.7  # 1 = rank only, 0 = diversity only
+
+    # /generate-quiz/batch: max topics per request and quizzes generated at once
+    BATCH_QUIZ_MAX_TOPICS: int = 50
+    BATCH_QUIZ_MAX_CONCURRENCY: int = 8
+
+    # Metrics: raw generation events kept in memory, and the time buckets
+    # behind windowed views (/metrics?window=<seconds>)
+    METRICS_HISTORY_SIZE: int = 1000
+    METRICS_BUCKET_SECONDS: int = 60
+    METRICS_RETENTION_SECONDS: int = 3600
+
+    # Tracing: nested per-stage spans for each request and ingestion job.
+    # Traces slower than TRACE_SLOW_SECONDS (0 = never) log their breakdown;
+    # a quiz request with "trace": true also gets it in its metrics
+    TRACING_ENABLED: bool = True
+    TRACE_SLOW_SECONDS: float = 10.0
+
+    # Fast start: the FAISS snapshot is memory-mapped (new rows stay in RAM
+    # until compaction writes and maps the next one), and the BM25 index,
+    # tokenizer and Gemini client are loaded by a background warm-up after
+    # the server starts accepting connections; GET /ready reports 503 until
+    # it finishes. Off: warm-up blocks startup
+    FAST_START: bool = True
+
+    # Multi-worker mode, for several server processes over one STORAGE_PATH
+    # (uvicorn --workers N): writes to a collection are serialized by a lock
+    # file and published as a new snapshot, which the other workers
+    # memory-map and reload when they see its version stamp change. Metrics
+    # are merged across workers. Workers check for new snapshots and publish
+    # their metrics every WORKER_SYNC_SECONDS
+    MULTI_WORKER: bool = False
+    WORKER_SYNC_SECONDS: float = 1.0
 
     # API Keys
     OPENAI_API_KEY: str = ""
@@ -1,24 +1,43 @@
-from fastapi import FastAPI, UploadFile, File, HTTPException
+from fastapi import FastAPI, UploadFile, File, Form, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse, StreamingResponse
 from pathlib import Path
+import asyncio
 import json
+import logging
 import shutil
-from typing import List
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
 
 from app.config import settings
 from app.schema import (
     QuizGenerationRequest,
     QuizGenerationResponse,
+    BatchQuizGenerationRequest,
+    BatchQuizGenerationResponse,
+    BatchQuizResult,
     JeopardyQuestion,
-    UploadResponse,
+    UploadJobResponse,
+    JobStatusResponse,
+    DeleteDocumentResponse,
     MetricsResponse,
 )
-from app.services.ingestion import ingest_file
-from app.services.embeddings import EmbeddingService
-from app.services.vector_store import VectorStore
+from app.services.ingestion import file_content_hash
+from app.services.embeddings import EmbeddingService, create_cache
+from app.services.gemini_client import client as gemini_client
+from app.services.collection_manager import Collection, CollectionManager, CollectionNotFound
 from app.services.generation import QuizGenerator
 from app.services.retrieval import RetrievalService
-from app.services.metrics import MetricsTracker
+from app.services.metrics import MetricsTracker, WorkerMetrics
+from app.services.concurrency import limiter
+from app.services.quiz_cache import SemanticQuizCache
+from app.services.jobs import IngestionJobManager, restore_linked_chunks
+from app.services.single_flight import SingleFlight
+from app.services.tokenizer import get_tokenizer
+from app.services.tracing import TracingMiddleware, current_trace, span
+
+logger = logging.getLogger(__name__)
 
 # Initialize FastAPI app
 app = FastAPI(title="RAG Jeopardy Quiz API", version="1.0.0")
@@ -31,21 +50,109 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+app.add_middleware(TracingMiddleware)
 
 # Initialize services
-embedding_service = EmbeddingService()
-vector_store = VectorStore(
-    dim=settings.EMBEDDING_DIMENSION,  # Gemini text-embedding-004 dimension (768)
-    storage_dir=settings.STORAGE_PATH,
-    index_name="quiz_documents"
-)
-retrieval_service = RetrievalService(vector_store)
-quiz_generator = QuizGenerator()
 metrics_tracker = MetricsTracker()
 
+
+def single_flight(kind: str) -> Optional[SingleFlight]:
+    """Coalescing of identical in-flight upstream calls, counted in the metrics"""
+    if not settings.COALESCE_REQUESTS:
+        return None
+    return SingleFlight(kind, record=metrics_tracker.record_coalescing)
+
+
+embedding_service = EmbeddingService(cache=create_cache(), in_flight=single_flight("embed"))
+# One vector store per named collection, opened on demand (see CollectionManager)
+collections = CollectionManager(settings.STORAGE_PATH, embedding_service)
+quiz_generator = QuizGenerator(in_flight=single_flight("llm"))
+# Multi-worker mode: this worker's metrics are published for the others to merge
+worker_metrics = WorkerMetrics(metrics_tracker, settings.STORAGE_PATH / "metrics") if settings.MULTI_WORKER else None
+quiz_cache = (
+    SemanticQuizCache(
+        similarity_threshold=settings.QUIZ_CACHE_SIMILARITY,
+        ttl_seconds=settings.QUIZ_CACHE_TTL_SECONDS,
+        max_entries=settings.QUIZ_CACHE_MAX_ENTRIES,
+    )
+    if settings.QUIZ_CACHE_ENABLED
+    else None
+)
+
+job_manager = IngestionJobManager(
+    collections=collections,
+    embedding_service=embedding_service,
+    jobs_dir=settings.STORAGE_PATH / "jobs",
+)
+
 # Ensure upload directory exists
-UPLOAD_DIR = settings.BASE_DIR / "uploads"
-UPLOAD_DIR.mkdir(exist_ok=True)
+UPLOAD_DIR = settings.UPLOAD_PATH
+UPLOAD_DIR.mkdir(parents=True, exist_ok=True)
+
+
+# Set once warm_up has loaded everything fast start deferred (see GET /ready)
+ready = threading.Event()
+warm_up_error: Optional[str] = None
+
+
+def warm_up():
+    """Load the BM25 index, tokenizer and Gemini client ahead of the first request"""
+    global warm_up_error
+    start = time.perf_counter()
+    try:
+        with collections.use() as collection:
+            collection.store.warm_up()
+        get_tokenizer()
+        gemini_client.get()
+    except Exception as e:
+        warm_up_error = str(e)
+        logger.exception("Warm-up failed")
+        return
+    ready.set()
+    logger.info("Ready after %.2fs warm-up", time.perf_counter() - start)
+
+
+# Stops the multi-worker sync loop
+stopping = threading.Event()
+
+
+def sync_workers():
+    """Multi-worker mode: reload collections other workers changed, and publish this worker's metrics"""
+    while not stopping.wait(settings.WORKER_SYNC_SECONDS):
+        try:
+            reloaded = collections.refresh()
+            if reloaded:
+                logger.info("Reloaded collections changed by another worker: %s", ", ".join(reloaded))
+            worker_metrics.publish()
+        except Exception:
+            logger.exception("Worker sync failed")
+
+
+def current_metrics() -> MetricsTracker:
+    """Metrics of this worker, or of every worker in multi-worker mode"""
+    return worker_metrics.merged() if worker_metrics is not None else metrics_tracker
+
+
+@app.on_event("startup")
+def startup():
+    job_manager.start()
+    if settings.MULTI_WORKER:
+        stopping.clear()
+        threading.Thread(target=sync_workers, name="worker-sync", daemon=True).start()
+    if settings.FAST_START:
+        threading.Thread(target=warm_up, name="warm-up", daemon=True).start()
+    else:
+        warm_up()
+
+
+@app.on_event("shutdown")
+def shutdown():
+    """Stop ingestion, flush pending writes and let any background compaction finish"""
+    stopping.set()
+    job_manager.stop()
+    collections.close()
+    if worker_metrics is not None:
+        worker_metrics.close()
 
 
 @app.get("/")
@@ -53,56 +160,78 @@ async def root():
     return {
         "message": "RAG Jeopardy Quiz API",
         "endpoints": {
-            "upload": "POST /upload - Upload documents (PDF, TXT, MD)",
+            "upload": "POST /upload - Upload documents (PDF, TXT, MD) to a collection as a background job",
+            "collections": "GET /collections - Collections and the ones loaded in memory",
+            "delete_document": "DELETE /documents/{source} - Remove a document's chunks from a collection",
+            "jobs": "GET /jobs/{job_id} - Ingestion job progress",
             "generate_quiz": "POST /generate-quiz - Generate Jeopardy questions",
+            "generate_quiz_stream": "POST /generate-quiz/stream - Stream questions as NDJSON",
+            "generate_quiz_batch": "POST /generate-quiz/batch - Generate quizzes for many topics",
             "metrics": "GET /metrics - Get performance comparison data",
+            "prometheus": "GET /metrics/prometheus - Metrics in Prometheus text format",
+            "ready": "GET /ready - 503 until startup warm-up has finished",
         }
     }
 
 
-@app.post("/upload", response_model=UploadResponse)
-async def upload_documents(files: List[UploadFile] = File(...)):
+async def acquire_collection(name: Optional[str], create: bool = False) -> Collection:
+    """Open a collection for a request: 400 for an invalid name, 404 if it does not exist"""
+    try:
+        return await limiter.offload(collections.acquire, name, create)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except CollectionNotFound:
+        raise HTTPException(status_code=404, detail=f"Collection {name} not found")
+
+
+async def release_collection(collection: Optional[Collection]):
+    # Releasing may close idle collections, which flushes them to disk
+    if collection is not None:
+        await limiter.offload(collections.release, collection)
+
+
+@app.post("/upload", response_model=UploadJobResponse, status_code=202)
+async def upload_documents(files: List[UploadFile] = File(...), collection: Optional[str] = Form(None)):
     """
-    Upload and process documents (PDF, TXT, MD files).
-    Documents are chunked and embedded into the vector store.
+    Upload documents (PDF, TXT, MD files) for background ingestion into
+    `collection` (created if new; defaults to DEFAULT_COLLECTION).
+    Returns a job ID immediately; poll GET /jobs/{job_id} for progress.
+    Files whose content was already ingested into the collection are skipped;
+    a changed file under an existing name replaces the earlier version.
     """
+    target = await acquire_collection(collection, create=True)
     try:
-        processed_files = []
-        all_chunks = []
+        files_info = []
+        seen_hashes = set()
         
         for file in files:
             # Save uploaded file
-            file_path = UPLOAD_DIR / file.filename
-            with open(file_path, "wb") as buffer:
-                shutil.copyfileobj(file.file, buffer)
+            file_path = upload_dir(target.name) / file.filename
+            await limiter.offload(save_upload, file, file_path)
             
-            # Ingest and chunk the file
-            chunks = ingest_file(file_path)
-            all_chunks.extend(chunks)
-            processed_files.append(file.filename)
-        
-        # Generate embeddings
-        texts = [chunk.text for chunk in all_chunks]
-        embeddings = embedding_service.embed_texts(texts)
+            # Skip files whose exact content is already indexed
+            content_hash = await limiter.offload(file_content_hash, file_path)
+            skip = target.store.has_file(content_hash) or content_hash in seen_hashes
+            seen_hashes.add(content_hash)
+            files_info.append({
+                "filename": file.filename,
+                "path": str(file_path),
+                "content_hash": content_hash,
+                "skip": skip
+            })
         
-        # Store in vector database
-        metadatas = [
-            {
-                "id": chunk.id,
-                "text": chunk.text,
-                "source": chunk.source,
-                "token_count": chunk.token_count
-            }
-            for chunk in all_chunks
-        ]
-        vector_store.add(embeddings, metadatas)
-        vector_store.save()
+        job = job_manager.submit(files_info, target.name)
+        queued = [f["filename"] for f in files_info if not f["skip"]]
+        skipped = [f["filename"] for f in files_info if f["skip"]]
         
-        return UploadResponse(
-            success=True,
-            message=f"Successfully processed {len(files)} file(s)",
-            num_chunks=len(all_chunks),
-            files_processed=processed_files
+        return UploadJobResponse(
+            job_id=job.id,
+            status=job.status,
+            collection=job.collection,
+            message=f"Queued {len(queued)} file(s) for ingestion"
+            + (f", skipped {len(skipped)} already ingested" if skipped else ""),
+            files_queued=queued,
+            files_skipped=skipped
         )
     
     except Exception as e:
@@ -110,6 +239,158 @@ async def upload_documents(files: List[UploadFile] = File(...)):
         error_detail = f"Error processing files: {str(e)}\n{traceback.format_exc()}"
         print(error_detail)  # Log to console
         raise HTTPException(status_code=500, detail=error_detail)
+    finally:
+        await release_collection(target)
+
+
+def upload_dir(collection: str) -> Path:
+    """Where a collection's uploads are saved; a file's path is its chunks' source"""
+    if collection == settings.DEFAULT_COLLECTION:
+        return UPLOAD_DIR
+    path = UPLOAD_DIR / "collections" / collection
+    path.mkdir(parents=True, exist_ok=True)
+    return path
+
+
+def save_upload(file: UploadFile, file_path: Path):
+    with open(file_path, "wb") as buffer:
+        shutil.copyfileobj(file.file, buffer)
+
+
+@app.delete("/documents/{source:path}", response_model=DeleteDocumentResponse)
+async def delete_document(source: str, collection: Optional[str] = None):
+    """
+    Remove a document from `collection`, by uploaded filename or by the
+    source path its chunks report. Its chunks stop matching searches at once
+    and are purged from the index by a later compaction. Near-duplicates in
+    other documents that were linked to its chunks are indexed instead.
+    """
+    target = await acquire_collection(collection)
+    try:
+        source, deleted = await limiter.offload(delete_source, target, source)
+        if not deleted:
+            raise HTTPException(status_code=404, detail=f"Document {source} not found")
+        return DeleteDocumentResponse(source=source, collection=target.name, chunks_deleted=deleted)
+    finally:
+        await release_collection(target)
+
+
+def delete_source(collection: Collection, source: str) -> Tuple[str, int]:
+    """Delete a document by source or uploaded filename; returns (source, chunks deleted)"""
+    with collection.store.writing():
+        if not collection.store.has_source(source):
+            source = str(upload_dir(collection.name) / source)
+        deleted = collection.store.delete_source(source)
+        if deleted and collection.detector is not None:
+            # Duplicates linked to the deleted chunks now have to be indexed themselves
+            orphaned = collection.detector.remove(source)
+            if orphaned:
+                restore_linked_chunks(collection.store, collection.detector, embedding_service, orphaned)
+    return source, deleted
+
+
+@app.get("/jobs/{job_id}", response_model=JobStatusResponse)
+async def get_job(job_id: str):
+    """Per-stage progress and throughput of an ingestion job"""
+    job = job_manager.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Job {job_id} not found")
+    return JobStatusResponse(**job.to_dict())
+
+
+@app.post("/jobs/{job_id}/resume", response_model=JobStatusResponse)
+async def resume_job(job_id: str):
+    """Re-queue a failed job; it continues after the last indexed batch"""
+    if job_manager.get(job_id) is None:
+        raise HTTPException(status_code=404, detail=f"Job {job_id} not found")
+    try:
+        job = job_manager.resume(job_id)
+    except ValueError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    return JobStatusResponse(**job.to_dict())
+
+
+def cache_retrieval_key(request: QuizGenerationRequest) -> Tuple[str, Optional[int], Optional[int]]:
+    """The retrieval settings a RAG quiz was generated with; cached quizzes only serve the same"""
+    return (request.retrieval_mode or settings.RETRIEVAL_MODE, request.nprobe, request.ef_search)
+
+
+def lookup_cached_quiz(
+    request: QuizGenerationRequest,
+    topic_embedding: Optional[List[float]],
+    start_time: float,
+    collection: Optional[Collection],
+) -> Optional[Tuple[List[Dict[str, Any]], Dict[str, Any]]]:
+    """Return (questions, metrics) from the semantic quiz cache, recording the lookup"""
+    if quiz_cache is None or topic_embedding is None:
+        return None
+    cached = quiz_cache.lookup(
+        topic_embedding,
+        request.num_questions,
+        request.use_rag,
+        collection.store.version if collection else 0,
+        collection.name if collection else "",
+        cache_retrieval_key(request),
+    )
+    metrics_tracker.record_cache_lookup(cached is not None, cached["metrics"]["total_tokens"] if cached else 0)
+    if cached is None:
+        return None
+    metrics = {
+        **cached["metrics"],
+        "cache_hit": True,
+        "cache_similarity": cached["similarity"],
+        "time_seconds": time.time() - start_time,
+    }
+    return cached["questions"], metrics
+
+
+def store_cached_quiz(
+    request: QuizGenerationRequest,
+    topic_embedding: Optional[List[float]],
+    collection: Optional[Collection],
+    store_version: int,
+    questions: List[Dict[str, Any]],
+    metrics: Dict[str, Any],
+):
+    if quiz_cache is None or topic_embedding is None:
+        return
+    quiz_cache.put(
+        topic_embedding,
+        request.num_questions,
+        request.use_rag,
+        store_version,
+        {"questions": questions, "metrics": metrics},
+        collection.name if collection else "",
+        cache_retrieval_key(request),
+    )
+
+
+async def embed_topic(request: QuizGenerationRequest) -> Optional[List[float]]:
+    """
+    Topic embedding for the quiz cache, reused as the retrieval query vector.
+    Lexical-only RAG requests skip it (and so the cache) to avoid the embedding call.
+    """
+    if quiz_cache is None:
+        return None
+    if request.use_rag and not RetrievalService.needs_embedding(request.retrieval_mode):
+        return None
+    return (await embedding_service.aembed_texts([request.topic]))[0]
+
+
+def with_trace(requested: bool, metrics: Dict[str, Any]) -> Dict[str, Any]:
+    """Response metrics, plus the request's stage breakdown when it asked for one"""
+    root = current_trace()
+    if not requested or root is None:
+        return metrics
+    return {**metrics, "trace": root.summary()}
+
+
+def context_metrics(retrieval_result: Dict[str, Any]) -> Dict[str, int]:
+    """Prompt tokens of the packed context and tokens saved by packing"""
+    return {
+        "context_tokens": retrieval_result["context_tokens"],
+        "context_tokens_saved": retrieval_result["context_tokens_saved"],
+    }
 
 
 @app.post("/generate-quiz", response_model=QuizGenerationResponse)
@@ -118,38 +399,66 @@ async def generate_quiz(request: QuizGenerationRequest):
     Generate Jeopardy-style quiz questions.
     If use_rag=True, retrieves relevant context from uploaded documents.
     If use_rag=False, generates questions without specific context.
+    Near-identical recent topics are served from the semantic quiz cache.
     """
+    collection = await acquire_collection(request.collection) if request.use_rag else None
     try:
+        start_time = time.time()
+        store_version = collection.store.version if collection else 0
+        with span("embed_topic"):
+            topic_embedding = await embed_topic(request)
+        with span("cache_lookup"):
+            cached = lookup_cached_quiz(request, topic_embedding, start_time, collection)
+        if cached is not None:
+            questions_data, metrics = cached
+            return QuizGenerationResponse(
+                questions=[JeopardyQuestion(**q) for q in questions_data],
+                metrics=with_trace(request.trace, metrics)
+            )
+        
         if request.use_rag:
-            # Retrieve context from vector store
-            retrieval_result = retrieval_service.retrieve_context(
+            # Retrieve context from the collection's vector store
+            retrieval_result = await collection.retrieval.aretrieve_context(
                 request.topic, 
-                top_k=5
+                top_k=5,
+                nprobe=request.nprobe,
+                ef_search=request.ef_search,
+                query_embedding=topic_embedding,
+                mode=request.retrieval_mode
             )
             context = retrieval_result["context"]
             
             # Generate quiz with RAG
-            result = quiz_generator.generate_with_rag(
+            result = await quiz_generator.agenerate_with_rag(
                 context=context,
                 num_questions=request.num_questions
             )
+            result["metrics"].update(context_metrics(retrieval_result))
         else:
             # Generate quiz without RAG
-            result = quiz_generator.generate_without_rag(
+            result = await quiz_generator.agenerate_without_rag(
                 topic=request.topic,
                 num_questions=request.num_questions
             )
         
-        # Track metrics
-        metrics_tracker.add_metric(result["metrics"])
+        # Track metrics; a generation shared with an identical request in flight was tracked (and cached) by it
+        coalesced = result["metrics"].get("coalesced", False)
+        if not coalesced:
+            metrics_tracker.add_metric(result["metrics"])
         
         # Parse questions JSON
-        questions_data = json.loads(result["questions"])
-        questions = [JeopardyQuestion(**q) for q in questions_data]
+        with span("parse_json"):
+            questions_data = json.loads(result["questions"])
+            questions = [JeopardyQuestion(**q) for q in questions_data]
+        if not coalesced:
+            store_cached_quiz(
+                request, topic_embedding, collection, store_version,
+                [q.model_dump() for q in questions], result["metrics"]
+            )
         
         return QuizGenerationResponse(
             questions=questions,
-            metrics=result["metrics"]
+            metrics=with_trace(request.trace, result["metrics"])
         )
     
     except json.JSONDecodeError as e:
@@ -159,34 +468,265 @@ async def generate_quiz(request: QuizGenerationRequest):
         )
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error generating quiz: {str(e)}")
+    finally:
+        await release_collection(collection)
+
+
+@app.post("/generate-quiz/stream")
+async def generate_quiz_stream(request: QuizGenerationRequest):
+    """
+    Stream Jeopardy-style quiz questions as newline-delimited JSON.
+    Emits {"type": "question", "data": {...}} as soon as each question is
+    complete, then a final {"type": "metrics", "data": {...}} frame.
+    Errors after the stream has started arrive as {"type": "error", "detail": ...}.
+    """
+    if request.use_rag:
+        # Reject a bad collection with a status code; it is opened once the stream starts
+        await release_collection(await acquire_collection(request.collection))
+
+    async def frames():
+        collection = None
+        try:
+            if request.use_rag:
+                collection = await acquire_collection(request.collection)
+            start_time = time.time()
+            store_version = collection.store.version if collection else 0
+            with span("embed_topic"):
+                topic_embedding = await embed_topic(request)
+            with span("cache_lookup"):
+                cached = lookup_cached_quiz(request, topic_embedding, start_time, collection)
+            if cached is not None:
+                questions_data, metrics = cached
+                for question in questions_data:
+                    yield json.dumps({"type": "question", "data": question}) + "\n"
+                yield json.dumps({"type": "metrics", "data": with_trace(request.trace, metrics)}) + "\n"
+                return
+
+            if request.use_rag:
+                retrieval_result = await collection.retrieval.aretrieve_context(
+                    request.topic,
+                    top_k=5,
+                    nprobe=request.nprobe,
+                    ef_search=request.ef_search,
+                    query_embedding=topic_embedding,
+                    mode=request.retrieval_mode
+                )
+                stream = quiz_generator.astream_with_rag(
+                    context=retrieval_result["context"],
+                    num_questions=request.num_questions
+                )
+            else:
+                stream = quiz_generator.astream_without_rag(
+                    topic=request.topic,
+                    num_questions=request.num_questions
+                )
+
+            questions = []
+            async for kind, data in stream:
+                if kind == "question":
+                    data = JeopardyQuestion(**data).model_dump()
+                    questions.append(data)
+                else:
+                    if request.use_rag:
+                        data.update(context_metrics(retrieval_result))
+                    metrics_tracker.add_metric(data)
+                    store_cached_quiz(request, topic_embedding, collection, store_version, questions, data)
+                    data = with_trace(request.trace, data)
+                yield json.dumps({"type": kind, "data": data}) + "\n"
+        except Exception as e:
+            yield json.dumps({"type": "error", "detail": f"Error generating quiz: {str(e)}"}) + "\n"
+        finally:
+            await release_collection(collection)
+
+    return StreamingResponse(frames(), media_type="application/x-ndjson")
+
+
+@app.post("/generate-quiz/batch", response_model=BatchQuizGenerationResponse)
+async def generate_quiz_batch(request: BatchQuizGenerationRequest):
+    """
+    Generate quizzes for many topics in one request.
+    All topics are embedded in one call and retrieved with one multi-row
+    FAISS search; the quizzes are then generated concurrently, at most
+    `max_concurrency` at a time. A topic that fails gets an `error` instead
+    of questions; the other topics are still returned.
+    """
+    if not request.topics:
+        raise HTTPException(status_code=400, detail="No topics provided")
+    if len(request.topics) > settings.BATCH_QUIZ_MAX_TOPICS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"At most {settings.BATCH_QUIZ_MAX_TOPICS} topics per batch, got {len(request.topics)}"
+        )
+
+    collection = await acquire_collection(request.collection) if request.use_rag else None
+    try:
+        return await run_quiz_batch(request, collection)
+    finally:
+        await release_collection(collection)
+
+
+async def run_quiz_batch(
+    request: BatchQuizGenerationRequest, collection: Optional[Collection]
+) -> BatchQuizGenerationResponse:
+    start_time = time.time()
+    store_version = collection.store.version if collection else 0
+    topic_requests = [
+        QuizGenerationRequest(topic=topic, **request.model_dump(exclude={"topics", "max_concurrency"}))
+        for topic in request.topics
+    ]
+    results: List[Optional[BatchQuizResult]] = [None] * len(topic_requests)
+
+    # One embedding call for every topic (cache lookups and vector retrieval)
+    if request.use_rag:
+        needs_embedding = RetrievalService.needs_embedding(request.retrieval_mode)
+    else:
+        needs_embedding = quiz_cache is not None
+    try:
+        if needs_embedding:
+            with span("embed_topic"):
+                topic_embeddings = await embedding_service.aembed_texts(request.topics)
+        else:
+            topic_embeddings = [None] * len(topic_requests)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error embedding topics: {str(e)}")
+
+    for i, topic_request in enumerate(topic_requests):
+        cached = lookup_cached_quiz(topic_request, topic_embeddings[i], start_time, collection)
+        if cached is not None:
+            questions_data, metrics = cached
+            results[i] = BatchQuizResult(
+                topic=topic_request.topic,
+                questions=[JeopardyQuestion(**q) for q in questions_data],
+                metrics=metrics
+            )
+    pending = [i for i, result in enumerate(results) if result is None]
+
+    retrievals: Dict[int, Dict[str, Any]] = {}
+    if request.use_rag and pending:
+        try:
+            retrieval_results = await collection.retrieval.aretrieve_context_batch(
+                [request.topics[i] for i in pending],
+                top_k=5,
+                nprobe=request.nprobe,
+                ef_search=request.ef_search,
+                query_embeddings=[topic_embeddings[i] for i in pending] if needs_embedding else None,
+                mode=request.retrieval_mode
+            )
+            retrievals = dict(zip(pending, retrieval_results))
+        except Exception as e:
+            for i in pending:
+                results[i] = BatchQuizResult(topic=request.topics[i], error=f"Error retrieving context: {str(e)}")
+            pending = []
+
+    in_flight = asyncio.Semaphore(max(1, request.max_concurrency or settings.BATCH_QUIZ_MAX_CONCURRENCY))
+
+    async def generate(i: int) -> BatchQuizResult:
+        topic_request = topic_requests[i]
+        try:
+            async with in_flight:
+                if request.use_rag:
+                    result = await quiz_generator.agenerate_with_rag(
+                        context=retrievals[i]["context"],
+                        num_questions=request.num_questions
+                    )
+                    result["metrics"].update(context_metrics(retrievals[i]))
+                else:
+                    result = await quiz_generator.agenerate_without_rag(
+                        topic=topic_request.topic,
+                        num_questions=request.num_questions
+                    )
+            with span("parse_json"):
+                questions = [JeopardyQuestion(**q) for q in json.loads(result["questions"])]
+        except Exception as e:
+            return BatchQuizResult(topic=topic_request.topic, error=f"Error generating quiz: {str(e)}")
+
+        if not result["metrics"].get("coalesced", False):
+            metrics_tracker.add_metric(result["metrics"])
+            store_cached_quiz(
+                topic_request, topic_embeddings[i], collection, store_version,
+                [q.model_dump() for q in questions], result["metrics"]
+            )
+        return BatchQuizResult(topic=topic_request.topic, questions=questions, metrics=result["metrics"])
+
+    for i, result in zip(pending, await asyncio.gather(*(generate(i) for i in pending))):
+        results[i] = result
+
+    succeeded = [r for r in results if r.error is None]
+    return BatchQuizGenerationResponse(
+        results=results,
+        metrics=with_trace(request.trace, {
+            "num_topics": len(results),
+            "succeeded": len(succeeded),
+            "failed": len(results) - len(succeeded),
+            "cache_hits": sum(1 for r in succeeded if r.metrics.get("cache_hit")),
+            "total_tokens": sum(r.metrics["total_tokens"] for r in succeeded if not r.metrics.get("cache_hit")),
+            "context_tokens_saved": sum(
+                r.metrics.get("context_tokens_saved", 0) for r in succeeded if not r.metrics.get("cache_hit")
+            ),
+            "time_seconds": time.time() - start_time,
+        })
+    )
 
 
 @app.get("/metrics", response_model=MetricsResponse)
-async def get_metrics():
+async def get_metrics(window: Optional[int] = None):
     """
     Get performance comparison metrics between RAG and non-RAG methods.
-    Returns aggregated statistics for visualization.
+    Returns aggregated statistics for visualization; pass `window` (seconds)
+    to only include recent generations.
     """
+    if window is not None and not 0 < window <= settings.METRICS_RETENTION_SECONDS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"window must be between 1 and {settings.METRICS_RETENTION_SECONDS} seconds"
+        )
     try:
-        comparison = metrics_tracker.get_comparison()
+        comparison = (await limiter.offload(current_metrics)).get_comparison(window_seconds=window)
         return MetricsResponse(**comparison)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error retrieving metrics: {str(e)}")
 
 
+@app.get("/metrics/prometheus", response_class=PlainTextResponse)
+async def get_prometheus_metrics():
+    """Generation, token and cache counters plus latency quantiles for Prometheus to scrape"""
+    metrics = await limiter.offload(current_metrics)
+    return PlainTextResponse(metrics.to_prometheus(), media_type="text/plain; version=0.0.4")
+
+
 @app.delete("/metrics")
 async def clear_metrics():
-    """Clear all stored metrics"""
-    metrics_tracker.clear()
+    """Clear all stored metrics (of every worker in multi-worker mode)"""
+    if worker_metrics is not None:
+        await limiter.offload(worker_metrics.clear)
+    else:
+        metrics_tracker.clear()
     return {"message": "Metrics cleared successfully"}
 
 
+@app.get("/ready")
+async def readiness_check():
+    """Readiness: 503 until startup warm-up has finished (liveness is /health)"""
+    if not ready.is_set():
+        raise HTTPException(status_code=503, detail=warm_up_error or "Warming up")
+    return {"status": "ready"}
+
+
+@app.get("/collections")
+async def list_collections():
+    """All collections, and the loaded ones with their vector counts and estimated memory"""
+    return await limiter.offload(collections.stats)
+
+
 @app.get("/health")
 async def health_check():
     """Health check endpoint"""
+    loaded = (await limiter.offload(collections.stats))["loaded"]
     return {
         "status": "healthy",
-        "vector_store_size": vector_store.index.ntotal if hasattr(vector_store.index, 'ntotal') else 0
+        "vector_store_size": sum(c["vectors"] for c in loaded.values()),
+        "collections_loaded": len(loaded),
+        "embedding_cache": embedding_service.cache.stats() if embedding_service.cache else None
     }
 
 
@@ -1,5 +1,5 @@
 from pydantic import BaseModel
-from typing import List, Optional, Dict, Any
+from typing import List, Literal, Optional, Dict, Any
 
 
 class DocumentChunk(BaseModel):
@@ -7,6 +7,9 @@ class DocumentChunk(BaseModel):
     text: str
     source: str
     token_count: int
+    # Character span of the chunk in the extracted document text
+    start_char: Optional[int] = None
+    end_char: Optional[int] = None
 
 
 class SearchResult(BaseModel):
@@ -39,6 +42,16 @@ class QuizGenerationRequest(BaseModel):
     topic: str
     num_questions: int = 5
     use_rag: bool = True
+    # Optional ANN search knobs (IVF lists probed / HNSW candidate list size)
+    nprobe: Optional[int] = None
+    ef_search: Optional[int] = None
+    # "vector", "lexical" (BM25 only, skips the query embedding) or "hybrid";
+    # defaults to the RETRIEVAL_MODE setting
+    retrieval_mode: Optional[Literal["vector", "lexical", "hybrid"]] = None
+    # Collection to retrieve from; defaults to the DEFAULT_COLLECTION setting
+    collection: Optional[str] = None
+    # Add the per-stage latency breakdown to `metrics["trace"]` (needs TRACING_ENABLED)
+    trace: bool = False
 
 
 class QuizGenerationResponse(BaseModel):
@@ -46,6 +59,31 @@ class QuizGenerationResponse(BaseModel):
     metrics: Dict[str, Any]
 
 
+class BatchQuizGenerationRequest(BaseModel):
+    topics: List[str]
+    num_questions: int = 5
+    use_rag: bool = True
+    nprobe: Optional[int] = None
+    ef_search: Optional[int] = None
+    retrieval_mode: Optional[Literal["vector", "lexical", "hybrid"]] = None
+    collection: Optional[str] = None
+    # Quizzes generated at once; defaults to BATCH_QUIZ_MAX_CONCURRENCY
+    max_concurrency: Optional[int] = None
+    trace: bool = False
+
+
+class BatchQuizResult(BaseModel):
+    topic: str
+    questions: Optional[List[JeopardyQuestion]] = None
+    metrics: Optional[Dict[str, Any]] = None
+    error: Optional[str] = None
+
+
+class BatchQuizGenerationResponse(BaseModel):
+    results: List[BatchQuizResult]
+    metrics: Dict[str, Any]
+
+
 class AnswerSubmission(BaseModel):
     question_id: int
     user_answer: str
@@ -57,11 +95,39 @@ class AnswerValidation(BaseModel):
     feedback: str
 
 
-class UploadResponse(BaseModel):
-    success: bool
+class UploadJobResponse(BaseModel):
+    job_id: str
+    status: str
+    collection: Optional[str] = None
     message: str
+    files_queued: List[str]
+    files_skipped: List[str] = []
+
+
+class DeleteDocumentResponse(BaseModel):
+    source: str
+    collection: str
+    chunks_deleted: int
+
+
+class JobStatusResponse(BaseModel):
+    job_id: str
+    status: str
+    collection: Optional[str] = None
+    error: Optional[str] = None
+    created_at: str
+    updated_at: str
+    attempts: int
+    files: List[Dict[str, Any]]
+    indexed_batches: int
     num_chunks: int
-    files_processed: List[str]
+    total_chunks: Optional[int] = None
+    duplicates: int = 0
+    dedup_ratio: float = 0.0
+    # Re-uploaded files: chunks kept without re-embedding, and old chunks deleted
+    unchanged: int = 0
+    removed: int = 0
+    stages: Dict[str, Dict[str, float]]
 
 
 class MetricsResponse(BaseModel):
@@ -69,3 +135,6 @@ class MetricsResponse(BaseModel):
     no_rag: Dict[str, float]
     comparison: Dict[str, float]
     total_generations: int
+    cache: Dict[str, float] = {}
+    coalescing: Dict[str, Dict[str, float]] = {}
+    window_seconds: Optional[int] = None
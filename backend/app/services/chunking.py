@@ -0,0 +1,123 @@
+from typing import List, NamedTuple, Optional
+
+import numpy as np
+import tiktoken
+
+# Byte class lookup tables for the boundary scan
+_IS_SPACE = np.zeros(256, dtype=bool)
+_IS_SPACE[list(b" \t\n\r\f\v")] = True
+_IS_SENTENCE_END = np.zeros(256, dtype=bool)
+_IS_SENTENCE_END[list(b".!?")] = True
+_IS_CLOSING = np.zeros(256, dtype=bool)
+_IS_CLOSING[list(b"\"')]")] = True
+_NEWLINE, _HASH = ord("\n"), ord("#")
+
+
+class Chunk(NamedTuple):
+    text: str
+    token_count: int
+    start_char: int  # text == document[start_char:end_char]
+    end_char: int
+
+
+class TextChunker:
+    """
+    Token-budgeted chunker that slices the original string.
+    The document is encoded once; token byte offsets come from a per-vocab
+    length table and are mapped to character offsets with one cumulative
+    sum, so no window is ever decoded. Chunks end at the strongest boundary
+    (heading, paragraph, sentence, then word) in the back half of the
+    `chunk_size` window, and the `overlap` carried into the next chunk
+    starts at a sentence or word boundary.
+    """
+
+    def __init__(self, chunk_size: int, overlap: int, tokenizer: tiktoken.Encoding, min_fill: float = 0.5):
+        if not 0 <= overlap < chunk_size:
+            raise ValueError("overlap must be smaller than chunk_size")
+        self.chunk_size = chunk_size
+        self.overlap = overlap
+        self.tokenizer = tokenizer
+        self.min_fill = min_fill
+        self._token_lengths: Optional[np.ndarray] = None
+
+    def _byte_lengths(self, tokens: np.ndarray) -> np.ndarray:
+        if self._token_lengths is None:
+            lengths = np.zeros(self.tokenizer.n_vocab, dtype=np.int64)
+            for token in range(self.tokenizer.n_vocab):
+                try:
+                    lengths[token] = len(self.tokenizer.decode_single_token_bytes(token))
+                except KeyError:
+                    pass  # unused id between the regular and special tokens
+            self._token_lengths = lengths
+        return self._token_lengths[tokens]
+
+    def _boundary_strength(self, raw: np.ndarray, starts: np.ndarray) -> np.ndarray:
+        """
+        Per-token score for ending a chunk just before that token:
+        4 heading, 3 paragraph, 2 sentence, 1 word, 0 mid-word
+        """
+        # Pad so lookahead past the last byte reads a newline
+        padded = np.concatenate([raw, np.full(2, _NEWLINE, dtype=np.uint8)])
+        strength = np.zeros(len(starts) + 1, dtype=np.int8)
+        # Word boundary: the token starts with, or right after, whitespace
+        strength[1:-1] = _IS_SPACE[padded[starts[1:] - 1]] | _IS_SPACE[padded[starts[1:]]]
+
+        # . ! or ? (plus one closing quote/bracket) followed by whitespace; the
+        # boundary is just before the whitespace, which goes to the next chunk
+        ends = np.flatnonzero(_IS_SENTENCE_END[raw])
+        closed = _IS_CLOSING[padded[ends + 1]]
+        ends = ends + 1 + closed
+        sentence = ends[_IS_SPACE[padded[ends]]]
+        newlines = np.flatnonzero(raw == _NEWLINE)
+        paragraph = newlines[padded[newlines + 1] == _NEWLINE]
+        heading = newlines[padded[newlines + 1] == _HASH]
+        for score, offsets in ((2, sentence), (3, paragraph), (4, heading)):
+            # The first token starting at or after each offset
+            strength[np.searchsorted(starts, offsets)] = score
+        return strength
+
+    def chunk(self, text: str) -> List[Chunk]:
+        if not text:
+            return []
+        raw = np.frombuffer(text.encode("utf-8"), dtype=np.uint8)
+        tokens = self.tokenizer.encode_to_numpy(text, disallowed_special=())
+        num_tokens = len(tokens)
+
+        # Byte offset of every token start, plus the end of the document
+        token_bytes = np.zeros(num_tokens + 1, dtype=np.int64)
+        np.cumsum(self._byte_lengths(tokens), out=token_bytes[1:])
+        # A byte offset's character index is the offset minus the UTF-8
+        # continuation bytes before it
+        continuation = np.flatnonzero((raw & 0xC0) == 0x80) if len(raw) != len(text) else np.empty(0, dtype=np.int64)
+
+        def char_offset(token: int) -> int:
+            offset = int(token_bytes[token])
+            return offset - int(np.searchsorted(continuation, offset))
+
+        strength = self._boundary_strength(raw, token_bytes[:-1])
+        chunks = []
+        start = 0
+        min_tokens = max(1, int(self.chunk_size * self.min_fill))
+        while True:
+            end = min(start + self.chunk_size, num_tokens)
+            if end < num_tokens:
+                # The strongest boundary in the back of the window, latest on ties
+                window = strength[start + min_tokens : end + 1]
+                best = window.max()
+                if best:
+                    end = start + min_tokens + int(np.flatnonzero(window == best)[-1])
+            start_char, end_char = char_offset(start), char_offset(end)
+            chunks.append(Chunk(text[start_char:end_char], end - start, start_char, end_char))
+            if end == num_tokens:
+                return chunks
+
+            next_start = max(end - self.overlap, start + 1)
+            if next_start < end:
+                # Start the overlap at its first sentence boundary, else its first word
+                window = strength[next_start:end]
+                for min_strength in (2, 1):
+                    found = np.flatnonzero(window >= min_strength)
+                    if len(found):
+                        next_start += int(found[0])
+                        break
+            start = next_start
@@ -0,0 +1,172 @@
+import re
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional
+
+from app.config import settings
+from app.services.dedup import create_detector
+from app.services.embeddings import EmbeddingService, storage_dimension
+from app.services.retrieval import RetrievalService
+from app.services.vector_store import VectorStore
+
+COLLECTION_NAME = re.compile(r"[A-Za-z0-9][A-Za-z0-9_-]{0,63}")
+INDEX_NAME = "quiz_documents"
+
+
+class CollectionNotFound(KeyError):
+    pass
+
+
+def collection_path(storage_root: Path, name: str, default: str = settings.DEFAULT_COLLECTION) -> Path:
+    """Directory holding a collection's files"""
+    # The default collection keeps the files of the single-index layout
+    if name == default:
+        return storage_root
+    return storage_root / "collections" / name
+
+
+class Collection:
+    """One named corpus: its vector store, retrieval service and near-duplicate index"""
+
+    def __init__(self, name: str, storage_dir: Path, embedding_service: EmbeddingService):
+        self.name = name
+        self.storage_dir = storage_dir
+        self.store = VectorStore(dim=storage_dimension(), storage_dir=storage_dir, index_name=INDEX_NAME)
+        self.retrieval = RetrievalService(self.store, embedding_service)
+        self.detector = create_detector(storage_dir)
+        # Requests and jobs currently holding the collection; never evicted while > 0
+        self.users = 0
+
+    def close(self):
+        self.store.close()
+        if self.detector is not None:
+            self.detector.close()
+
+
+class CollectionManager:
+    """
+    Named collections, opened on first use and kept in least-recently-used
+    order. Whenever one is acquired or released, idle collections are closed
+    (pending writes flushed) from the least recently used end until the
+    estimated memory of those still open fits `memory_budget_bytes`. A
+    collection in use by a request or ingestion job is never closed, so the
+    budget can be exceeded while many are busy at once.
+    """
+
+    def __init__(
+        self,
+        storage_root: Path,
+        embedding_service: EmbeddingService,
+        memory_budget_bytes: int = settings.COLLECTIONS_MEMORY_BUDGET_MB * 2**20,
+        default: str = settings.DEFAULT_COLLECTION,
+    ):
+        self.storage_root = storage_root
+        self.embedding_service = embedding_service
+        self.memory_budget_bytes = memory_budget_bytes
+        self.default = default
+        self.evictions = 0
+        self._loaded: "OrderedDict[str, Collection]" = OrderedDict()
+        # Held while opening and closing, so a collection is never open twice
+        self._lock = threading.Lock()
+
+    def path(self, name: str) -> Path:
+        return collection_path(self.storage_root, name, self.default)
+
+    def validate(self, name: Optional[str]) -> str:
+        name = name or self.default
+        if not COLLECTION_NAME.fullmatch(name):
+            raise ValueError(
+                f"Invalid collection name: {name!r}. Use up to 64 letters, digits, '_' or '-', "
+                "starting with a letter or digit"
+            )
+        return name
+
+    def exists(self, name: str) -> bool:
+        return name == self.default or name in self._loaded or (self.path(name) / f"{INDEX_NAME}.meta.sqlite3").exists()
+
+    def names(self) -> List[str]:
+        root = self.storage_root / "collections"
+        on_disk = [p.name for p in root.iterdir() if p.is_dir()] if root.exists() else []
+        return sorted({self.default, *on_disk, *self._loaded})
+
+    def acquire(self, name: Optional[str] = None, create: bool = False) -> Collection:
+        """
+        Open (or reuse) a collection and mark it in use until `release`.
+        Raises ValueError for an invalid name and CollectionNotFound for a
+        missing collection unless `create`.
+        """
+        name = self.validate(name)
+        with self._lock:
+            collection = self._loaded.get(name)
+            if collection is None:
+                if not create and not self.exists(name):
+                    raise CollectionNotFound(name)
+                collection = Collection(name, self.path(name), self.embedding_service)
+                self._loaded[name] = collection
+            self._loaded.move_to_end(name)
+            collection.users += 1
+            self._evict()
+        return collection
+
+    def release(self, collection: Collection):
+        with self._lock:
+            collection.users -= 1
+            self._evict()
+
+    @contextmanager
+    def use(self, name: Optional[str] = None, create: bool = False) -> Iterator[Collection]:
+        collection = self.acquire(name, create)
+        try:
+            yield collection
+        finally:
+            self.release(collection)
+
+    def _evict(self):
+        sizes = {name: collection.store.memory_bytes() for name, collection in self._loaded.items()}
+        total = sum(sizes.values())
+        for name, collection in list(self._loaded.items()):
+            if total <= self.memory_budget_bytes:
+                break
+            if collection.users:
+                continue
+            collection.close()
+            del self._loaded[name]
+            total -= sizes[name]
+            self.evictions += 1
+
+    def refresh(self) -> List[str]:
+        """
+        Reload loaded collections that another process changed (multi-worker
+        mode); returns their names. Reloading happens outside the manager
+        lock, and an in-use collection is swapped to the new state in place.
+        """
+        with self._lock:
+            loaded = list(self._loaded.values())
+        return [collection.name for collection in loaded if collection.store.refresh()]
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            loaded = {
+                name: {
+                    "vectors": collection.store.ntotal,
+                    "memory_bytes": collection.store.memory_bytes(),
+                    "in_use": collection.users,
+                }
+                for name, collection in self._loaded.items()
+            }
+        return {
+            "collections": self.names(),
+            "loaded": loaded,
+            "memory_bytes": sum(c["memory_bytes"] for c in loaded.values()),
+            "memory_budget_bytes": self.memory_budget_bytes,
+            "evictions": self.evictions,
+        }
+
+    def close(self):
+        """Close every open collection, flushing pending writes"""
+        with self._lock:
+            for collection in self._loaded.values():
+                collection.close()
+            self._loaded.clear()
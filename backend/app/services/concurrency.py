@@ -0,0 +1,61 @@
+import asyncio
+import contextvars
+import functools
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from typing import Any, Callable, Dict
+
+from app.config import settings
+
+
+class StageLimiter:
+    """
+    Per-stage concurrency limits for the request path, plus a bounded
+    thread pool for blocking work (FAISS search, file parsing, SQLite).
+    Keeps one slow stage from stalling the event loop or starving the others.
+    """
+
+    def __init__(self, limits: Dict[str, int], max_workers: int):
+        self.limits = limits
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="stage")
+        # Semaphores are tied to an event loop, so keep one set per loop
+        self._semaphores: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Dict[str, asyncio.Semaphore]]" = (
+            weakref.WeakKeyDictionary()
+        )
+
+    def _semaphore(self, stage: str) -> asyncio.Semaphore:
+        semaphores = self._semaphores.setdefault(asyncio.get_running_loop(), {})
+        if stage not in semaphores:
+            semaphores[stage] = asyncio.Semaphore(self.limits[stage])
+        return semaphores[stage]
+
+    @asynccontextmanager
+    async def stage(self, stage: str):
+        """Hold one of the `stage` slots for the duration of the block"""
+        async with self._semaphore(stage):
+            yield
+
+    async def run(self, stage: str, fn: Callable[..., Any], *args, **kwargs) -> Any:
+        """Run blocking `fn` in the pool, limited to the `stage` concurrency"""
+        async with self._semaphore(stage):
+            return await self.offload(fn, *args, **kwargs)
+
+    async def offload(self, fn: Callable[..., Any], *args, **kwargs) -> Any:
+        """Run short blocking `fn` in the pool without a stage limit"""
+        loop = asyncio.get_running_loop()
+        # Carry context variables into the worker thread
+        call = functools.partial(contextvars.copy_context().run, fn, *args, **kwargs)
+        return await loop.run_in_executor(self.executor, call)
+
+
+limiter = StageLimiter(
+    limits={
+        "embed": settings.STAGE_LIMIT_EMBED,
+        "search": settings.STAGE_LIMIT_SEARCH,
+        "llm": settings.STAGE_LIMIT_LLM,
+        "ingest": settings.STAGE_LIMIT_INGEST,
+        "index": 1,  # vector store writes are serialized
+    },
+    max_workers=settings.BLOCKING_POOL_WORKERS,
+)
@@ -0,0 +1,141 @@
+from typing import Any, Dict, List, NamedTuple, Set, Tuple
+
+import tiktoken
+
+from app.services.lexical_index import tokenize
+
+SEPARATOR = "\n\n"
+
+
+def _shingles(text: str) -> Set[Tuple[str, str]]:
+    words = tokenize(text)
+    return set(zip(words, words[1:])) or {(word, "") for word in words}
+
+
+def _containment(a: Set[Tuple[str, str]], b: Set[Tuple[str, str]]) -> float:
+    """Share of the smaller set found in the other; 1.0 when one text repeats the other"""
+    if not a or not b:
+        return 0.0
+    return len(a & b) / min(len(a), len(b))
+
+
+class PackedContext(NamedTuple):
+    context: str
+    chunks: List[Dict[str, Any]]  # Retrieved chunks whose text made it into the context
+    tokens: int
+    baseline_tokens: int  # Tokens of all the candidate chunk texts joined as-is
+
+
+class _Span:
+    """A run of overlapping chunks from one document"""
+
+    def __init__(self, chunk: Dict[str, Any], rank: int):
+        self.source = chunk.get("source", "")
+        self.start = chunk.get("start_char")
+        self.end = chunk.get("end_char")
+        self.text = chunk.get("text", "")
+        self.chunks = [chunk]
+        self.rank = rank
+
+    def try_merge(self, chunk: Dict[str, Any], rank: int) -> bool:
+        """Extend the span with a chunk that overlaps or touches its end"""
+        start, end, text = chunk.get("start_char"), chunk.get("end_char"), chunk.get("text", "")
+        if self.end is None or start is None or end is None or chunk.get("source", "") != self.source:
+            return False
+        if start > self.end or end < self.start:
+            return False
+        # Same name is not the same content (e.g. a re-uploaded revision);
+        # only merge when the shared characters agree
+        shared_start, shared_end = max(start, self.start), min(end, self.end)
+        if self.text[shared_start - self.start : shared_end - self.start] != text[shared_start - start : shared_end - start]:
+            return False
+        if start < self.start:
+            self.text = text[: self.start - start] + self.text
+            self.start = start
+        if end > self.end:
+            self.text += text[self.end - start :]
+            self.end = end
+        self.chunks.append(chunk)
+        self.rank = min(self.rank, rank)
+        return True
+
+
+class ContextPacker:
+    """
+    Turns ranked chunks into a prompt context within a token budget.
+    Chunks from the same document whose character spans overlap (the
+    CHUNK_OVERLAP tokens every neighbour repeats) are merged into one span.
+    Spans are then picked by maximal marginal relevance, trading retrieval
+    rank against word-bigram overlap with spans already in the context, and
+    added until `token_budget` is reached. Spans that mostly repeat one
+    already added (`redundancy_threshold`) are dropped outright.
+    """
+
+    def __init__(
+        self,
+        token_budget: int,
+        mmr_lambda: float,
+        tokenizer: tiktoken.Encoding,
+        redundancy_threshold: float = 0.8,
+    ):
+        self.token_budget = token_budget
+        self.mmr_lambda = mmr_lambda
+        self.redundancy_threshold = redundancy_threshold
+        self.tokenizer = tokenizer
+        self._separator_tokens = len(tokenizer.encode(SEPARATOR))
+
+    def count_tokens(self, text: str) -> int:
+        return len(self.tokenizer.encode(text, disallowed_special=()))
+
+    def pack(self, chunks: List[Dict[str, Any]]) -> PackedContext:
+        """`chunks` are the candidates, best first"""
+        baseline_tokens = self.count_tokens(SEPARATOR.join(c.get("text", "") for c in chunks))
+        spans = self._merge(chunks)
+        # Relevance from retrieval rank, scaled to (0, 1]
+        relevance = [1 - span.rank / len(chunks) for span in spans]
+        shingles = [_shingles(span.text) for span in spans]
+        max_similarity = [0.0] * len(spans)
+
+        selected: List[_Span] = []
+        used = 0
+        remaining = list(range(len(spans)))
+        while remaining:
+            best = max(
+                remaining,
+                key=lambda i: self.mmr_lambda * relevance[i] - (1 - self.mmr_lambda) * max_similarity[i],
+            )
+            remaining.remove(best)
+            if max_similarity[best] >= self.redundancy_threshold:
+                continue  # Repeats a span already in the context
+            tokens = self.count_tokens(spans[best].text) + (self._separator_tokens if selected else 0)
+            if used + tokens > self.token_budget:
+                continue  # A shorter, later span may still fit
+            selected.append(spans[best])
+            used += tokens
+            for i in remaining:
+                max_similarity[i] = max(max_similarity[i], _containment(shingles[i], shingles[best]))
+
+        if not selected and spans:
+            # Even the best span alone is over budget: keep its leading tokens
+            best = spans[relevance.index(max(relevance))]
+            best.text = self.tokenizer.decode(self.tokenizer.encode(best.text, disallowed_special=())[: self.token_budget])
+            selected, used = [best], self.count_tokens(best.text)
+
+        return PackedContext(
+            context=SEPARATOR.join(span.text for span in selected),
+            chunks=[chunk for span in selected for chunk in span.chunks],
+            tokens=used,
+            baseline_tokens=baseline_tokens,
+        )
+
+    def _merge(self, chunks: List[Dict[str, Any]]) -> List[_Span]:
+        spans: List[_Span] = []
+        # In document order, each chunk can only extend the span before it
+        order = sorted(
+            range(len(chunks)),
+            key=lambda i: (chunks[i].get("source", ""), chunks[i].get("start_char") is None, chunks[i].get("start_char") or 0),
+        )
+        for rank in order:
+            if not spans or not spans[-1].try_merge(chunks[rank], rank):
+                spans.append(_Span(chunks[rank], rank))
+        return spans
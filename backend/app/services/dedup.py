@@ -0,0 +1,313 @@
+import hashlib
+import json
+import logging
+import re
+import sqlite3
+import threading
+from collections import defaultdict
+from pathlib import Path
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
+
+import numpy as np
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+DEDUP_MODES = ("skip", "link")
+
+_WORD = re.compile(r"\w+")
+_MERSENNE_PRIME = (1 << 61) - 1
+_MAX_HASH = np.uint64(0xFFFFFFFF)
+
+
+class DuplicateMatch(NamedTuple):
+    chunk_id: str
+    source: str
+    similarity: float
+
+
+class NearDuplicateDetector:
+    """
+    MinHash + LSH near-duplicate index over chunk text.
+    Each chunk is reduced to a `num_perm` MinHash signature of its word
+    shingles; the signature is split into `bands` LSH buckets so candidates
+    are found with one indexed lookup, then confirmed when the estimated
+    Jaccard similarity is at least `threshold`. Signatures and bucket keys
+    persist in SQLite, so revisions uploaded later still match. A linked
+    duplicate keeps its own metadata, so it can be indexed in place of the
+    chunk it copies when that one is removed.
+    """
+
+    def __init__(
+        self,
+        path: Path,
+        threshold: float = 0.85,
+        num_perm: int = 128,
+        bands: int = 16,
+        shingle_size: int = 5,
+    ):
+        if num_perm % bands:
+            raise ValueError("num_perm must be a multiple of bands")
+        self.path = path
+        self.threshold = threshold
+        self.num_perm = num_perm
+        self.bands = bands
+        self.shingle_size = shingle_size
+        rng = np.random.RandomState(1)
+        # Permutations h(x) = (a * x + b) mod p; a < 2**31 keeps a * x within uint64
+        self._a = rng.randint(1, 1 << 31, size=num_perm, dtype=np.uint64)
+        self._b = rng.randint(0, 1 << 31, size=num_perm, dtype=np.uint64)
+        self._lock = threading.Lock()
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(str(path), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS signatures (
+                sig_id INTEGER PRIMARY KEY,
+                job_id TEXT NOT NULL,
+                chunk_id TEXT NOT NULL,
+                source TEXT NOT NULL,
+                signature BLOB NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS buckets (
+                key INTEGER NOT NULL,
+                sig_id INTEGER NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS buckets_key ON buckets (key);
+            CREATE INDEX IF NOT EXISTS buckets_sig ON buckets (sig_id);
+            CREATE INDEX IF NOT EXISTS signatures_source ON signatures (source, chunk_id);
+            CREATE TABLE IF NOT EXISTS links (
+                chunk_id TEXT NOT NULL,
+                source TEXT NOT NULL,
+                canonical_id TEXT NOT NULL,
+                canonical_source TEXT NOT NULL,
+                similarity REAL NOT NULL,
+                metadata TEXT
+            );
+            CREATE INDEX IF NOT EXISTS links_canonical ON links (canonical_id, canonical_source);
+            """
+        )
+        columns = [name for _, name, *_ in self._conn.execute("PRAGMA table_info(links)")]
+        if "metadata" not in columns:
+            # Links recorded before duplicates kept their metadata
+            self._conn.execute("ALTER TABLE links ADD COLUMN metadata TEXT")
+        self._conn.commit()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM signatures").fetchone()[0]
+
+    def signature(self, text: str) -> np.ndarray:
+        """MinHash signature (uint32[num_perm]) of the text's word shingles"""
+        words = [w.encode("utf-8") for w in _WORD.findall(text.lower())]
+        if not words:
+            words = [text.encode("utf-8")]
+        # Stable 32-bit word hashes, combined into rolling shingle hashes
+        word_hashes = np.fromiter(
+            (int.from_bytes(hashlib.blake2b(w, digest_size=4).digest(), "little") for w in words),
+            dtype=np.uint64,
+            count=len(words),
+        )
+        k = min(self.shingle_size, len(words))
+        shingles = np.zeros(len(words) - k + 1, dtype=np.uint64)
+        for offset in range(k):
+            shingles = (shingles * np.uint64(1_000_003) + word_hashes[offset : len(words) - k + 1 + offset]) & _MAX_HASH
+        hashed = (np.outer(shingles, self._a) + self._b) % np.uint64(_MERSENNE_PRIME)
+        return (hashed & _MAX_HASH).min(axis=0).astype(np.uint32)
+
+    def bucket_keys(self, signature: np.ndarray) -> List[int]:
+        """One signed 64-bit LSH bucket key per band"""
+        keys = []
+        for band, rows in enumerate(np.split(signature, self.bands)):
+            digest = hashlib.blake2b(band.to_bytes(2, "little") + rows.tobytes(), digest_size=8).digest()
+            keys.append(int.from_bytes(digest, "little", signed=True))
+        return keys
+
+    def similarity(self, a: np.ndarray, b: np.ndarray) -> float:
+        """Estimated Jaccard similarity of two signatures"""
+        return float(np.count_nonzero(a == b)) / self.num_perm
+
+    def find(
+        self, signature: np.ndarray, keys: List[int], exclude_job: str = "", exclude_source: str = ""
+    ) -> Optional[DuplicateMatch]:
+        """
+        Most similar indexed chunk at or above the threshold, ignoring chunks
+        from `exclude_job` and from `exclude_source` (an earlier revision of
+        the document being ingested, whose chunks it replaces)
+        """
+        with self._lock:
+            placeholders = ",".join("?" * len(keys))
+            rows = self._conn.execute(
+                "SELECT chunk_id, source, signature FROM signatures WHERE job_id != ? AND source != ? AND sig_id IN "
+                f"(SELECT sig_id FROM buckets WHERE key IN ({placeholders}))",
+                [exclude_job, exclude_source, *keys],
+            ).fetchall()
+        best = None
+        for chunk_id, source, blob in rows:
+            score = self.similarity(signature, np.frombuffer(blob, dtype=np.uint32))
+            if score >= self.threshold and (best is None or score > best.similarity):
+                best = DuplicateMatch(chunk_id, source, score)
+        return best
+
+    def add(self, job_id: str, entries: List[Tuple[str, str, np.ndarray]]):
+        """Index (chunk_id, source, signature) entries of chunks that were embedded"""
+        with self._lock:
+            for chunk_id, source, signature in entries:
+                sig_id = self._conn.execute(
+                    "INSERT INTO signatures (job_id, chunk_id, source, signature) VALUES (?, ?, ?, ?)",
+                    (job_id, chunk_id, source, signature.tobytes()),
+                ).lastrowid
+                self._conn.executemany(
+                    "INSERT INTO buckets (key, sig_id) VALUES (?, ?)",
+                    [(key, sig_id) for key in self.bucket_keys(signature)],
+                )
+            self._conn.commit()
+
+    def add_links(self, links: List[Tuple[Dict[str, Any], DuplicateMatch]]):
+        """Record (chunk metadata, match) for duplicates linked to an existing chunk"""
+        with self._lock:
+            # A re-uploaded document links its unchanged duplicates again
+            self._conn.executemany(
+                "DELETE FROM links WHERE chunk_id = ? AND source = ?", [(meta["id"], meta["source"]) for meta, _ in links]
+            )
+            self._conn.executemany(
+                "INSERT INTO links (chunk_id, source, canonical_id, canonical_source, similarity, metadata) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                [
+                    (meta["id"], meta["source"], m.chunk_id, m.source, m.similarity, json.dumps(meta))
+                    for meta, m in links
+                ],
+            )
+            self._conn.commit()
+
+    def prune_links(self, source: str, chunk_ids: List[str]):
+        """Forget the links of a re-uploaded source's chunks other than `chunk_ids`, those it still has"""
+        keep = set(chunk_ids)
+        with self._lock:
+            linked = [row[0] for row in self._conn.execute("SELECT chunk_id FROM links WHERE source = ?", (source,))]
+            self._conn.executemany(
+                "DELETE FROM links WHERE chunk_id = ? AND source = ?",
+                [(chunk_id, source) for chunk_id in linked if chunk_id not in keep],
+            )
+            self._conn.commit()
+
+    def remove(self, source: str, chunk_ids: Optional[List[str]] = None) -> List[Dict[str, Any]]:
+        """
+        Forget deleted chunks of a source (all of them by default): their
+        signatures, and links from or to them. Returns the metadata of the
+        chunks of other sources that were linked to a removed chunk: they are
+        no longer indexed anywhere, and must be indexed again (see
+        `jobs.restore_linked_chunks`).
+        """
+        with self._lock:
+            orphaned = self._linked_to(source, chunk_ids)
+            if chunk_ids is None:
+                self._conn.execute(
+                    "DELETE FROM buckets WHERE sig_id IN (SELECT sig_id FROM signatures WHERE source = ?)", (source,)
+                )
+                self._conn.execute("DELETE FROM signatures WHERE source = ?", (source,))
+                self._conn.execute("DELETE FROM links WHERE source = ? OR canonical_source = ?", (source, source))
+            else:
+                chunks = [(chunk_id, source) for chunk_id in chunk_ids]
+                self._conn.executemany(
+                    "DELETE FROM buckets WHERE sig_id IN (SELECT sig_id FROM signatures WHERE chunk_id = ? AND source = ?)",
+                    chunks,
+                )
+                self._conn.executemany("DELETE FROM signatures WHERE chunk_id = ? AND source = ?", chunks)
+                self._conn.executemany("DELETE FROM links WHERE chunk_id = ? AND source = ?", chunks)
+                self._conn.executemany("DELETE FROM links WHERE canonical_id = ? AND canonical_source = ?", chunks)
+            self._conn.commit()
+        return orphaned
+
+    def _linked_to(self, source: str, chunk_ids: Optional[List[str]]) -> List[Dict[str, Any]]:
+        """Metadata of other sources' chunks linked to the given chunks of `source`; the caller holds the lock"""
+        if chunk_ids is None:
+            rows = self._conn.execute(
+                "SELECT chunk_id, metadata FROM links WHERE canonical_source = ? AND source != ?", (source, source)
+            ).fetchall()
+        else:
+            rows = []
+            for chunk_id in chunk_ids:
+                rows += self._conn.execute(
+                    "SELECT chunk_id, metadata FROM links WHERE canonical_id = ? AND canonical_source = ? AND source != ?",
+                    (chunk_id, source, source),
+                ).fetchall()
+        orphaned = [json.loads(metadata) for _, metadata in rows if metadata is not None]
+        if len(orphaned) < len(rows):
+            logger.warning(
+                "%d chunks linked to removed chunks of %s were recorded without their text and cannot be "
+                "indexed again; re-upload their documents",
+                len(rows) - len(orphaned),
+                source,
+            )
+        return orphaned
+
+    def links(self, canonical_id: str, canonical_source: str) -> List[Dict[str, str]]:
+        """Chunks that were linked to the given chunk instead of being indexed"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT chunk_id, source, similarity FROM links WHERE canonical_id = ? AND canonical_source = ?",
+                (canonical_id, canonical_source),
+            ).fetchall()
+        return [{"id": chunk_id, "source": source, "similarity": similarity} for chunk_id, source, similarity in rows]
+
+    def session(self, job_id: str) -> "DedupSession":
+        return DedupSession(self, job_id)
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+def create_detector(storage_dir: Path = settings.STORAGE_PATH) -> Optional[NearDuplicateDetector]:
+    if not settings.DEDUP_ENABLED:
+        return None
+    if settings.DEDUP_MODE not in DEDUP_MODES:
+        raise ValueError(f"Unknown dedup mode: {settings.DEDUP_MODE}. Expected one of {DEDUP_MODES}")
+    return NearDuplicateDetector(
+        path=storage_dir / "dedup.sqlite3",
+        threshold=settings.DEDUP_THRESHOLD,
+        num_perm=settings.DEDUP_NUM_PERM,
+        bands=settings.DEDUP_BANDS,
+    )
+
+
+class DedupSession:
+    """
+    Duplicate checks for one ingestion run.
+    Chunks kept earlier in the run are matched from memory, since their
+    signatures are only persisted once their batch is indexed. Persisted
+    signatures from the same job are ignored, so a resumed run makes the
+    same decisions as the first attempt.
+    """
+
+    def __init__(self, detector: NearDuplicateDetector, job_id: str):
+        self.detector = detector
+        self.job_id = job_id
+        self._pending: Dict[int, List[Tuple[str, str, np.ndarray]]] = defaultdict(list)
+        self.checked = 0
+        self.duplicates = 0
+
+    def check(self, chunk_id: str, source: str, text: str) -> Tuple[np.ndarray, Optional[DuplicateMatch]]:
+        """Signature of the chunk and the chunk it duplicates, if any"""
+        signature = self.detector.signature(text)
+        keys = self.detector.bucket_keys(signature)
+        match = self.detector.find(signature, keys, exclude_job=self.job_id, exclude_source=source)
+
+        for key in keys:
+            for other_id, other_source, other in self._pending.get(key, ()):
+                score = self.detector.similarity(signature, other)
+                if score >= self.detector.threshold and (match is None or score > match.similarity):
+                    match = DuplicateMatch(other_id, other_source, score)
+
+        self.checked += 1
+        if match is None:
+            for key in keys:
+                self._pending[key].append((chunk_id, source, signature))
+        else:
+            self.duplicates += 1
+        return signature, match
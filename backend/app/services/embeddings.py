@@ -1,32 +1,275 @@
-from typing import List
-from google import genai
+import asyncio
+import hashlib
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
+
+import numpy as np
 
 from app.config import settings
+from app.services.concurrency import limiter
+from app.services.embedding_cache import EmbeddingCache
+from app.services.gemini_client import client
+from app.services.single_flight import SingleFlight
+from app.services.tracing import span
+
+
+class EmbeddingBackend:
+    """Interface for anything that can embed a batch of texts in one call"""
+
+    def embed_batch(self, texts: List[str]) -> List[List[float]]:
+        raise NotImplementedError
+
+    async def aembed_batch(self, texts: List[str]) -> List[List[float]]:
+        """Async variant; backends without a native async client use a worker thread"""
+        return await limiter.offload(self.embed_batch, texts)
+
+
+class GeminiEmbeddingBackend(EmbeddingBackend):
+    def __init__(self, model: str = settings.EMBEDDING_MODEL, output_dimensionality: Optional[int] = None):
+        self.model = model
+        self.config = None
+        if output_dimensionality:
+            # Smaller embeddings are computed by the model itself when requested
+            from google.genai import types
+
+            self.config = types.EmbedContentConfig(output_dimensionality=output_dimensionality)
+
+    def embed_batch(self, texts: List[str]) -> List[List[float]]:
+        result = client.models.embed_content(
+            model=self.model,
+            contents=texts,
+            config=self.config,
+        )
+        return [embedding.values for embedding in result.embeddings]
+
+    async def aembed_batch(self, texts: List[str]) -> List[List[float]]:
+        result = await client.aio.models.embed_content(
+            model=self.model,
+            contents=texts,
+            config=self.config,
+        )
+        return [embedding.values for embedding in result.embeddings]
+
+
+class FakeEmbeddingBackend(EmbeddingBackend):
+    """
+    Deterministic local backend for offline benchmarks.
+    The same text always maps to the same unit vector; `latency` simulates
+    the round trip of one remote call.
+    """
+
+    def __init__(self, dim: int = settings.EMBEDDING_DIMENSION, latency: float = 0.0):
+        self.dim = dim
+        self.latency = latency
+        self.calls = 0
+
+    def embed_text(self, text: str) -> List[float]:
+        seed = int.from_bytes(hashlib.blake2b(text.encode("utf-8"), digest_size=8).digest(), "little")
+        vector = np.random.default_rng(seed).standard_normal(self.dim).astype("float32")
+        vector /= np.linalg.norm(vector)
+        return vector.tolist()
+
+    def embed_batch(self, texts: List[str]) -> List[List[float]]:
+        self.calls += 1
+        if self.latency:
+            time.sleep(self.latency)
+        return [self.embed_text(text) for text in texts]
+
+    async def aembed_batch(self, texts: List[str]) -> List[List[float]]:
+        self.calls += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        return [self.embed_text(text) for text in texts]
 
-# Create Gemini client
-client = genai.Client(api_key=settings.GEMINI_API_KEY)
+
+def storage_dimension() -> int:
+    """Dimension of the vectors the service returns and the store holds"""
+    return settings.EMBEDDING_OUTPUT_DIMENSION or settings.EMBEDDING_DIMENSION
+
+
+def reduce_dimension(embeddings: List[List[float]], dim: int) -> List[List[float]]:
+    """
+    Keep the leading `dim` components and rescale to unit length.
+    Gemini embeddings are Matryoshka-trained, so a prefix is itself a usable
+    embedding; reduced outputs are not normalized by the API either.
+    """
+    if not len(embeddings):
+        return embeddings
+    vectors = np.asarray(embeddings, dtype=np.float32)[:, :dim]
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return (vectors / np.where(norms > 0, norms, 1)).tolist()
+
+
+def create_backend(name: str = settings.EMBEDDING_BACKEND) -> EmbeddingBackend:
+    if name == "gemini":
+        return GeminiEmbeddingBackend(output_dimensionality=settings.EMBEDDING_OUTPUT_DIMENSION or None)
+    if name == "fake":
+        return FakeEmbeddingBackend()
+    raise ValueError(f"Unknown embedding backend: {name}")
+
+
+def create_cache() -> Optional[EmbeddingCache]:
+    if not settings.EMBEDDING_CACHE_ENABLED:
+        return None
+    return EmbeddingCache(
+        path=settings.STORAGE_PATH / "embedding_cache.sqlite3",
+        model=settings.EMBEDDING_MODEL,
+        dim=storage_dimension(),
+        max_entries=settings.EMBEDDING_CACHE_MAX_ENTRIES,
+    )
 
 
 class EmbeddingService:
-    def __init__(self):
+    def __init__(
+        self,
+        backend: Optional[EmbeddingBackend] = None,
+        batch_size: int = settings.EMBEDDING_BATCH_SIZE,
+        max_concurrency: int = settings.EMBEDDING_MAX_CONCURRENCY,
+        cache: Optional[EmbeddingCache] = None,
+        output_dimension: int = settings.EMBEDDING_OUTPUT_DIMENSION,
+        in_flight: Optional[SingleFlight] = None,
+    ):
         self.model = settings.EMBEDDING_MODEL
+        self.backend = backend or create_backend()
+        self.batch_size = batch_size
+        self.max_concurrency = max_concurrency
+        self.cache = cache
+        # 0 keeps whatever dimension the backend returns
+        self.output_dimension = output_dimension
+        # Texts another caller is embedding right now are waited for, not re-sent
+        self.in_flight = in_flight
 
-    def embed_texts(self, texts: List[str], batch_size: int = 32) -> List[List[float]]:
+    def embed_texts(self, texts: List[str], batch_size: Optional[int] = None) -> List[List[float]]:
         """
-        Generate embeddings for a list of texts using Gemini.
+        Generate embeddings for a list of texts.
+        Cached vectors are reused; only unseen texts go to the backend.
         Returns embeddings in the same order as input.
         """
+        if self.cache is None:
+            if self.in_flight is None:
+                return self._embed_uncached(texts, batch_size)
+            embeddings = [None] * len(texts)
+        else:
+            with span("embedding_cache"):
+                embeddings = self.cache.get_many(texts)
+        # Each distinct missing text is embedded once, even if repeated
+        missing = list(dict.fromkeys(t for t, e in zip(texts, embeddings) if e is None))
+        if missing:
+            fresh = self._embed_missing(missing, batch_size)
+            embeddings = [e if e is not None else fresh[t] for t, e in zip(texts, embeddings)]
+        return embeddings
+
+    def _embed_missing(self, texts: List[str], batch_size: Optional[int]) -> Dict[str, List[float]]:
+        """Embed and cache distinct texts, sharing those already in flight"""
+        fresh: Dict[str, List[float]] = {}
+        while texts:
+            if self.in_flight is None:
+                led, waiting = texts, {}
+            else:
+                led, waiting = self.in_flight.claim(texts)
+            if led:
+                try:
+                    embeddings = self._embed_uncached(led, batch_size)
+                    if self.cache is not None:
+                        self.cache.put_many(led, embeddings)
+                except BaseException as e:
+                    if self.in_flight is not None:
+                        self.in_flight.fail(led, e)
+                    raise
+                if self.in_flight is not None:
+                    self.in_flight.resolve(led, embeddings)
+                fresh.update(zip(led, embeddings))
+            # Waited for only after resolving our own texts, so callers waiting on each other cannot deadlock
+            if waiting:
+                with span("embedding_coalesced"):
+                    fresh.update(SingleFlight.wait(waiting))
+            # Texts whose embedding call was cancelled are claimed again
+            texts = [t for t in waiting if t not in fresh]
+        return fresh
+
+    def _embed_uncached(self, texts: List[str], batch_size: Optional[int] = None) -> List[List[float]]:
+        """
+        Texts are sent `batch_size` at a time with up to `max_concurrency`
+        batches in flight. Returns embeddings in the same order as input.
+        """
+        batch_size = batch_size or self.batch_size
+        batches = [texts[i : i + batch_size] for i in range(0, len(texts), batch_size)]
+        if not batches:
+            return []
+
+        with span("embedding_api"):
+            if len(batches) == 1 or self.max_concurrency <= 1:
+                results = [self.backend.embed_batch(batch) for batch in batches]
+            else:
+                workers = min(self.max_concurrency, len(batches))
+                with ThreadPoolExecutor(max_workers=workers) as executor:
+                    # map() yields in submission order, so output order is preserved
+                    results = list(executor.map(self.backend.embed_batch, batches))
+
         all_embeddings: List[List[float]] = []
+        for batch_embeddings in results:
+            all_embeddings.extend(batch_embeddings)
+        if self.output_dimension:
+            all_embeddings = reduce_dimension(all_embeddings, self.output_dimension)
+        return all_embeddings
+
+    async def aembed_texts(self, texts: List[str], batch_size: Optional[int] = None) -> List[List[float]]:
+        """Async variant of `embed_texts` that never blocks the event loop"""
+        if self.cache is None:
+            if self.in_flight is None:
+                return await self._aembed_uncached(texts, batch_size)
+            embeddings = [None] * len(texts)
+        else:
+            with span("embedding_cache"):
+                embeddings = await limiter.offload(self.cache.get_many, texts)
+        missing = list(dict.fromkeys(t for t, e in zip(texts, embeddings) if e is None))
+        if missing:
+            fresh = await self._aembed_missing(missing, batch_size)
+            embeddings = [e if e is not None else fresh[t] for t, e in zip(texts, embeddings)]
+        return embeddings
 
-        for i in range(0, len(texts), batch_size):
-            batch = texts[i : i + batch_size]
+    async def _aembed_missing(self, texts: List[str], batch_size: Optional[int]) -> Dict[str, List[float]]:
+        """Async variant of `_embed_missing`"""
+        fresh: Dict[str, List[float]] = {}
+        while texts:
+            if self.in_flight is None:
+                led, waiting = texts, {}
+            else:
+                led, waiting = self.in_flight.claim(texts)
+            if led:
+                try:
+                    embeddings = await self._aembed_uncached(led, batch_size)
+                    if self.cache is not None:
+                        await limiter.offload(self.cache.put_many, led, embeddings)
+                except BaseException as e:
+                    if self.in_flight is not None:
+                        self.in_flight.fail(led, e)
+                    raise
+                if self.in_flight is not None:
+                    self.in_flight.resolve(led, embeddings)
+                fresh.update(zip(led, embeddings))
+            if waiting:
+                with span("embedding_coalesced"):
+                    fresh.update(await SingleFlight.await_all(waiting))
+            texts = [t for t in waiting if t not in fresh]
+        return fresh
 
-            # Generate embeddings for each text in the batch
-            for text in batch:
-                result = client.models.embed_content(
-                    model=self.model,
-                    contents=text  # Changed from 'content' to 'contents'
-                )
-                all_embeddings.append(result.embeddings[0].values)
+    async def _aembed_uncached(self, texts: List[str], batch_size: Optional[int] = None) -> List[List[float]]:
+        batch_size = batch_size or self.batch_size
+        batches = [texts[i : i + batch_size] for i in range(0, len(texts), batch_size)]
+        in_flight = asyncio.Semaphore(self.max_concurrency)
 
-        return all_embeddings
\ No newline at end of file
+        async def embed(batch: List[str]) -> List[List[float]]:
+            # Bounded per call and by the global "embed" stage limit
+            async with in_flight, limiter.stage("embed"):
+                return await self.backend.aembed_batch(batch)
+
+        all_embeddings: List[List[float]] = []
+        with span("embedding_api"):
+            results = await asyncio.gather(*(embed(batch) for batch in batches))
+        for batch_embeddings in results:
+            all_embeddings.extend(batch_embeddings)
+        if self.output_dimension:
+            all_embeddings = reduce_dimension(all_embeddings, self.output_dimension)
+        return all_embeddings
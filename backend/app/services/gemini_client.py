@@ -0,0 +1,33 @@
+import threading
+from typing import Any
+
+from app.config import settings
+
+
+class LazyGeminiClient:
+    """
+    Stands in for `genai.Client` until an attribute is first used.
+    Importing google-genai and building the client are a noticeable share of
+    cold start, and paths that never call Gemini (fake embeddings, cache
+    hits, lexical retrieval) should not pay for them.
+    """
+
+    def __init__(self):
+        self._client = None
+        self._lock = threading.Lock()
+
+    def get(self):
+        if self._client is None:
+            with self._lock:
+                if self._client is None:
+                    from google import genai
+
+                    self._client = genai.Client(api_key=settings.GEMINI_API_KEY)
+        return self._client
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self.get(), name)
+
+
+# Shared by the embedding and generation services
+client = LazyGeminiClient()
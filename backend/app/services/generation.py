@@ -1,35 +1,31 @@
 import time
-from google import genai
-from google.genai import types
-from typing import List, Dict, Any
-import tiktoken
+from typing import List, Dict, Any, AsyncIterator, Optional, Tuple, TYPE_CHECKING
 
 from app.config import settings
+from app.services.concurrency import limiter
+from app.services.gemini_client import client
+from app.services.single_flight import SingleFlight
+from app.services.stream_parser import JsonArrayStreamParser
+from app.services.tokenizer import get_tokenizer
+from app.services.tracing import span
 
-# Create Gemini client
-client = genai.Client(api_key=settings.GEMINI_API_KEY)
-
-# Token counter (using tiktoken as approximation for Gemini)
-tokenizer = tiktoken.get_encoding("cl100k_base")
+if TYPE_CHECKING:
+    from google.genai import types
 
 
 class QuizGenerator:
-    def __init__(self):
+    def __init__(self, in_flight: Optional[SingleFlight] = None):
         self.model = settings.GEMINI_MODEL
-        
+        # Identical prompts generated concurrently share one LLM call
+        self.in_flight = in_flight
+
     def count_tokens(self, text: str) -> int:
         """Approximate token count for metrics"""
-        return len(tokenizer.encode(text))
-    
-    def generate_with_rag(
-        self, 
-        context: str, 
-        num_questions: int = 5
-    ) -> Dict[str, Any]:
-        """Generate Jeopardy questions using RAG (with retrieved context)"""
-        start_time = time.time()
-        
-        prompt = f"""You are a Jeopardy quiz master. Based on the following context, create {num_questions} Jeopardy-style questions.
+        with span("count_tokens"):
+            return len(get_tokenizer().encode(text))
+
+    def build_rag_prompt(self, context: str, num_questions: int) -> str:
+        return f"""You are a Jeopardy quiz master. Based on the following context, create {num_questions} Jeopardy-style questions.
 
 Context:
 {context}
@@ -53,48 +49,8 @@ Return ONLY a JSON array with this exact format:
 
 JSON array:"""
 
-        prompt_tokens = self.count_tokens(prompt)
-        
-        response = client.models.generate_content(
-            model=self.model,
-            contents=prompt,
-            config=types.GenerateContentConfig(
-                temperature=settings.TEMPERATURE,
-            )
-        )
-        
-        response_text = response.text.strip()
-        # Clean up markdown code blocks if present
-        if response_text.startswith("```"):
-            response_text = response_text.split("```")[1]
-            if response_text.startswith("json"):
-                response_text = response_text[4:]
-            response_text = response_text.strip()
-        
-        completion_tokens = self.count_tokens(response_text)
-        elapsed_time = time.time() - start_time
-        
-        return {
-            "questions": response_text,
-            "metrics": {
-                "method": "rag",
-                "prompt_tokens": prompt_tokens,
-                "completion_tokens": completion_tokens,
-                "total_tokens": prompt_tokens + completion_tokens,
-                "time_seconds": elapsed_time,
-                "context_length": len(context)
-            }
-        }
-    
-    def generate_without_rag(
-        self, 
-        topic: str, 
-        num_questions: int = 5
-    ) -> Dict[str, Any]:
-        """Generate Jeopardy questions WITHOUT RAG (no specific context)"""
-        start_time = time.time()
-        
-        prompt = f"""You are a Jeopardy quiz master. Create {num_questions} Jeopardy-style questions about: {topic}
+    def build_topic_prompt(self, topic: str, num_questions: int) -> str:
+        return f"""You are a Jeopardy quiz master. Create {num_questions} Jeopardy-style questions about: {topic}
 
 Requirements:
 1. Format each question as a Jeopardy clue (statement form)
@@ -114,35 +70,189 @@ Return ONLY a JSON array with this exact format:
 
 JSON array:"""
 
-        prompt_tokens = self.count_tokens(prompt)
-        
-        response = client.models.generate_content(
-            model=self.model,
-            contents=prompt,
-            config=types.GenerateContentConfig(
-                temperature=settings.TEMPERATURE,
-            )
+    def _generation_config(self) -> "types.GenerateContentConfig":
+        # Imported here: google.genai.types is slow to import and only needed once Gemini is called
+        from google.genai import types
+
+        return types.GenerateContentConfig(
+            temperature=settings.TEMPERATURE,
         )
-        
-        response_text = response.text.strip()
-        # Clean up markdown code blocks if present
-        if response_text.startswith("```"):
-            response_text = response_text.split("```")[1]
-            if response_text.startswith("json"):
-                response_text = response_text[4:]
+
+    def _build_result(
+        self,
+        method: str,
+        response_text: str,
+        prompt_tokens: int,
+        start_time: float,
+        context_length: int,
+    ) -> Dict[str, Any]:
+        response_text = self._strip_code_fences(response_text)
+        return {
+            "questions": response_text,
+            "metrics": self._build_metrics(method, response_text, prompt_tokens, start_time, context_length),
+        }
+
+    def _strip_code_fences(self, response_text: str) -> str:
+        with span("strip_fences"):
             response_text = response_text.strip()
-        
+            # Clean up markdown code blocks if present
+            if response_text.startswith("```"):
+                response_text = response_text.split("```")[1]
+                if response_text.startswith("json"):
+                    response_text = response_text[4:]
+                response_text = response_text.strip()
+            return response_text
+
+    def _build_metrics(
+        self,
+        method: str,
+        response_text: str,
+        prompt_tokens: int,
+        start_time: float,
+        context_length: int,
+    ) -> Dict[str, Any]:
         completion_tokens = self.count_tokens(response_text)
         elapsed_time = time.time() - start_time
-        
+
         return {
-            "questions": response_text,
-            "metrics": {
-                "method": "no_rag",
-                "prompt_tokens": prompt_tokens,
-                "completion_tokens": completion_tokens,
-                "total_tokens": prompt_tokens + completion_tokens,
-                "time_seconds": elapsed_time,
-                "context_length": 0
-            }
+            "method": method,
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens,
+            "time_seconds": elapsed_time,
+            "context_length": context_length
         }
+
+    def _coalesce_key(self, method: str, prompt: str) -> Tuple[str, float, str, str]:
+        return (self.model, settings.TEMPERATURE, method, prompt)
+
+    @staticmethod
+    def _shared_result(result: Dict[str, Any], coalesced: bool, start_time: float) -> Dict[str, Any]:
+        """
+        A caller's own copy of a coalesced call's result (callers add to its
+        metrics). Callers that waited on another's call report their own wait.
+        """
+        metrics = {**result["metrics"], "coalesced": coalesced}
+        if coalesced:
+            metrics["time_seconds"] = time.time() - start_time
+        return {"questions": result["questions"], "metrics": metrics}
+
+    def _generate(self, method: str, prompt: str, context_length: int) -> Dict[str, Any]:
+        if self.in_flight is None:
+            return self._generate_uncoalesced(method, prompt, context_length)
+        start_time = time.time()
+        result, coalesced = self.in_flight.do(
+            self._coalesce_key(method, prompt), self._generate_uncoalesced, method, prompt, context_length
+        )
+        return self._shared_result(result, coalesced, start_time)
+
+    def _generate_uncoalesced(self, method: str, prompt: str, context_length: int) -> Dict[str, Any]:
+        start_time = time.time()
+        prompt_tokens = self.count_tokens(prompt)
+
+        with span("llm"):
+            response = client.models.generate_content(
+                model=self.model,
+                contents=prompt,
+                config=self._generation_config()
+            )
+
+        return self._build_result(method, response.text, prompt_tokens, start_time, context_length)
+
+    async def _agenerate(self, method: str, prompt: str, context_length: int) -> Dict[str, Any]:
+        if self.in_flight is None:
+            return await self._agenerate_uncoalesced(method, prompt, context_length)
+        start_time = time.time()
+        result, coalesced = await self.in_flight.ado(
+            self._coalesce_key(method, prompt), self._agenerate_uncoalesced, method, prompt, context_length
+        )
+        return self._shared_result(result, coalesced, start_time)
+
+    async def _agenerate_uncoalesced(self, method: str, prompt: str, context_length: int) -> Dict[str, Any]:
+        start_time = time.time()
+        # Tokenizing a large prompt or response would block the event loop
+        prompt_tokens = await limiter.offload(self.count_tokens, prompt)
+
+        with span("llm"):
+            async with limiter.stage("llm"):
+                response = await client.aio.models.generate_content(
+                    model=self.model,
+                    contents=prompt,
+                    config=self._generation_config()
+                )
+
+        return await limiter.offload(
+            self._build_result, method, response.text, prompt_tokens, start_time, context_length
+        )
+
+    def generate_with_rag(
+        self,
+        context: str,
+        num_questions: int = 5
+    ) -> Dict[str, Any]:
+        """Generate Jeopardy questions using RAG (with retrieved context)"""
+        prompt = self.build_rag_prompt(context, num_questions)
+        return self._generate("rag", prompt, len(context))
+
+    def generate_without_rag(
+        self,
+        topic: str,
+        num_questions: int = 5
+    ) -> Dict[str, Any]:
+        """Generate Jeopardy questions WITHOUT RAG (no specific context)"""
+        prompt = self.build_topic_prompt(topic, num_questions)
+        return self._generate("no_rag", prompt, 0)
+
+    async def agenerate_with_rag(self, context: str, num_questions: int = 5) -> Dict[str, Any]:
+        """Async variant of `generate_with_rag` using the async Gemini client"""
+        prompt = self.build_rag_prompt(context, num_questions)
+        return await self._agenerate("rag", prompt, len(context))
+
+    async def agenerate_without_rag(self, topic: str, num_questions: int = 5) -> Dict[str, Any]:
+        """Async variant of `generate_without_rag` using the async Gemini client"""
+        prompt = self.build_topic_prompt(topic, num_questions)
+        return await self._agenerate("no_rag", prompt, 0)
+
+    async def _astream(
+        self, method: str, prompt: str, context_length: int
+    ) -> AsyncIterator[Tuple[str, Dict[str, Any]]]:
+        start_time = time.time()
+        prompt_tokens = await limiter.offload(self.count_tokens, prompt)
+        parser = JsonArrayStreamParser()
+        text_parts: List[str] = []
+        first_question_time = None
+
+        with span("llm"):
+            async with limiter.stage("llm"):
+                stream = await client.aio.models.generate_content_stream(
+                    model=self.model,
+                    contents=prompt,
+                    config=self._generation_config()
+                )
+                async for chunk in stream:
+                    text = chunk.text or ""
+                    text_parts.append(text)
+                    for question in parser.feed(text):
+                        if first_question_time is None:
+                            first_question_time = time.time() - start_time
+                        yield "question", question
+
+        response_text = self._strip_code_fences("".join(text_parts))
+        metrics = await limiter.offload(
+            self._build_metrics, method, response_text, prompt_tokens, start_time, context_length
+        )
+        metrics["time_to_first_question"] = first_question_time
+        yield "metrics", metrics
+
+    def astream_with_rag(self, context: str, num_questions: int = 5) -> AsyncIterator[Tuple[str, Dict[str, Any]]]:
+        """
+        Stream RAG questions as they are generated.
+        Yields ("question", dict) for each completed JSON object, then ("metrics", dict).
+        """
+        prompt = self.build_rag_prompt(context, num_questions)
+        return self._astream("rag", prompt, len(context))
+
+    def astream_without_rag(self, topic: str, num_questions: int = 5) -> AsyncIterator[Tuple[str, Dict[str, Any]]]:
+        """Streaming variant of `generate_without_rag`; see `astream_with_rag`"""
+        prompt = self.build_topic_prompt(topic, num_questions)
+        return self._astream("no_rag", prompt, 0)
@@ -0,0 +1,224 @@
+from typing import Optional, Tuple
+
+import faiss
+import numpy as np
+
+from app.config import settings
+
+INDEX_TYPES = ("flat", "ivf_flat", "ivf_pq", "hnsw")
+QUANTIZATIONS = ("none", "fp16", "int8")
+
+_SQ_TYPES = {"fp16": faiss.ScalarQuantizer.QT_fp16, "int8": faiss.ScalarQuantizer.QT_8bit}
+# int8 needs per-dimension value ranges, estimated from this many vectors
+SQ_TRAINING_POINTS = 1000
+
+# FAISS k-means wants roughly this many training points per centroid
+POINTS_PER_CENTROID = 39
+PQ_CENTROIDS = 256  # 8 bits per sub-quantizer code
+
+
+def _pq_subquantizers(dim: int, requested: int) -> int:
+    """Largest divisor of `dim` not above `requested` (IVF-PQ requires dim % m == 0)"""
+    for m in range(min(requested, dim), 0, -1):
+        if dim % m == 0:
+            return m
+    return 1
+
+
+def build_index(
+    index_type: str,
+    dim: int,
+    nlist: int = settings.IVF_NLIST,
+    quantization: str = settings.VECTOR_QUANTIZATION,
+) -> faiss.Index:
+    """
+    Create an empty (possibly untrained) index of the requested type.
+    `quantization` stores vectors as float16 or int8 codes instead of
+    float32 (2x / 4x smaller); IVF-PQ is already compressed and ignores it.
+    """
+    if quantization not in QUANTIZATIONS:
+        raise ValueError(f"Unknown quantization: {quantization}. Expected one of {QUANTIZATIONS}")
+    sq_type = _SQ_TYPES.get(quantization)
+    if index_type == "flat":
+        if sq_type is not None:
+            return faiss.IndexScalarQuantizer(dim, sq_type, faiss.METRIC_L2)
+        return faiss.IndexFlatL2(dim)
+    if index_type == "hnsw":
+        if sq_type is not None:
+            index = faiss.IndexHNSWSQ(dim, sq_type, settings.HNSW_M)
+        else:
+            index = faiss.IndexHNSWFlat(dim, settings.HNSW_M)
+        index.hnsw.efConstruction = settings.HNSW_EF_CONSTRUCTION
+        index.hnsw.efSearch = settings.HNSW_EF_SEARCH
+        return index
+    if index_type == "ivf_flat":
+        if sq_type is not None:
+            index = faiss.IndexIVFScalarQuantizer(faiss.IndexFlatL2(dim), dim, nlist, sq_type, faiss.METRIC_L2)
+        else:
+            index = faiss.IndexIVFFlat(faiss.IndexFlatL2(dim), dim, nlist)
+    elif index_type == "ivf_pq":
+        m = _pq_subquantizers(dim, settings.IVF_PQ_M)
+        index = faiss.IndexIVFPQ(faiss.IndexFlatL2(dim), dim, nlist, m, 8)
+    else:
+        raise ValueError(f"Unknown index type: {index_type}. Expected one of {INDEX_TYPES}")
+    index.nprobe = settings.IVF_NPROBE
+    return index
+
+
+def training_threshold(
+    index_type: str,
+    nlist: int = settings.IVF_NLIST,
+    quantization: str = settings.VECTOR_QUANTIZATION,
+) -> int:
+    """Number of vectors needed before an index of this type can be trained"""
+    if index_type == "ivf_flat":
+        return nlist * POINTS_PER_CENTROID
+    if index_type == "ivf_pq":
+        return max(nlist, PQ_CENTROIDS) * POINTS_PER_CENTROID
+    if quantization == "int8":
+        return SQ_TRAINING_POINTS
+    return 0
+
+
+def train_from(
+    source: faiss.Index,
+    index_type: str,
+    nlist: int = settings.IVF_NLIST,
+    quantization: str = settings.VECTOR_QUANTIZATION,
+) -> faiss.Index:
+    """
+    Build a trained index of `index_type` holding every vector in `source`
+    (normally the flat index used while too few vectors existed to train),
+    under the same ids.
+    """
+    ids, vectors = vectors_with_ids(source)
+    index = build_index(index_type, source.d, nlist, quantization)
+    if not index.is_trained:
+        index.train(vectors)
+    index = with_ids(index)
+    index.add_with_ids(vectors, ids)
+    return index
+
+
+def with_ids(index: faiss.Index) -> faiss.Index:
+    """
+    The index, able to store caller-chosen ids (the vector store's rows):
+    IVF indexes do natively, others are wrapped in an IndexIDMap. Vectors
+    already in a bare index keep their positions as ids, which is what they
+    were before rows became ids.
+    """
+    if isinstance(index, (faiss.IndexIVF, faiss.IndexIDMap)):
+        return index
+    if index.ntotal == 0:
+        return faiss.IndexIDMap(index)
+    # IndexIDMap only accepts an empty index; wrap an empty placeholder, then
+    # swap the populated one in (the wrapper takes ownership of it)
+    wrapped = faiss.IndexIDMap(faiss.IndexFlat(index.d, index.metric_type))
+    index.this.disown()
+    wrapped.index = index
+    wrapped.own_fields = True
+    wrapped.is_trained = index.is_trained
+    wrapped.ntotal = index.ntotal
+    faiss.copy_array_to_vector(np.arange(index.ntotal, dtype=np.int64), wrapped.id_map)
+    return wrapped
+
+
+def unwrap(index: faiss.Index) -> faiss.Index:
+    """The index holding the vectors, inside any IndexIDMap"""
+    if isinstance(index, faiss.IndexIDMap):
+        return faiss.downcast_index(index.index)
+    return index
+
+
+def index_ids(index: faiss.Index) -> np.ndarray:
+    """Ids of every vector in an index built by `with_ids`, in storage order"""
+    if isinstance(index, faiss.IndexIDMap):
+        return faiss.vector_to_array(index.id_map)
+    if isinstance(index, faiss.IndexIVF):
+        invlists = index.invlists
+        ids = [np.empty(0, dtype=np.int64)]
+        for list_no in range(index.nlist):
+            size = invlists.list_size(list_no)
+            if size:
+                ids.append(faiss.rev_swig_ptr(invlists.get_ids(list_no), size).copy())
+        return np.concatenate(ids)
+    return np.arange(index.ntotal, dtype=np.int64)
+
+
+def vectors_with_ids(index: faiss.Index) -> Tuple[np.ndarray, np.ndarray]:
+    """(ids, vectors) of every stored vector; see `all_vectors`"""
+    if isinstance(index, faiss.IndexIVF):
+        ids = index_ids(index)
+        # Ids are arbitrary rows, so reconstruct through a hash table direct map
+        index.set_direct_map_type(faiss.DirectMap.Hashtable)
+        vectors = index.reconstruct_batch(ids) if len(ids) else np.empty((0, index.d), dtype=np.float32)
+        index.set_direct_map_type(faiss.DirectMap.NoMap)
+        return ids, vectors
+    return index_ids(index), all_vectors(unwrap(index))
+
+
+def all_vectors(index: faiss.Index) -> np.ndarray:
+    """Every stored vector, decoded to float32 (approximate for compressed indexes)"""
+    if isinstance(index, faiss.IndexIVF):
+        index.make_direct_map()
+    return index.reconstruct_n(0, index.ntotal)
+
+
+def remove_ids(index: faiss.Index, ids) -> faiss.Index:
+    """
+    The index without the vectors of `ids` (an index built by `with_ids`).
+    HNSW graphs cannot drop nodes, so they are rebuilt from the vectors
+    that remain; the rebuilt index is returned in place of the old one.
+    """
+    ids = np.fromiter(ids, dtype=np.int64)
+    inner = unwrap(index)
+    if isinstance(inner, faiss.IndexHNSW):
+        all_ids, vectors = vectors_with_ids(index)
+        keep = ~np.isin(all_ids, ids)
+        # A reset copy keeps the trained quantizer and graph parameters
+        fresh = faiss.clone_index(inner)
+        fresh.reset()
+        rebuilt = with_ids(fresh)
+        rebuilt.add_with_ids(vectors[keep], all_ids[keep])
+        return rebuilt
+    index.remove_ids(faiss.IDSelectorBatch(ids))
+    return index
+
+
+def search_params(
+    index: faiss.Index,
+    nprobe: Optional[int] = None,
+    ef_search: Optional[int] = None,
+    selector: Optional[faiss.IDSelector] = None,
+) -> Optional[faiss.SearchParameters]:
+    """
+    Per-query search parameters: `nprobe` (IVF), `efSearch` (HNSW) and an
+    id `selector` restricting which vectors may be returned. The caller
+    keeps `selector` alive for the duration of the search.
+    """
+    inner = unwrap(index)
+    if isinstance(inner, faiss.IndexIVF):
+        if nprobe is None and selector is None:
+            return None
+        params = faiss.SearchParametersIVF(nprobe=nprobe or inner.nprobe)
+    elif isinstance(inner, faiss.IndexHNSW):
+        if ef_search is None and selector is None:
+            return None
+        params = faiss.SearchParametersHNSW(efSearch=ef_search or inner.hnsw.efSearch)
+    elif selector is None:
+        return None
+    else:
+        params = faiss.SearchParameters()
+    if selector is not None:
+        params.sel = selector
+    return params
+
+
+def index_memory_bytes(index: faiss.Index) -> int:
+    """Approximate resident size: per-vector codes and ids, plus graph links for HNSW"""
+    inner = unwrap(index)
+    if isinstance(inner, faiss.IndexHNSW):
+        code_size = faiss.downcast_index(inner.storage).sa_code_size() + inner.hnsw.nb_neighbors(0) * 4
+    else:
+        code_size = inner.sa_code_size()
+    return index.ntotal * (code_size + 8)
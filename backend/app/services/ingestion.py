@@ -1,82 +1,167 @@
 from pathlib import Path
+import functools
+import hashlib
+import os
+from concurrent.futures import ProcessPoolExecutor
 import markdown
 from bs4 import BeautifulSoup
-import tiktoken
 from pypdf import PdfReader
-from typing import List
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
 
 from app.schema import DocumentChunk
+from app.services.chunking import Chunk, TextChunker
+from app.services.tokenizer import get_tokenizer
 from app.config import settings
 
-tokenizer = tiktoken.get_encoding("cl100k_base")
 
+@functools.lru_cache(maxsize=None)
+def get_chunker() -> TextChunker:
+    """Chunker over the shared tokenizer, built on first use"""
+    return TextChunker(settings.CHUNK_SIZE, settings.CHUNK_OVERLAP, get_tokenizer())
 
-def chunk_text(text: str):
-    tokens = tokenizer.encode(text)
-    chunks = []
 
-    start = 0
-    while start < len(tokens):
-        end = start + settings.CHUNK_SIZE
-        chunk_tokens = tokens[start:end]
-        chunk_text = tokenizer.decode(chunk_tokens)
+def chunk_text(text: str) -> List[Chunk]:
+    """Split text into token-budgeted chunks with their character spans"""
+    return get_chunker().chunk(text)
 
-        chunks.append((chunk_text, len(chunk_tokens)))
-        start += settings.CHUNK_SIZE - settings.CHUNK_OVERLAP
 
-    return chunks
+def file_content_hash(file_path: Path) -> str:
+    """SHA-256 of the raw file bytes, used to skip files ingested before"""
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
 
 
-def extract_text_from_pdf(pdf_path: Path) -> str:
-    """Extract text from PDF file"""
+def extract_text_from_pdf(pdf_path: Path, start_page: int = 0, end_page: Optional[int] = None) -> str:
+    """Extract text from PDF file, optionally only pages [start_page, end_page)"""
     reader = PdfReader(pdf_path)
     text_parts = []
-    for page in reader.pages:
+    for page in reader.pages[start_page:end_page]:
         text_parts.append(page.extract_text())
     return "\n\n".join(text_parts)
 
 
-def ingest_file(file_path: Path) -> List[DocumentChunk]:
-    """Ingest a single file (PDF or markdown) and return chunks"""
-    all_chunks = []
-    
-    # Determine file type and extract text
+def extract_text(file_path: Path) -> str:
+    """Extract plain text from a PDF, markdown or text file"""
     if file_path.suffix.lower() == ".pdf":
-        clean_text = extract_text_from_pdf(file_path)
+        return extract_text_from_pdf(file_path)
     elif file_path.suffix.lower() == ".md":
         raw = file_path.read_text(encoding="utf-8")
         html = markdown.markdown(raw)
         soup = BeautifulSoup(html, "html.parser")
-        clean_text = soup.get_text(separator="\n")
+        return soup.get_text(separator="\n")
     else:
         # Plain text file
-        clean_text = file_path.read_text(encoding="utf-8")
-    
-    # Chunk the text
-    for i, (chunk, token_count) in enumerate(chunk_text(clean_text)):
+        return file_path.read_text(encoding="utf-8")
+
+
+def _parse_tasks(file_paths: Sequence[Path], pages_per_task: int) -> List[Tuple[int, Path, int, Optional[int]]]:
+    """
+    Split files into (file index, path, start page, end page) extraction
+    tasks; PDFs longer than `pages_per_task` get one task per page range
+    """
+    tasks = []
+    for index, file_path in enumerate(file_paths):
+        num_pages = len(PdfReader(file_path).pages) if file_path.suffix.lower() == ".pdf" else 0
+        if num_pages > pages_per_task:
+            for start in range(0, num_pages, pages_per_task):
+                tasks.append((index, file_path, start, start + pages_per_task))
+        else:
+            tasks.append((index, file_path, 0, None))
+    return tasks
+
+
+def _run_parse_task(task: Tuple[int, Path, int, Optional[int]]) -> str:
+    _, file_path, start_page, end_page = task
+    if end_page is not None:
+        return extract_text_from_pdf(file_path, start_page, end_page)
+    return extract_text(file_path)
+
+
+def extract_texts(
+    file_paths: Sequence[Path],
+    workers: int = settings.INGEST_WORKERS,
+    pages_per_task: int = settings.PDF_PAGES_PER_TASK,
+) -> Iterator[Tuple[Path, str]]:
+    """
+    Extract text from many files across a process pool.
+    pypdf and markdown/BeautifulSoup are pure Python, so threads would
+    serialize on the GIL. Yields (path, text) in input order, each file as
+    soon as it and every file before it are done; PDF page ranges are
+    joined in page order, so the output matches `extract_text` file by file.
+    """
+    workers = workers or os.cpu_count() or 1
+    if workers == 1 or len(file_paths) == 0:
+        for file_path in file_paths:
+            yield file_path, extract_text(file_path)
+        return
+
+    tasks = _parse_tasks(file_paths, pages_per_task)
+    executor = ProcessPoolExecutor(max_workers=min(workers, len(tasks)))
+    try:
+        parts: List[str] = []
+        current = 0
+        # map() returns results in submission order
+        for (index, _, _, _), text in zip(tasks, executor.map(_run_parse_task, tasks)):
+            if index != current:
+                yield file_paths[current], "\n\n".join(parts)
+                parts, current = [], index
+            parts.append(text)
+        yield file_paths[current], "\n\n".join(parts)
+    finally:
+        executor.shutdown(wait=True, cancel_futures=True)
+
+
+def chunk_id(stem: str, text: str, occurrences: Dict[str, int]) -> str:
+    """
+    Id derived from the chunk's content, so a chunk keeps its id when the
+    document is re-uploaded with changes elsewhere; repeats of the same text
+    in a document are numbered via `occurrences`
+    """
+    digest = hashlib.sha256(text.encode("utf-8")).hexdigest()[:16]
+    seen = occurrences.get(digest, 0)
+    occurrences[digest] = seen + 1
+    return f"{stem}_{digest}_{seen}" if seen else f"{stem}_{digest}"
+
+
+def chunk_document(file_path: Path, clean_text: str) -> List[DocumentChunk]:
+    """Split a document's extracted text into chunks"""
+    all_chunks = []
+    occurrences: Dict[str, int] = {}
+    for chunk in chunk_text(clean_text):
         all_chunks.append(
             DocumentChunk(
-                id=f"{file_path.stem}_{i}",
-                text=chunk,
+                id=chunk_id(file_path.stem, chunk.text, occurrences),
+                text=chunk.text,
                 source=str(file_path),
-                token_count=token_count,
+                token_count=chunk.token_count,
+                start_char=chunk.start_char,
+                end_char=chunk.end_char,
             )
         )
     
     return all_chunks
 
 
-def ingest_docs():
-    """Ingest all documents from the docs directory"""
-    docs_path = Path(settings.DOCS_PATH)
-    all_chunks = []
+def ingest_file(file_path: Path) -> List[DocumentChunk]:
+    """Ingest a single file (PDF or markdown) and return chunks"""
+    return chunk_document(file_path, extract_text(file_path))
 
-    # Process markdown files
-    for file in docs_path.rglob("*.md"):
-        all_chunks.extend(ingest_file(file))
-    
-    # Process PDF files
-    for file in docs_path.rglob("*.pdf"):
-        all_chunks.extend(ingest_file(file))
 
+def ingest_files(file_paths: Sequence[Path], workers: int = settings.INGEST_WORKERS) -> List[DocumentChunk]:
+    """Ingest many files, parsing them in parallel; chunks keep the input file order"""
+    all_chunks = []
+    for file_path, text in extract_texts(file_paths, workers):
+        all_chunks.extend(chunk_document(file_path, text))
     return all_chunks
+
+
+def ingest_docs(workers: int = settings.INGEST_WORKERS):
+    """Ingest all documents from the docs directory"""
+    docs_path = Path(settings.DOCS_PATH)
+
+    # Markdown files first, then PDFs, each sorted for a deterministic order
+    files = sorted(docs_path.rglob("*.md")) + sorted(docs_path.rglob("*.pdf"))
+    return ingest_files(files, workers)
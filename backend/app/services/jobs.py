@@ -0,0 +1,476 @@
+import contextvars
+import json
+import queue
+import re
+import threading
+import time
+import uuid
+from collections import defaultdict
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+from app.config import settings
+from app.services.collection_manager import CollectionManager
+from app.services.dedup import NearDuplicateDetector
+from app.services.embeddings import EmbeddingService
+from app.services.ingestion import chunk_document, extract_texts, file_content_hash
+from app.services.tracing import span, trace
+from app.services.vector_store import VectorStore
+from app.services.wal import atomic_write, lock_file, unlock_file
+
+STAGES = ("parse", "chunk", "embed", "index")
+JOB_ID = re.compile(r"[0-9a-f]{32}")
+
+# End-of-stream marker passed between pipeline stages
+_DONE = object()
+
+
+class JobCancelled(Exception):
+    pass
+
+
+def restore_linked_chunks(
+    store: VectorStore,
+    detector: NearDuplicateDetector,
+    embedding_service: EmbeddingService,
+    chunks: List[Dict[str, Any]],
+) -> int:
+    """
+    Index duplicates whose canonical chunk was removed (as returned by
+    `NearDuplicateDetector.remove`). Each is checked again: one that still
+    copies an indexed chunk, or another chunk restored here, is linked to it;
+    the rest are embedded and indexed. Returns the number indexed.
+    """
+    session = detector.session(uuid.uuid4().hex)
+    restored, signatures, links = [], [], []
+    for meta in chunks:
+        signature, match = session.check(meta["id"], meta["source"], meta["text"])
+        if match is None:
+            restored.append(meta)
+            signatures.append((meta["id"], meta["source"], signature))
+        else:
+            links.append((meta, match))
+    if restored:
+        store.add(embedding_service.embed_texts([meta["text"] for meta in restored]), restored)
+        store.save()
+    detector.add(session.job_id, signatures)
+    detector.add_links(links)
+    return len(restored)
+
+
+class IngestionJob:
+    """
+    State of one upload: its files, the collection they go into, per-stage
+    progress and the resume checkpoint (`indexed_batches`, the number of
+    chunk batches already written to the vector store). `base_row` is the
+    store's next row when the job first ran: chunks below it are the ones a
+    re-uploaded document may keep.
+    """
+
+    def __init__(self, job_id: str, files: List[Dict[str, Any]], collection: str = settings.DEFAULT_COLLECTION):
+        self.id = job_id
+        self.files = files
+        self.collection = collection
+        self.status = "queued"
+        self.error: Optional[str] = None
+        self.created_at = datetime.now().isoformat()
+        self.updated_at = self.created_at
+        self.attempts = 0
+        self.indexed_batches = 0
+        self.num_chunks = 0
+        self.total_chunks: Optional[int] = None
+        self.duplicates = 0
+        self.unchanged = 0
+        self.removed = 0
+        self.base_row: Optional[int] = None
+        self.stages = {stage: {"processed": 0, "busy_seconds": 0.0} for stage in STAGES}
+        self._lock = threading.Lock()
+
+    def record(self, stage: str, items: int, seconds: float):
+        with self._lock:
+            self.stages[stage]["processed"] += items
+            self.stages[stage]["busy_seconds"] += seconds
+            self.updated_at = datetime.now().isoformat()
+
+    def to_dict(self) -> Dict[str, Any]:
+        with self._lock:
+            stages = {}
+            for stage, progress in self.stages.items():
+                busy = progress["busy_seconds"]
+                stages[stage] = {
+                    **progress,
+                    "items_per_second": progress["processed"] / busy if busy else 0.0,
+                }
+            return {
+                "job_id": self.id,
+                "status": self.status,
+                "collection": self.collection,
+                "error": self.error,
+                "created_at": self.created_at,
+                "updated_at": self.updated_at,
+                "attempts": self.attempts,
+                "files": self.files,
+                "indexed_batches": self.indexed_batches,
+                "num_chunks": self.num_chunks,
+                "total_chunks": self.total_chunks,
+                "duplicates": self.duplicates,
+                "dedup_ratio": self.duplicates / self.total_chunks if self.total_chunks else 0.0,
+                "unchanged": self.unchanged,
+                "removed": self.removed,
+                "base_row": self.base_row,
+                "stages": stages,
+            }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "IngestionJob":
+        job = cls(data["job_id"], data["files"], data.get("collection", settings.DEFAULT_COLLECTION))
+        job.status = data["status"]
+        job.error = data.get("error")
+        job.created_at = data["created_at"]
+        job.updated_at = data["updated_at"]
+        job.attempts = data.get("attempts", 0)
+        job.indexed_batches = data.get("indexed_batches", 0)
+        job.num_chunks = data.get("num_chunks", 0)
+        job.total_chunks = data.get("total_chunks")
+        job.duplicates = data.get("duplicates", 0)
+        job.unchanged = data.get("unchanged", 0)
+        job.removed = data.get("removed", 0)
+        job.base_row = data.get("base_row")
+        for stage, progress in data.get("stages", {}).items():
+            job.stages[stage] = {"processed": progress["processed"], "busy_seconds": progress["busy_seconds"]}
+        return job
+
+
+class IngestionJobManager:
+    """
+    Runs uploads in the background, one job at a time.
+    Each job is a parse -> chunk -> embed -> index pipeline: one thread per
+    stage, connected by bounded queues so a slow stage applies backpressure
+    instead of buffering whole documents in memory. After every indexed
+    batch the job state is checkpointed to disk, so a failed or interrupted
+    job resumes from the next batch. Each job writes to its collection,
+    which stays open for the whole run; when the collection has a
+    near-duplicate detector, duplicate chunks are dropped before the embed
+    stage. A file uploaded under the name of one already ingested replaces
+    it: chunks it still contains are kept without being embedded again, and
+    the old chunks it no longer has are deleted once the file is indexed;
+    duplicates in other documents that were linked to them are indexed in
+    their place.
+
+    With `shared` (multi-worker mode), jobs are read from their checkpoint
+    files when they belong to another worker, and each worker holds a lock
+    file for every job it has queued or running; a job whose lock is free
+    but whose checkpoint says it is still active lost its worker, and is
+    marked failed so it can be resumed.
+    """
+
+    def __init__(
+        self,
+        collections: CollectionManager,
+        embedding_service: EmbeddingService,
+        jobs_dir: Path,
+        batch_size: int = settings.INGEST_BATCH_SIZE,
+        queue_size: int = settings.INGEST_QUEUE_SIZE,
+        dedup_mode: str = settings.DEDUP_MODE,
+        shared: bool = settings.MULTI_WORKER,
+    ):
+        self.collections = collections
+        self.embedding_service = embedding_service
+        self.jobs_dir = jobs_dir
+        self.batch_size = batch_size
+        self.queue_size = queue_size
+        self.dedup_mode = dedup_mode
+        self.shared = shared
+        self.jobs: Dict[str, IngestionJob] = {}
+        # Lock file descriptors of the jobs this process has queued or running
+        self._job_locks: Dict[str, int] = {}
+        self._pending: "queue.Queue[Optional[str]]" = queue.Queue()
+        self._worker: Optional[threading.Thread] = None
+        self._stopping = threading.Event()
+
+        self.jobs_dir.mkdir(parents=True, exist_ok=True)
+        for path in sorted(self.jobs_dir.glob("*.json")):
+            job = self._recover(IngestionJob.from_dict(json.loads(path.read_text(encoding="utf-8"))))
+            self.jobs[job.id] = job
+
+    def start(self):
+        self._worker = threading.Thread(target=self._work, name="ingestion-jobs", daemon=True)
+        self._worker.start()
+
+    def stop(self):
+        self._stopping.set()
+        self._pending.put(None)
+        if self._worker is not None:
+            self._worker.join()
+
+    def submit(self, files: List[Dict[str, Any]], collection: str = settings.DEFAULT_COLLECTION) -> IngestionJob:
+        """
+        Queue a job. Each file dict has filename, path, content_hash and
+        skip (already ingested); skips are fixed here so batch numbering
+        stays identical when the job is resumed.
+        """
+        job = IngestionJob(uuid.uuid4().hex, files, collection)
+        if self.shared:
+            self._job_locks[job.id] = lock_file(self._lock_path(job.id))
+        self.jobs[job.id] = job
+        self._checkpoint(job)
+        self._pending.put(job.id)
+        return job
+
+    def resume(self, job_id: str) -> IngestionJob:
+        job = self.get(job_id)
+        if self.shared and job_id not in self._job_locks:
+            fd = lock_file(self._lock_path(job_id), blocking=False)
+            if fd is None:
+                raise ValueError(f"Job {job_id} is active in another worker")
+            # Re-read now that no other worker can take it
+            job = self._load(job_id)
+            if job.status != "failed":
+                unlock_file(fd)
+            else:
+                self._job_locks[job_id] = fd
+        if job.status != "failed":
+            raise ValueError(f"Job {job_id} is {job.status}; only failed jobs can be resumed")
+        job.status = "queued"
+        job.error = None
+        self.jobs[job_id] = job
+        self._checkpoint(job)
+        self._pending.put(job.id)
+        return job
+
+    def get(self, job_id: str) -> Optional[IngestionJob]:
+        job = self.jobs.get(job_id)
+        if self.shared and job_id not in self._job_locks:
+            # Possibly submitted to, or run by, another worker
+            job = self._load(job_id) or job
+        return job
+
+    def _lock_path(self, job_id: str) -> Path:
+        return self.jobs_dir / f"{job_id}.lock"
+
+    def _load(self, job_id: str) -> Optional[IngestionJob]:
+        path = self.jobs_dir / f"{job_id}.json"
+        if not JOB_ID.fullmatch(job_id) or not path.exists():
+            return None
+        return self._recover(IngestionJob.from_dict(json.loads(path.read_text(encoding="utf-8"))))
+
+    def _recover(self, job: IngestionJob) -> IngestionJob:
+        """Mark a queued or running job whose process is gone as failed, so it can be resumed"""
+        if job.status not in ("queued", "running"):
+            return job
+        if not self.shared:
+            # The process stopped mid-job
+            job.status = "failed"
+            job.error = "Interrupted by server shutdown"
+            return job
+        fd = lock_file(self._lock_path(job.id), blocking=False)
+        if fd is None:
+            return job  # Its worker is still on it
+        try:
+            # Re-read: its worker may have finished just before letting go
+            job = IngestionJob.from_dict(json.loads((self.jobs_dir / f"{job.id}.json").read_text(encoding="utf-8")))
+            if job.status in ("queued", "running"):
+                job.status = "failed"
+                job.error = "Interrupted: its worker stopped"
+                self._checkpoint(job)
+        finally:
+            unlock_file(fd)
+        return job
+
+    def _checkpoint(self, job: IngestionJob):
+        atomic_write(self.jobs_dir / f"{job.id}.json", json.dumps(job.to_dict()).encode("utf-8"))
+
+    def _work(self):
+        while True:
+            job_id = self._pending.get()
+            if job_id is None:
+                return
+            job = self.jobs[job_id]
+            try:
+                with self.collections.use(job.collection, create=True) as collection:
+                    # For a shared store, other workers wait to write until the job is done
+                    with collection.store.writing():
+                        self._run(job, collection.store, collection.detector)
+            except Exception as e:
+                # The collection could not be opened, or the job's writes published
+                job.status = "failed"
+                job.error = str(e)
+                self._checkpoint(job)
+            finally:
+                fd = self._job_locks.pop(job_id, None)
+                if fd is not None:
+                    unlock_file(fd)
+
+    def _run(self, job: IngestionJob, store: VectorStore, detector: Optional[NearDuplicateDetector]):
+        job.status = "running"
+        job.attempts += 1
+        if job.base_row is None:
+            job.base_row = store.next_row
+        self._checkpoint(job)
+
+        failed = threading.Event()
+        errors: List[str] = []
+        cancelled: List[str] = []
+        parsed: queue.Queue = queue.Queue(maxsize=self.queue_size)
+        batches: queue.Queue = queue.Queue(maxsize=self.queue_size)
+        embedded: queue.Queue = queue.Queue(maxsize=self.queue_size)
+
+        def put(q: queue.Queue, item):
+            while True:
+                if failed.is_set() or self._stopping.is_set():
+                    raise JobCancelled()
+                try:
+                    q.put(item, timeout=0.1)
+                    return
+                except queue.Full:
+                    continue
+
+        def items(q: queue.Queue):
+            while True:
+                if failed.is_set() or self._stopping.is_set():
+                    raise JobCancelled()
+                try:
+                    item = q.get(timeout=0.1)
+                except queue.Empty:
+                    continue
+                if item is _DONE:
+                    return
+                yield item
+
+        def parse_stage():
+            files = [file_info for file_info in job.files if not file_info["skip"]]
+            if job.attempts > 1:
+                for file_info in files:
+                    if file_content_hash(Path(file_info["path"])) != file_info["content_hash"]:
+                        raise RuntimeError(f"{file_info['filename']} changed on disk since the job was created")
+            # Files are parsed in parallel but arrive in job order, keeping batch numbering stable
+            start = time.perf_counter()
+            for file_info, (_, text) in zip(files, extract_texts([Path(f["path"]) for f in files])):
+                job.record("parse", 1, time.perf_counter() - start)
+                put(parsed, (file_info, text))
+                start = time.perf_counter()
+            put(parsed, _DONE)
+
+        def chunk_stage():
+            dedup = detector.session(job.id) if detector is not None else None
+            batch, signatures, links, completed_files, batch_no, total, unchanged = [], [], [], [], 0, 0, 0
+            for file_info, text in items(parsed):
+                start = time.perf_counter()
+                source = str(Path(file_info["path"]))
+                with span("chunk"):
+                    chunks = chunk_document(Path(file_info["path"]), text)
+                total += len(chunks)
+                # Chunks of an earlier upload of this file, by id
+                previous = defaultdict(list)
+                for chunk_id, row in store.source_chunks(source, before_row=job.base_row):
+                    previous[chunk_id].append(row)
+                kept_rows, kept = [], []
+                for chunk in chunks:
+                    if previous.get(chunk.id):
+                        kept_rows.append(previous[chunk.id].pop())
+                        kept.append(chunk.model_dump())
+                        continue
+                    if dedup is not None:
+                        with span("dedup"):
+                            signature, match = dedup.check(chunk.id, chunk.source, chunk.text)
+                        if match is not None:
+                            links.append((chunk.model_dump(), match))
+                            continue
+                        signatures.append((chunk.id, chunk.source, signature))
+                    batch.append(chunk)
+                    if len(batch) == self.batch_size:
+                        put(batches, (batch_no, batch, signatures, links, completed_files))
+                        batch, signatures, links, completed_files, batch_no = [], [], [], [], batch_no + 1
+                job.record("chunk", len(chunks), time.perf_counter() - start)
+                unchanged += len(kept)
+                stale = [(chunk_id, row) for chunk_id, rows in previous.items() for row in rows]
+                # A file is registered, and its stale chunks deleted, once the
+                # batch holding its last chunk is indexed
+                completed_files.append((file_info, source, kept_rows, kept, stale, [chunk.id for chunk in chunks]))
+            if batch or links or completed_files:
+                put(batches, (batch_no, batch, signatures, links, completed_files))
+            job.total_chunks = total
+            job.unchanged = unchanged
+            job.duplicates = dedup.duplicates if dedup is not None else 0
+            put(batches, _DONE)
+
+        def embed_stage():
+            for batch_no, chunks, signatures, links, completed_files in items(batches):
+                if batch_no < job.indexed_batches:
+                    continue  # indexed by a previous attempt
+                start = time.perf_counter()
+                with span("embed"):
+                    embeddings = self.embedding_service.embed_texts([chunk.text for chunk in chunks]) if chunks else []
+                job.record("embed", len(chunks), time.perf_counter() - start)
+                put(embedded, (batch_no, chunks, embeddings, signatures, links, completed_files))
+            put(embedded, _DONE)
+
+        def index_stage():
+            for batch_no, chunks, embeddings, signatures, links, completed_files in items(embedded):
+                start = time.perf_counter()
+                with span("index"):
+                    if chunks:
+                        store.add(embeddings, [chunk.model_dump() for chunk in chunks])
+                    orphaned = []
+                    for file_info, source, kept_rows, kept, stale, chunk_ids in completed_files:
+                        # Unchanged chunks may have moved within the document
+                        if kept_rows:
+                            store.update_metadata(kept_rows, kept)
+                        if stale:
+                            job.removed += store.delete(row for _, row in stale)
+                            if detector is not None:
+                                orphaned += detector.remove(source, [chunk_id for chunk_id, _ in stale])
+                        if detector is not None:
+                            detector.prune_links(source, chunk_ids)
+                        store.register_file(file_info["content_hash"], file_info["filename"])
+                    with span("save"):
+                        store.save()
+                    if detector is not None:
+                        detector.add(job.id, signatures)
+                        if self.dedup_mode == "link":
+                            detector.add_links(links)
+                        # Duplicates of the deleted chunks in other documents, now
+                        # matched against this batch's chunks too
+                        if orphaned:
+                            restore_linked_chunks(store, detector, self.embedding_service, orphaned)
+                job.record("index", len(chunks), time.perf_counter() - start)
+                job.indexed_batches = batch_no + 1
+                job.num_chunks += len(chunks)
+                self._checkpoint(job)
+
+        def run_stage(fn: Callable[[], None]):
+            try:
+                fn()
+            except JobCancelled:
+                cancelled.append(fn.__name__)
+            except Exception as e:
+                errors.append(f"{fn.__name__}: {e}")
+                failed.set()
+
+        with trace(f"ingest job {job.id}"):
+            # Each stage thread runs in a copy of this context, so its spans join the job's trace
+            threads = [
+                threading.Thread(
+                    target=contextvars.copy_context().run,
+                    args=(run_stage, fn),
+                    name=f"ingest-{fn.__name__}",
+                    daemon=True,
+                )
+                for fn in (parse_stage, chunk_stage, embed_stage, index_stage)
+            ]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+
+        if errors:
+            job.status = "failed"
+            job.error = "; ".join(errors)
+        elif cancelled:
+            job.status = "failed"
+            job.error = "Interrupted by server shutdown"
+        else:
+            job.status = "completed"
+        job.updated_at = datetime.now().isoformat()
+        self._checkpoint(job)
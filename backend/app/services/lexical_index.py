@@ -0,0 +1,190 @@
+import io
+import json
+import math
+import re
+import threading
+from array import array
+from typing import Dict, Iterable, List, Set, Tuple
+
+import numpy as np
+
+_TOKEN = re.compile(r"\w+")
+
+STOPWORDS = frozenset(
+    "a an and are as at be but by for from has have he her his i in is it its of on or she that the their them "
+    "there they this to was were what when which who will with you".split()
+)
+
+
+def tokenize(text: str) -> List[str]:
+    return [t for t in _TOKEN.findall(text.lower()) if t not in STOPWORDS]
+
+
+class BM25Index:
+    """
+    In-memory inverted index with Okapi BM25 scoring, addressed by row
+    (the vector store's row id of the chunk). Postings are compact per-term
+    arrays of rows and term frequencies that only grow on add, so adding
+    chunks is O(tokens added). Deleted rows are tombstoned: they stop
+    counting towards the collection statistics and are filtered from
+    results at once, and their postings are dropped by `purge`.
+    `serialize` / `deserialize` give a snapshot the vector store writes next
+    to its FAISS snapshot.
+    """
+
+    def __init__(self, k1: float = 1.5, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self._rows: Dict[str, array] = {}
+        self._freqs: Dict[str, array] = {}
+        self._doc_lengths = array("I")
+        self._total_length = 0
+        self._num_postings = 0
+        # Every deleted row, and those whose postings are still present
+        self._deleted: Set[int] = set()
+        self._tombstones: Set[int] = set()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._doc_lengths)
+
+    def memory_bytes(self) -> int:
+        """Approximate resident size: posting arrays, document lengths and per-term overhead"""
+        return self._num_postings * 8 + len(self._doc_lengths) * 4 + len(self._rows) * 200 + len(self._deleted) * 32
+
+    @property
+    def num_docs(self) -> int:
+        return len(self._doc_lengths) - len(self._deleted)
+
+    def add(self, start_row: int, texts: List[str]):
+        """Index texts as rows start_row, start_row + 1, ... (must follow the last row)"""
+        with self._lock:
+            if start_row != len(self._doc_lengths):
+                raise ValueError(f"Expected row {len(self._doc_lengths)}, got {start_row}")
+            for row, text in enumerate(texts, start=start_row):
+                counts: Dict[str, int] = {}
+                tokens = tokenize(text)
+                for token in tokens:
+                    counts[token] = counts.get(token, 0) + 1
+                for token, count in counts.items():
+                    if token not in self._rows:
+                        self._rows[token] = array("I")
+                        self._freqs[token] = array("I")
+                    self._rows[token].append(row)
+                    self._freqs[token].append(count)
+                self._num_postings += len(counts)
+                self._doc_lengths.append(len(tokens))
+                self._total_length += len(tokens)
+
+    def delete(self, rows: Iterable[int]):
+        """Tombstone rows; rows already deleted are ignored"""
+        with self._lock:
+            for row in rows:
+                if row < len(self._doc_lengths) and row not in self._deleted:
+                    self._deleted.add(row)
+                    self._tombstones.add(row)
+                    self._total_length -= self._doc_lengths[row]
+
+    def purge(self):
+        """Drop the postings of tombstoned rows; O(postings of the terms they contain)"""
+        with self._lock:
+            if not self._tombstones:
+                return
+            tombstones = np.fromiter(self._tombstones, dtype=np.uint32)
+            for term in list(self._rows):
+                rows = np.frombuffer(self._rows[term], dtype=np.uint32)
+                keep = ~np.isin(rows, tombstones)
+                if keep.all():
+                    continue
+                self._num_postings -= len(rows) - int(keep.sum())
+                if not keep.any():
+                    del self._rows[term], self._freqs[term]
+                    continue
+                freqs = np.frombuffer(self._freqs[term], dtype=np.uint32)
+                self._rows[term] = array("I", rows[keep].tobytes())
+                self._freqs[term] = array("I", freqs[keep].tobytes())
+            for row in self._tombstones:
+                self._doc_lengths[row] = 0
+            self._tombstones = set()
+
+    @staticmethod
+    def _idf(num_docs: int, doc_freq: int) -> float:
+        return math.log(1 + (num_docs - doc_freq + 0.5) / (doc_freq + 0.5))
+
+    def search(self, query: str, k: int) -> List[Tuple[int, float]]:
+        """Top-k (row, score) pairs for the query, best first"""
+        terms = list(dict.fromkeys(tokenize(query)))
+        with self._lock:
+            num_docs = self.num_docs
+            if num_docs <= 0:
+                return []
+            avg_length = self._total_length / num_docs
+            # Copy postings under the lock; `add` may grow the arrays
+            postings = [
+                (np.array(self._rows[t], dtype=np.int64), np.array(self._freqs[t], dtype=np.float32))
+                for t in terms
+                if t in self._rows
+            ]
+            if not postings:
+                return []
+            all_rows = np.concatenate([rows for rows, _ in postings])
+            doc_lengths = np.frombuffer(self._doc_lengths, dtype=np.uint32)[all_rows].astype(np.float32)
+            tombstones = np.fromiter(self._tombstones, dtype=np.int64) if self._tombstones else None
+
+        freqs = np.concatenate([freqs for _, freqs in postings])
+        idfs = np.concatenate(
+            [np.full(len(rows), self._idf(num_docs, len(rows)), dtype=np.float32) for rows, _ in postings]
+        )
+        length_norm = 1 - self.b + self.b * doc_lengths / avg_length
+        weights = idfs * freqs * (self.k1 + 1) / (freqs + self.k1 * length_norm)
+
+        rows, inverse = np.unique(all_rows, return_inverse=True)
+        scores = np.bincount(inverse, weights=weights)
+        if tombstones is not None:
+            live = ~np.isin(rows, tombstones)
+            rows, scores = rows[live], scores[live]
+        k = min(k, len(rows))
+        if not k:
+            return []
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top], kind="stable")]
+        return [(int(rows[i]), float(scores[i])) for i in top]
+
+    def serialize(self) -> bytes:
+        with self._lock:
+            terms = list(self._rows)
+            offsets = np.cumsum([0] + [len(self._rows[t]) for t in terms], dtype=np.int64)
+            buffer = io.BytesIO()
+            np.savez(
+                buffer,
+                terms=np.frombuffer(json.dumps(terms).encode("utf-8"), dtype=np.uint8),
+                offsets=offsets,
+                rows=self._concat(self._rows[t] for t in terms),
+                freqs=self._concat(self._freqs[t] for t in terms),
+                doc_lengths=np.frombuffer(self._doc_lengths, dtype=np.uint32),
+                deleted=np.fromiter(sorted(self._deleted), dtype=np.uint32),
+                tombstones=np.fromiter(sorted(self._tombstones), dtype=np.uint32),
+            )
+        return buffer.getvalue()
+
+    @staticmethod
+    def _concat(arrays) -> np.ndarray:
+        return np.concatenate([np.empty(0, dtype=np.uint32)] + [np.frombuffer(a, dtype=np.uint32) for a in arrays])
+
+    @classmethod
+    def deserialize(cls, data: bytes, k1: float = 1.5, b: float = 0.75) -> "BM25Index":
+        index = cls(k1, b)
+        with np.load(io.BytesIO(data)) as snapshot:
+            terms = json.loads(snapshot["terms"].tobytes().decode("utf-8"))
+            offsets, rows, freqs = snapshot["offsets"], snapshot["rows"], snapshot["freqs"]
+            for i, term in enumerate(terms):
+                index._rows[term] = array("I", rows[offsets[i] : offsets[i + 1]].tobytes())
+                index._freqs[term] = array("I", freqs[offsets[i] : offsets[i + 1]].tobytes())
+            index._doc_lengths = array("I", snapshot["doc_lengths"].tobytes())
+            # Snapshots from before deletes have neither array
+            if "deleted" in snapshot.files:
+                index._deleted = set(snapshot["deleted"].tolist())
+                index._tombstones = set(snapshot["tombstones"].tolist())
+        index._total_length = sum(index._doc_lengths) - sum(index._doc_lengths[row] for row in index._tombstones)
+        index._num_postings = len(rows)
+        return index
@@ -0,0 +1,232 @@
+import json
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+# Columns with their own SQLite column; any other keys go to `extra` as JSON
+_CORE_KEYS = ("id", "text", "source", "token_count")
+
+# chunks.deleted: a tombstoned row's vector may still be in the FAISS
+# snapshot; a purged row's vector is gone and its text has been dropped
+LIVE, TOMBSTONED, PURGED = 0, 1, 2
+
+
+class ChunkMetadataStore:
+    """
+    SQLite-backed chunk metadata, addressed by row (the FAISS id).
+    Sources are interned: rows hold a compact source code, and only the
+    table of distinct source names lives in memory. Chunk ids, token counts
+    and text stay on disk and are fetched by row, so memory and startup time
+    no longer scale with the raw corpus text; per-source lookups use the
+    `source_id` index. Deleted rows keep their row (rows are never reused)
+    and are marked in the `deleted` column.
+    """
+
+    def __init__(self, path: Path):
+        self.path = path
+        self._lock = threading.RLock()
+        self._conn = sqlite3.connect(str(path), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS sources (
+                source_id INTEGER PRIMARY KEY,
+                source TEXT NOT NULL UNIQUE
+            );
+            CREATE TABLE IF NOT EXISTS chunks (
+                row INTEGER PRIMARY KEY,
+                id TEXT NOT NULL,
+                source_id INTEGER NOT NULL,
+                token_count INTEGER NOT NULL,
+                text TEXT NOT NULL,
+                extra TEXT
+            );
+            CREATE INDEX IF NOT EXISTS chunks_id ON chunks (id);
+            CREATE TABLE IF NOT EXISTS files (
+                content_hash TEXT PRIMARY KEY,
+                filename TEXT NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS state (
+                key TEXT PRIMARY KEY,
+                value INTEGER NOT NULL
+            );
+            """
+        )
+        columns = [name for _, name, *_ in self._conn.execute("PRAGMA table_info(chunks)")]
+        if "deleted" not in columns:
+            # Stores from before deletes
+            self._conn.execute("ALTER TABLE chunks ADD COLUMN deleted INTEGER NOT NULL DEFAULT 0")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS chunks_source ON chunks (source_id)")
+        self._conn.commit()
+
+        self._sources: List[str] = []
+        self._source_codes: Dict[str, int] = {}
+        self._load_sources()
+
+        (self._num_rows,) = self._conn.execute("SELECT COALESCE(MAX(row) + 1, 0) FROM chunks").fetchone()
+
+    def __len__(self) -> int:
+        return self._num_rows
+
+    def _load_sources(self):
+        for source_id, source in self._conn.execute(
+            "SELECT source_id, source FROM sources WHERE source_id >= ? ORDER BY source_id", (len(self._sources),)
+        ):
+            self._intern(source, source_id)
+
+    def _source_name(self, source_id: int) -> str:
+        if source_id >= len(self._sources):
+            # Added by another process after this store was opened
+            with self._lock:
+                self._load_sources()
+        return self._sources[source_id]
+
+    def _intern(self, source: str, source_id: int) -> int:
+        while len(self._sources) <= source_id:
+            self._sources.append("")
+        self._sources[source_id] = source
+        self._source_codes[source] = source_id
+        return source_id
+
+    def _source_id(self, source: str) -> int:
+        if source in self._source_codes:
+            return self._source_codes[source]
+        source_id = len(self._sources)
+        self._conn.execute("INSERT INTO sources (source_id, source) VALUES (?, ?)", (source_id, source))
+        return self._intern(source, source_id)
+
+    def append(self, metadatas: List[Dict[str, Any]]):
+        """Add rows after the current last row (uncommitted until `commit`)"""
+        with self._lock:
+            start_row = len(self)
+            rows = []
+            for offset, meta in enumerate(metadatas):
+                extra = {k: v for k, v in meta.items() if k not in _CORE_KEYS}
+                rows.append(
+                    (
+                        start_row + offset,
+                        meta.get("id", ""),
+                        self._source_id(meta.get("source", "")),
+                        int(meta.get("token_count", 0)),
+                        meta.get("text", ""),
+                        json.dumps(extra) if extra else None,
+                    )
+                )
+            self._num_rows += len(rows)
+            self._conn.executemany(
+                "INSERT INTO chunks (row, id, source_id, token_count, text, extra) VALUES (?, ?, ?, ?, ?, ?)",
+                rows,
+            )
+
+    def get(self, rows: List[int]) -> List[Dict[str, Any]]:
+        """Fetch full metadata (including text) for the given rows, in order"""
+        if not rows:
+            return []
+        with self._lock:
+            placeholders = ",".join("?" * len(rows))
+            found = {
+                row: (chunk_id, source_id, token_count, text, extra)
+                for row, chunk_id, source_id, token_count, text, extra in self._conn.execute(
+                    f"SELECT row, id, source_id, token_count, text, extra FROM chunks WHERE row IN ({placeholders})",
+                    rows,
+                )
+            }
+        results = []
+        for row in rows:
+            chunk_id, source_id, token_count, text, extra = found[row]
+            meta = {"id": chunk_id, "text": text, "source": self._source_name(source_id), "token_count": token_count}
+            if extra:
+                meta.update(json.loads(extra))
+            results.append(meta)
+        return results
+
+    def source_chunks(self, source: str, before_row: Optional[int] = None) -> List[Tuple[str, int]]:
+        """(chunk id, row) of the live chunks of a source, optionally only rows below `before_row`"""
+        source_id = self._source_codes.get(source)
+        if source_id is None:
+            return []
+        with self._lock:
+            return self._conn.execute(
+                "SELECT id, row FROM chunks WHERE source_id = ? AND deleted = ? AND row < ? ORDER BY row",
+                (source_id, LIVE, len(self) if before_row is None else before_row),
+            ).fetchall()
+
+    def update(self, rows: List[int], metadatas: List[Dict[str, Any]]):
+        """Replace the non-core fields (e.g. character spans) of existing rows"""
+        with self._lock:
+            self._conn.executemany(
+                "UPDATE chunks SET extra = ? WHERE row = ?",
+                [
+                    (json.dumps(extra) if extra else None, row)
+                    for row, extra in (
+                        (row, {k: v for k, v in meta.items() if k not in _CORE_KEYS})
+                        for row, meta in zip(rows, metadatas)
+                    )
+                ],
+            )
+
+    def mark_deleted(self, rows: Iterable[int]):
+        """Tombstone live rows (uncommitted until `commit`)"""
+        with self._lock:
+            self._conn.executemany(
+                "UPDATE chunks SET deleted = ? WHERE row = ? AND deleted = ?", [(TOMBSTONED, row, LIVE) for row in rows]
+            )
+
+    def mark_purged(self, rows: Iterable[int]):
+        """Record that tombstoned rows left the FAISS snapshot; their text is no longer needed"""
+        with self._lock:
+            self._conn.executemany(
+                "UPDATE chunks SET deleted = ?, text = '', extra = NULL WHERE row = ?", [(PURGED, row) for row in rows]
+            )
+            self._conn.commit()
+
+    def deleted_rows(self, purged: bool = True) -> List[int]:
+        """Rows deleted so far; with `purged=False`, only those still tombstoned"""
+        with self._lock:
+            if purged:
+                cursor = self._conn.execute("SELECT row FROM chunks WHERE deleted != ?", (LIVE,))
+            else:
+                cursor = self._conn.execute("SELECT row FROM chunks WHERE deleted = ?", (TOMBSTONED,))
+            return [row for (row,) in cursor]
+
+    def truncate(self, num_rows: int):
+        """Drop every row from `num_rows` on (rows whose vectors were never persisted)"""
+        with self._lock:
+            if num_rows >= len(self):
+                return
+            self._conn.execute("DELETE FROM chunks WHERE row >= ?", (num_rows,))
+            self._conn.commit()
+            self._num_rows = num_rows
+
+    def ingested_files(self) -> Dict[str, str]:
+        with self._lock:
+            return dict(self._conn.execute("SELECT content_hash, filename FROM files"))
+
+    def add_files(self, files: Dict[str, str]):
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO files (content_hash, filename) VALUES (?, ?)", list(files.items())
+            )
+
+    def remove_files(self, filenames: Iterable[str]):
+        with self._lock:
+            self._conn.executemany("DELETE FROM files WHERE filename = ?", [(name,) for name in filenames])
+
+    def state(self, key: str, default: int = 0) -> int:
+        with self._lock:
+            row = self._conn.execute("SELECT value FROM state WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else default
+
+    def set_state(self, key: str, value: int):
+        with self._lock:
+            self._conn.execute("INSERT OR REPLACE INTO state (key, value) VALUES (?, ?)", (key, value))
+
+    def commit(self):
+        with self._lock:
+            self._conn.commit()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -1,45 +1,209 @@
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
+from collections import deque
 from datetime import datetime
+from pathlib import Path
+import json
+import math
+import os
+import threading
+import time
+import uuid
 
+from app.config import settings
+from app.services.wal import atomic_write, lock_file, unlock_file
+
+# Per-generation fields summed into running totals
+_SUMMED_FIELDS = ("total_tokens", "time_seconds", "prompt_tokens", "completion_tokens", "context_tokens_saved")
+_QUANTILES = (0.5, 0.95, 0.99)
+_METHODS = ("rag", "no_rag")
+# Upstream calls coalesced by SingleFlight: embedded texts and LLM generations
+_COALESCED_KINDS = ("embed", "llm")
+
+
+class QuantileSketch:
+    """
+    Log-bucketed quantile sketch (DDSketch-style).
+    A value lands in bucket ceil(log_gamma(value)), so any quantile is
+    returned within `accuracy` relative error using a few hundred buckets
+    for latencies from milliseconds to minutes. Sketches merge by adding
+    bucket counts, which is what makes windowed views cheap.
+    """
+
+    def __init__(self, accuracy: float = 0.01):
+        self.accuracy = accuracy
+        self.gamma = (1 + accuracy) / (1 - accuracy)
+        self._log_gamma = math.log(self.gamma)
+        self.buckets: Dict[int, int] = {}
+        self.zeros = 0  # Values too small for a log bucket
+        self.count = 0
+
+    def add(self, value: float):
+        self.count += 1
+        if value <= 1e-9:
+            self.zeros += 1
+            return
+        key = math.ceil(math.log(value) / self._log_gamma)
+        self.buckets[key] = self.buckets.get(key, 0) + 1
+
+    def merge(self, other: "QuantileSketch"):
+        self.count += other.count
+        self.zeros += other.zeros
+        for key, count in other.buckets.items():
+            self.buckets[key] = self.buckets.get(key, 0) + count
+
+    def to_state(self) -> Dict[str, Any]:
+        return {"zeros": self.zeros, "count": self.count, "buckets": list(self.buckets.items())}
+
+    def merge_state(self, state: Dict[str, Any]):
+        self.count += state["count"]
+        self.zeros += state["zeros"]
+        for key, count in state["buckets"]:
+            self.buckets[key] = self.buckets.get(key, 0) + count
+
+    def quantile(self, q: float) -> float:
+        if not self.count:
+            return 0.0
+        rank = q * (self.count - 1)
+        seen = self.zeros
+        if rank < seen:
+            return 0.0
+        for key in sorted(self.buckets):
+            seen += self.buckets[key]
+            if seen > rank:
+                # Midpoint of (gamma^(key-1), gamma^key] in relative terms
+                return 2 * self.gamma**key / (self.gamma + 1)
+        return 2 * self.gamma ** max(self.buckets) / (self.gamma + 1)
+
+
+class _Aggregate:
+    """Generation count, summed fields and latency sketch for one method"""
 
-class MetricsTracker:
     def __init__(self):
-        self.metrics_history: List[Dict[str, Any]] = []
-    
+        self.count = 0
+        self.sums = dict.fromkeys(_SUMMED_FIELDS, 0.0)
+        self.latency = QuantileSketch()
+
+    def add(self, metric_data: Dict[str, Any]):
+        self.count += 1
+        for field in _SUMMED_FIELDS:
+            self.sums[field] += metric_data.get(field, 0) or 0
+        self.latency.add(metric_data.get("time_seconds", 0) or 0)
+
+    def merge(self, other: "_Aggregate"):
+        self.count += other.count
+        for field in _SUMMED_FIELDS:
+            self.sums[field] += other.sums[field]
+        self.latency.merge(other.latency)
+
+    def to_state(self) -> Dict[str, Any]:
+        return {"count": self.count, "sums": self.sums, "latency": self.latency.to_state()}
+
+    def merge_state(self, state: Dict[str, Any]):
+        self.count += state["count"]
+        for field in _SUMMED_FIELDS:
+            self.sums[field] += state["sums"].get(field, 0.0)
+        self.latency.merge_state(state["latency"])
+
+
+class MetricsTracker:
+    """
+    Bounded generation metrics.
+    The last `history_size` raw events are kept in a ring buffer; everything
+    else is folded into running per-method aggregates as it arrives, so
+    `get_comparison` costs the same after a million generations as after
+    ten. Aggregates are also kept per `bucket_seconds` time bucket for
+    `retention_seconds`, and windowed views merge the buckets they cover.
+    """
+
+    def __init__(
+        self,
+        history_size: int = settings.METRICS_HISTORY_SIZE,
+        bucket_seconds: int = settings.METRICS_BUCKET_SECONDS,
+        retention_seconds: int = settings.METRICS_RETENTION_SECONDS,
+    ):
+        self.history_size = history_size
+        self.bucket_seconds = bucket_seconds
+        self.retention_seconds = retention_seconds
+        self._lock = threading.Lock()
+        self.clear()
+
     def add_metric(self, metric_data: Dict[str, Any]):
         """Add a new metric entry with timestamp"""
         metric_data["timestamp"] = datetime.now().isoformat()
-        self.metrics_history.append(metric_data)
-    
-    def get_comparison(self) -> Dict[str, Any]:
+        method = metric_data.get("method", "")
+        with self._lock:
+            self.metrics_history.append(metric_data)
+            self._totals.setdefault(method, _Aggregate()).add(metric_data)
+            self._current_bucket().setdefault(method, _Aggregate()).add(metric_data)
+
+    def record_cache_lookup(self, hit: bool, tokens_saved: int = 0):
+        """Count a quiz cache lookup; a hit saves the tokens of the cached generation"""
+        with self._lock:
+            if hit:
+                self.cache_hits += 1
+                self.cache_tokens_saved += tokens_saved
+            else:
+                self.cache_misses += 1
+
+    def record_coalescing(self, kind: str, calls: int, coalesced: int):
+        """Count upstream calls a caller made and those it shared with a caller already in flight"""
+        with self._lock:
+            counts = self.coalescing.setdefault(kind, [0, 0])
+            counts[0] += calls
+            counts[1] += coalesced
+
+    def _current_bucket(self) -> Dict[str, _Aggregate]:
+        start = int(time.time() // self.bucket_seconds) * self.bucket_seconds
+        if not self._buckets or self._buckets[-1][0] != start:
+            self._buckets.append((start, {}))
+        return self._buckets[-1][1]
+
+    def _window(self, window_seconds: int) -> Dict[str, _Aggregate]:
+        """Merged aggregates of the buckets overlapping the last `window_seconds`"""
+        since = time.time() - window_seconds
+        merged: Dict[str, _Aggregate] = {}
+        for start, bucket in self._buckets:
+            if start + self.bucket_seconds <= since:
+                continue
+            for method, aggregate in bucket.items():
+                merged.setdefault(method, _Aggregate()).merge(aggregate)
+        return merged
+
+    def get_cache_stats(self) -> Dict[str, float]:
+        lookups = self.cache_hits + self.cache_misses
+        return {
+            "hits": self.cache_hits,
+            "misses": self.cache_misses,
+            "hit_rate": self.cache_hits / lookups if lookups else 0,
+            "tokens_saved": self.cache_tokens_saved
+        }
+
+    def get_coalescing_stats(self) -> Dict[str, Dict[str, float]]:
+        stats = {}
+        for kind in (*_COALESCED_KINDS, *self.coalescing):
+            calls, coalesced = self.coalescing.get(kind, (0, 0))
+            requested = calls + coalesced
+            stats[kind] = {
+                "calls": calls,
+                "coalesced": coalesced,
+                "coalesced_rate": coalesced / requested if requested else 0,
+            }
+        return stats
+
+    def get_comparison(self, window_seconds: Optional[int] = None) -> Dict[str, Any]:
         """
         Get comparison statistics between RAG and non-RAG methods.
-        Returns aggregated metrics for visualization.
+        Returns aggregated metrics for visualization, over all generations
+        or only those in the last `window_seconds` (bucket granularity).
         """
-        rag_metrics = [m for m in self.metrics_history if m.get("method") == "rag"]
-        no_rag_metrics = [m for m in self.metrics_history if m.get("method") == "no_rag"]
-        
-        def calculate_averages(metrics_list: List[Dict]) -> Dict[str, float]:
-            if not metrics_list:
-                return {
-                    "avg_tokens": 0,
-                    "avg_time": 0,
-                    "avg_prompt_tokens": 0,
-                    "avg_completion_tokens": 0,
-                    "count": 0
-                }
-            
-            return {
-                "avg_tokens": sum(m.get("total_tokens", 0) for m in metrics_list) / len(metrics_list),
-                "avg_time": sum(m.get("time_seconds", 0) for m in metrics_list) / len(metrics_list),
-                "avg_prompt_tokens": sum(m.get("prompt_tokens", 0) for m in metrics_list) / len(metrics_list),
-                "avg_completion_tokens": sum(m.get("completion_tokens", 0) for m in metrics_list) / len(metrics_list),
-                "count": len(metrics_list)
-            }
-        
-        rag_stats = calculate_averages(rag_metrics)
-        no_rag_stats = calculate_averages(no_rag_metrics)
-        
+        with self._lock:
+            aggregates = self._window(window_seconds) if window_seconds else self._totals
+            rag_stats = self._summarize(aggregates.get("rag"))
+            no_rag_stats = self._summarize(aggregates.get("no_rag"))
+            total_generations = sum(a.count for a in aggregates.values())
+            cache = self.get_cache_stats()
+            coalescing = self.get_coalescing_stats()
+
         return {
             "rag": rag_stats,
             "no_rag": no_rag_stats,
@@ -49,15 +213,240 @@ class MetricsTracker:
                 "rag_efficiency": (
                     ((no_rag_stats["avg_time"] - rag_stats["avg_time"]) / no_rag_stats["avg_time"] * 100)
                     if no_rag_stats["avg_time"] > 0 else 0
-                )
+                ),
+                "context_tokens_saved": rag_stats["context_tokens_saved"]
             },
-            "total_generations": len(self.metrics_history)
+            "total_generations": total_generations,
+            "cache": cache,
+            "coalescing": coalescing,
+            "window_seconds": window_seconds
+        }
+
+    @staticmethod
+    def _summarize(aggregate: Optional[_Aggregate]) -> Dict[str, float]:
+        if aggregate is None or not aggregate.count:
+            aggregate = _Aggregate()
+        count = aggregate.count or 1
+        stats = {
+            "avg_tokens": aggregate.sums["total_tokens"] / count,
+            "avg_time": aggregate.sums["time_seconds"] / count,
+            "avg_prompt_tokens": aggregate.sums["prompt_tokens"] / count,
+            "avg_completion_tokens": aggregate.sums["completion_tokens"] / count,
+            "avg_context_tokens_saved": aggregate.sums["context_tokens_saved"] / count,
+            "context_tokens_saved": aggregate.sums["context_tokens_saved"],
+            "count": aggregate.count
         }
-    
+        for q in _QUANTILES:
+            stats[f"p{round(q * 100)}_time"] = aggregate.latency.quantile(q)
+        return stats
+
+    def to_prometheus(self) -> str:
+        """All-time counters and latency summaries in the Prometheus text format"""
+        with self._lock:
+            totals = {method: self._totals.get(method, _Aggregate()) for method in (*_METHODS, *self._totals)}
+            cache_hits, cache_misses, cache_tokens_saved = self.cache_hits, self.cache_misses, self.cache_tokens_saved
+            coalescing = self.get_coalescing_stats()
+
+            lines = [
+                "# HELP quiz_generations_total Quiz generations by method.",
+                "# TYPE quiz_generations_total counter",
+            ]
+            lines += [f'quiz_generations_total{{method="{m}"}} {a.count}' for m, a in totals.items()]
+            lines += [
+                "# HELP quiz_tokens_total LLM tokens used by quiz generation.",
+                "# TYPE quiz_tokens_total counter",
+            ]
+            for method, aggregate in totals.items():
+                for kind in ("prompt", "completion"):
+                    lines.append(f'quiz_tokens_total{{method="{method}",kind="{kind}"}} {int(aggregate.sums[kind + "_tokens"])}')
+            lines += [
+                "# HELP quiz_context_tokens_saved_total Prompt tokens saved by context packing.",
+                "# TYPE quiz_context_tokens_saved_total counter",
+            ]
+            lines += [
+                f'quiz_context_tokens_saved_total{{method="{m}"}} {int(a.sums["context_tokens_saved"])}' for m, a in totals.items()
+            ]
+            lines += [
+                "# HELP quiz_generation_seconds Quiz generation latency.",
+                "# TYPE quiz_generation_seconds summary",
+            ]
+            for method, aggregate in totals.items():
+                for q in _QUANTILES:
+                    lines.append(
+                        f'quiz_generation_seconds{{method="{method}",quantile="{q:g}"}} {aggregate.latency.quantile(q):.6g}'
+                    )
+                lines.append(f'quiz_generation_seconds_sum{{method="{method}"}} {aggregate.sums["time_seconds"]}')
+                lines.append(f'quiz_generation_seconds_count{{method="{method}"}} {aggregate.count}')
+        lines += [
+            "# HELP quiz_cache_lookups_total Semantic quiz cache lookups.",
+            "# TYPE quiz_cache_lookups_total counter",
+            f'quiz_cache_lookups_total{{result="hit"}} {cache_hits}',
+            f'quiz_cache_lookups_total{{result="miss"}} {cache_misses}',
+            "# HELP quiz_cache_tokens_saved_total LLM tokens saved by quiz cache hits.",
+            "# TYPE quiz_cache_tokens_saved_total counter",
+            f"quiz_cache_tokens_saved_total {cache_tokens_saved}",
+            "# HELP quiz_upstream_calls_total Embedding (per text) and LLM calls, made or shared with an identical call in flight.",
+            "# TYPE quiz_upstream_calls_total counter",
+        ]
+        for kind, stats in coalescing.items():
+            lines.append(f'quiz_upstream_calls_total{{kind="{kind}",result="called"}} {stats["calls"]}')
+            lines.append(f'quiz_upstream_calls_total{{kind="{kind}",result="coalesced"}} {stats["coalesced"]}')
+        return "\n".join(lines) + "\n"
+
+    def to_state(self) -> Dict[str, Any]:
+        """Everything tracked, as JSON-serializable data for `merge_state`"""
+        with self._lock:
+            return {
+                "history": list(self.metrics_history),
+                "totals": {method: aggregate.to_state() for method, aggregate in self._totals.items()},
+                "buckets": [
+                    [start, {method: aggregate.to_state() for method, aggregate in bucket.items()}]
+                    for start, bucket in self._buckets
+                ],
+                "cache": [self.cache_hits, self.cache_misses, self.cache_tokens_saved],
+                "coalescing": {kind: list(counts) for kind, counts in self.coalescing.items()},
+            }
+
+    def merge_state(self, state: Dict[str, Any]):
+        """Add another tracker's `to_state` (e.g. another worker's) into this one"""
+        with self._lock:
+            history = sorted([*self.metrics_history, *state["history"]], key=lambda m: m.get("timestamp", ""))
+            self.metrics_history.clear()
+            self.metrics_history.extend(history)
+            for method, aggregate in state["totals"].items():
+                self._totals.setdefault(method, _Aggregate()).merge_state(aggregate)
+            buckets = {start: bucket for start, bucket in self._buckets}
+            for start, bucket in state["buckets"]:
+                merged = buckets.setdefault(start, {})
+                for method, aggregate in bucket.items():
+                    merged.setdefault(method, _Aggregate()).merge_state(aggregate)
+            self._buckets.clear()
+            self._buckets.extend(sorted(buckets.items())[-self._buckets.maxlen:])
+            hits, misses, tokens_saved = state["cache"]
+            self.cache_hits += hits
+            self.cache_misses += misses
+            self.cache_tokens_saved += tokens_saved
+            for kind, (calls, coalesced) in state.get("coalescing", {}).items():
+                counts = self.coalescing.setdefault(kind, [0, 0])
+                counts[0] += calls
+                counts[1] += coalesced
+
     def get_all_metrics(self) -> List[Dict[str, Any]]:
-        """Get all metrics history"""
-        return self.metrics_history
-    
+        """Get the most recent metrics (up to `history_size`)"""
+        with self._lock:
+            return list(self.metrics_history)
+
     def clear(self):
         """Clear all metrics"""
-        self.metrics_history = []
+        with self._lock:
+            self.metrics_history: deque = deque(maxlen=self.history_size)
+            self._totals: Dict[str, _Aggregate] = {}
+            self._buckets: deque = deque(maxlen=max(1, math.ceil(self.retention_seconds / self.bucket_seconds)))
+            self.cache_hits = 0
+            self.cache_misses = 0
+            self.cache_tokens_saved = 0
+            self.coalescing: Dict[str, List[int]] = {}
+
+
+class WorkerMetrics:
+    """
+    A MetricsTracker aggregated across the server processes sharing
+    `directory` (MULTI_WORKER). Each worker publishes its tracker's state to
+    its own file and holds a lock file for as long as it runs; `merged` adds
+    the other workers' files to this worker's live state. The file of a
+    worker whose lock is free (it stopped) is folded into `retired.json`, so
+    totals survive worker restarts without files piling up. `clear` leaves
+    a marker that makes every worker clear its tracker at its next publish.
+    """
+
+    def __init__(self, tracker: MetricsTracker, directory: Path):
+        self.tracker = tracker
+        self.directory = directory
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.path = self.directory / f"worker-{os.getpid()}-{uuid.uuid4().hex[:8]}.json"
+        self.retired_path = self.directory / "retired.json"
+        self.cleared_path = self.directory / "cleared"
+        self._alive = lock_file(self.path.with_suffix(".lock"))
+        self._cleared_at = self._read_cleared()
+
+    def _read_cleared(self) -> float:
+        try:
+            return float(self.cleared_path.read_text())
+        except (FileNotFoundError, ValueError):
+            return 0.0
+
+    def _new_tracker(self) -> MetricsTracker:
+        return MetricsTracker(self.tracker.history_size, self.tracker.bucket_seconds, self.tracker.retention_seconds)
+
+    def publish(self):
+        """Write this worker's state, after clearing it if another worker cleared the metrics"""
+        cleared_at = self._read_cleared()
+        if cleared_at > self._cleared_at:
+            self.tracker.clear()
+            self._cleared_at = cleared_at
+        self._write(self.path, self.tracker, self._cleared_at)
+
+    @staticmethod
+    def _write(path: Path, tracker: MetricsTracker, cleared_at: float):
+        state = {"cleared_at": cleared_at, "tracker": tracker.to_state()}
+        atomic_write(path, json.dumps(state).encode("utf-8"))
+
+    def merged(self) -> MetricsTracker:
+        """A tracker holding every worker's metrics, this one's up to the moment"""
+        cleared_at = max(self._read_cleared(), self._cleared_at)
+        merged = self._new_tracker()
+        if cleared_at <= self._cleared_at:
+            merged.merge_state(self.tracker.to_state())
+        self._retire_stopped()
+        for path in [self.retired_path, *self.directory.glob("worker-*.json")]:
+            if path == self.path:
+                continue
+            state = self._read(path)
+            if state is not None and state["cleared_at"] >= cleared_at:
+                merged.merge_state(state["tracker"])
+        return merged
+
+    @staticmethod
+    def _read(path: Path) -> Optional[Dict[str, Any]]:
+        try:
+            return json.loads(path.read_text(encoding="utf-8"))
+        except FileNotFoundError:
+            return None  # Retired meanwhile by another worker
+
+    def _retire_stopped(self):
+        """Fold the last state of workers that stopped into retired.json"""
+        for path in self.directory.glob("worker-*.json"):
+            if path == self.path:
+                continue
+            alive = lock_file(path.with_suffix(".lock"), blocking=False)
+            if alive is None:
+                continue  # Still running
+            retired = lock_file(self.directory / "retired.lock")
+            try:
+                state = self._read(path)
+                if state is None:
+                    continue
+                tracker = self._new_tracker()
+                cleared_at = self._read_cleared()
+                for previous in (self._read(self.retired_path), state):
+                    if previous is not None and previous["cleared_at"] >= cleared_at:
+                        tracker.merge_state(previous["tracker"])
+                self._write(self.retired_path, tracker, cleared_at)
+                path.unlink()
+                path.with_suffix(".lock").unlink(missing_ok=True)
+            finally:
+                unlock_file(retired)
+                unlock_file(alive)
+
+    def clear(self):
+        """Clear the metrics of every worker"""
+        self._cleared_at = time.time()
+        atomic_write(self.cleared_path, repr(self._cleared_at).encode("utf-8"))
+        self.tracker.clear()
+        self.retired_path.unlink(missing_ok=True)
+        self.publish()
+
+    def close(self):
+        """Publish a last time and let go of the lock; other workers then retire the file"""
+        self.publish()
+        unlock_file(self._alive)
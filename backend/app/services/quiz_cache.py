@@ -0,0 +1,100 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, List, Optional
+
+import numpy as np
+
+
+class SemanticQuizCache:
+    """
+    Cache of generated quizzes keyed by topic embedding.
+    A lookup hits when a cached entry with the same `num_questions` and
+    `use_rag` has cosine similarity >= `similarity_threshold` to the new
+    topic, so "Roman Empire" can be served from "ancient rome". Entries
+    expire after `ttl_seconds`, the least recently used are evicted past
+    `max_entries`, and RAG entries only match requests for the collection
+    and `retrieval` settings (e.g. mode and ANN knobs) they were generated
+    with, and are dropped when the collection's vector store version
+    changes.
+    """
+
+    def __init__(self, similarity_threshold: float, ttl_seconds: float, max_entries: int):
+        self.similarity_threshold = similarity_threshold
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[int, Dict[str, Any]]" = OrderedDict()
+        self._next_key = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _normalize(embedding: List[float]) -> np.ndarray:
+        vector = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def lookup(
+        self,
+        embedding: List[float],
+        num_questions: int,
+        use_rag: bool,
+        store_version: int,
+        collection: str = "",
+        retrieval: Hashable = None,
+    ) -> Optional[Dict[str, Any]]:
+        """Return the cached result for the most similar matching topic, if any"""
+        query = self._normalize(embedding)
+        now = time.time()
+        with self._lock:
+            best_key, best_score = None, self.similarity_threshold
+            for key, entry in list(self._entries.items()):
+                same_corpus = not entry["use_rag"] or entry["collection"] == collection
+                if now - entry["created_at"] > self.ttl_seconds or (
+                    entry["use_rag"] and same_corpus and entry["store_version"] != store_version
+                ):
+                    del self._entries[key]
+                    continue
+                if entry["num_questions"] != num_questions or entry["use_rag"] != use_rag or not same_corpus:
+                    continue
+                if use_rag and entry["retrieval"] != retrieval:
+                    continue
+                score = float(np.dot(query, entry["embedding"]))
+                if score >= best_score:
+                    best_key, best_score = key, score
+
+            if best_key is None:
+                return None
+            self._entries.move_to_end(best_key)
+            return {**self._entries[best_key]["result"], "similarity": best_score}
+
+    def put(
+        self,
+        embedding: List[float],
+        num_questions: int,
+        use_rag: bool,
+        store_version: int,
+        result: Dict[str, Any],
+        collection: str = "",
+        retrieval: Hashable = None,
+    ):
+        with self._lock:
+            self._entries[self._next_key] = {
+                "embedding": self._normalize(embedding),
+                "num_questions": num_questions,
+                "use_rag": use_rag,
+                "store_version": store_version,
+                "collection": collection,
+                "retrieval": retrieval,
+                "created_at": time.time(),
+                "result": result,
+            }
+            self._next_key += 1
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
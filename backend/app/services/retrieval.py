@@ -1,34 +1,207 @@
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
+from app.services.concurrency import limiter
+from app.services.context_packing import ContextPacker
 from app.services.embeddings import EmbeddingService
+from app.services.tokenizer import get_tokenizer
+from app.services.tracing import span
 from app.services.vector_store import VectorStore
 from app.config import settings
 
+RETRIEVAL_MODES = ("vector", "lexical", "hybrid")
+
+
+def reciprocal_rank_fusion(rankings: List[List[int]], k: int = settings.RRF_K) -> List[int]:
+    """Merge ranked row lists; each list contributes 1 / (k + rank) per row"""
+    scores: Dict[int, float] = {}
+    for ranking in rankings:
+        for rank, row in enumerate(ranking, start=1):
+            scores[row] = scores.get(row, 0.0) + 1.0 / (k + rank)
+    return sorted(scores, key=lambda row: -scores[row])
+
 
 class RetrievalService:
-    def __init__(self, vector_store: VectorStore):
+    def __init__(
+        self,
+        vector_store: VectorStore,
+        embedding_service: Optional[EmbeddingService] = None,
+        packer: Optional[ContextPacker] = None,
+    ):
         self.vector_store = vector_store
-        self.embedding_service = EmbeddingService()
+        self.embedding_service = embedding_service or EmbeddingService()
+        self._packer = packer
+
+    @property
+    def packer(self) -> ContextPacker:
+        # Built on first use, so startup does not wait for the tokenizer
+        if self._packer is None:
+            self._packer = ContextPacker(settings.CONTEXT_TOKEN_BUDGET, settings.MMR_LAMBDA, get_tokenizer())
+        return self._packer
+
+    @staticmethod
+    def needs_embedding(mode: Optional[str]) -> bool:
+        """Whether retrieval in this mode embeds the query"""
+        return (mode or settings.RETRIEVAL_MODE) != "lexical"
     
-    def retrieve_context(self, query: str, top_k: int = 5) -> Dict[str, Any]:
+    def retrieve_context(
+        self,
+        query: str,
+        top_k: int = 5,
+        nprobe: Optional[int] = None,
+        ef_search: Optional[int] = None,
+        mode: Optional[str] = None,
+    ) -> Dict[str, Any]:
         """
         Retrieve relevant context for a query.
-        Returns both the concatenated context and individual chunks with scores.
+        Returns the packed context (see ContextPacker), the chunks it holds
+        and how many prompt tokens packing saved over joining every candidate
+        chunk it chose from.
+        `mode` is "vector", "lexical" (BM25, no embedding call) or "hybrid"
+        (both, fused by reciprocal rank); defaults to RETRIEVAL_MODE.
         """
-        # Generate query embedding
-        query_embedding = self.embedding_service.embed_texts([query])[0]
-        
-        # Search vector store
-        results = self.vector_store.search(query_embedding, k=top_k)
-        
-        # Concatenate context
-        context_parts = []
-        for result in results:
-            context_parts.append(result.get("text", ""))
-        
-        context = "\n\n".join(context_parts)
+        mode = self._mode(mode)
+        with span("retrieval"):
+            query_embedding = None
+            if mode != "lexical":
+                # Generate query embedding
+                with span("embed_query"):
+                    query_embedding = self.embedding_service.embed_texts([query])[0]
+            
+            # Search vector store
+            results = self._search(query, query_embedding, self._candidates(top_k), nprobe, ef_search, mode)
+            
+            return self._build_context(results)
+
+    async def aretrieve_context(
+        self,
+        query: str,
+        top_k: int = 5,
+        nprobe: Optional[int] = None,
+        ef_search: Optional[int] = None,
+        query_embedding: Optional[List[float]] = None,
+        mode: Optional[str] = None,
+    ) -> Dict[str, Any]:
+        """
+        Async variant of `retrieve_context`; the searches and context packing
+        (tokenizing) run off the event loop. Pass `query_embedding` when the
+        caller has already embedded the query.
+        """
+        mode = self._mode(mode)
+        with span("retrieval"):
+            if mode != "lexical" and query_embedding is None:
+                with span("embed_query"):
+                    query_embedding = (await self.embedding_service.aembed_texts([query]))[0]
+            results = await limiter.run(
+                "search", self._search, query, query_embedding, self._candidates(top_k), nprobe, ef_search, mode
+            )
+            return await limiter.offload(self._build_context, results)
+
+    async def aretrieve_context_batch(
+        self,
+        queries: List[str],
+        top_k: int = 5,
+        nprobe: Optional[int] = None,
+        ef_search: Optional[int] = None,
+        query_embeddings: Optional[List[List[float]]] = None,
+        mode: Optional[str] = None,
+    ) -> List[Dict[str, Any]]:
+        """
+        `aretrieve_context` for many queries: one embedding call for all of
+        them and one multi-row FAISS search. Results are in query order.
+        """
+        mode = self._mode(mode)
+        with span("retrieval"):
+            if mode != "lexical" and query_embeddings is None:
+                with span("embed_query"):
+                    query_embeddings = await self.embedding_service.aembed_texts(queries)
+            results = await limiter.run(
+                "search", self._search_batch, queries, query_embeddings, self._candidates(top_k), nprobe, ef_search, mode
+            )
+            return await limiter.offload(self._build_contexts, results)
+
+    def _search_batch(
+        self,
+        queries: List[str],
+        query_embeddings: Optional[List[List[float]]],
+        top_k: int,
+        nprobe: Optional[int],
+        ef_search: Optional[int],
+        mode: str,
+    ) -> List[List[Dict[str, Any]]]:
+        with span("search"):
+            if mode == "lexical":
+                with span("bm25"):
+                    rows = [self.vector_store.lexical_search_rows(query, k=top_k) for query in queries]
+            elif mode == "vector":
+                with span("faiss"):
+                    rows = self.vector_store.search_rows_batch(
+                        query_embeddings, k=top_k, nprobe=nprobe, ef_search=ef_search
+                    )
+            else:
+                candidates = top_k * settings.HYBRID_CANDIDATES
+                with span("faiss"):
+                    vector_rows = self.vector_store.search_rows_batch(
+                        query_embeddings, k=candidates, nprobe=nprobe, ef_search=ef_search
+                    )
+                with span("bm25"):
+                    lexical_rows = [self.vector_store.lexical_search_rows(query, k=candidates) for query in queries]
+                rows = [
+                    reciprocal_rank_fusion([vector, lexical])[:top_k]
+                    for vector, lexical in zip(vector_rows, lexical_rows)
+                ]
+            with span("fetch_rows"):
+                return [self.vector_store.get_rows(query_rows) for query_rows in rows]
+
+    @staticmethod
+    def _candidates(top_k: int) -> int:
+        return top_k * settings.CONTEXT_CANDIDATES
+
+    def _mode(self, mode: Optional[str]) -> str:
+        mode = mode or settings.RETRIEVAL_MODE
+        if mode not in RETRIEVAL_MODES:
+            raise ValueError(f"Unknown retrieval mode: {mode}. Expected one of {RETRIEVAL_MODES}")
+        return mode
+
+    def _search(self, *args) -> List[Dict[str, Any]]:
+        with span("search"):
+            rows = self._search_rows(*args)
+            with span("fetch_rows"):
+                return self.vector_store.get_rows(rows)
+
+    def _search_rows(
+        self,
+        query: str,
+        query_embedding: Optional[List[float]],
+        top_k: int,
+        nprobe: Optional[int],
+        ef_search: Optional[int],
+        mode: str,
+    ) -> List[int]:
+        if mode == "vector":
+            with span("faiss"):
+                return self.vector_store.search_rows(query_embedding, k=top_k, nprobe=nprobe, ef_search=ef_search)
+        if mode == "lexical":
+            with span("bm25"):
+                return self.vector_store.lexical_search_rows(query, k=top_k)
+
+        # Hybrid: fuse deeper candidate lists from both rankers
+        candidates = top_k * settings.HYBRID_CANDIDATES
+        with span("faiss"):
+            vector_rows = self.vector_store.search_rows(query_embedding, k=candidates, nprobe=nprobe, ef_search=ef_search)
+        with span("bm25"):
+            lexical_rows = self.vector_store.lexical_search_rows(query, k=candidates)
+        return reciprocal_rank_fusion([vector_rows, lexical_rows])[:top_k]
+
+    def _build_contexts(self, results: List[List[Dict[str, Any]]]) -> List[Dict[str, Any]]:
+        return [self._build_context(chunks) for chunks in results]
+
+    def _build_context(self, results: List[Dict[str, Any]]) -> Dict[str, Any]:
+        with span("pack_context"):
+            packed = self.packer.pack(results)
         
         return {
-            "context": context,
-            "chunks": results,
-            "num_chunks": len(results)
+            "context": packed.context,
+            "chunks": packed.chunks,
+            "num_chunks": len(packed.chunks),
+            "context_tokens": packed.tokens,
+            "context_tokens_saved": packed.baseline_tokens - packed.tokens
         }
@@ -0,0 +1,115 @@
+import asyncio
+import threading
+from concurrent.futures import Future
+from typing import Any, Awaitable, Callable, Dict, Hashable, Iterable, List, Optional, Sequence, Tuple
+
+
+class _Abandoned(Exception):
+    """Set on a call's future when its leader was cancelled; the waiters retry"""
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent identical upstream calls. The first caller for a
+    key (the leader) makes the call; callers asking for the same key while
+    it is in flight wait for the leader's result instead of repeating the
+    call. Results are shared, not copied. A leader's error is raised in its
+    waiters too, except cancellation: the waiters then retry themselves.
+    Works across threads and event loops, so sync and async callers of the
+    same key share one call.
+
+    `record(kind, calls, coalesced)` is told how many keys each caller had
+    to call upstream and how many it got from another caller's call.
+    """
+
+    def __init__(self, kind: str, record: Optional[Callable[[str, int, int], None]] = None):
+        self.kind = kind
+        self.record = record
+        self._calls: Dict[Hashable, Future] = {}
+        self._lock = threading.Lock()
+
+    def claim(self, keys: Iterable[Hashable]) -> Tuple[List[Hashable], Dict[Hashable, Future]]:
+        """
+        Split distinct keys into those the caller now leads (and must
+        `resolve` or `fail`) and the futures of those already in flight
+        """
+        led, waiting = [], {}
+        with self._lock:
+            for key in keys:
+                if key in self._calls:
+                    waiting[key] = self._calls[key]
+                else:
+                    self._calls[key] = Future()
+                    led.append(key)
+        if self.record is not None:
+            self.record(self.kind, len(led), len(waiting))
+        return led, waiting
+
+    def resolve(self, keys: Sequence[Hashable], results: Sequence[Any]):
+        with self._lock:
+            futures = [self._calls.pop(key) for key in keys]
+        for future, result in zip(futures, results):
+            future.set_result(result)
+
+    def fail(self, keys: Sequence[Hashable], error: BaseException):
+        with self._lock:
+            futures = [self._calls.pop(key) for key in keys]
+        # Only errors the call itself raised are shared
+        shared = error if isinstance(error, Exception) else _Abandoned()
+        for future in futures:
+            future.set_exception(shared)
+
+    @staticmethod
+    def wait(waiting: Dict[Hashable, Future]) -> Dict[Hashable, Any]:
+        """Results of the awaited calls; keys whose leader was cancelled are left out"""
+        results = {}
+        for key, future in waiting.items():
+            try:
+                results[key] = future.result()
+            except _Abandoned:
+                pass
+        return results
+
+    @staticmethod
+    async def await_all(waiting: Dict[Hashable, Future]) -> Dict[Hashable, Any]:
+        """Async variant of `wait`"""
+        results = {}
+        for key, future in waiting.items():
+            try:
+                # Shielded: a waiter cancelled must not cancel the shared call
+                results[key] = await asyncio.shield(asyncio.wrap_future(future))
+            except _Abandoned:
+                pass
+        return results
+
+    def do(self, key: Hashable, fn: Callable[..., Any], *args) -> Tuple[Any, bool]:
+        """(result of `fn(*args)`, whether it came from another caller's call)"""
+        while True:
+            led, waiting = self.claim([key])
+            if led:
+                try:
+                    result = fn(*args)
+                except BaseException as e:
+                    self.fail(led, e)
+                    raise
+                self.resolve(led, [result])
+                return result, False
+            results = self.wait(waiting)
+            if key in results:
+                return results[key], True
+
+    async def ado(self, key: Hashable, fn: Callable[..., Awaitable[Any]], *args) -> Tuple[Any, bool]:
+        """Async variant of `do` for a coroutine function"""
+        while True:
+            led, waiting = self.claim([key])
+            if led:
+                try:
+                    result = await fn(*args)
+                except BaseException as e:
+                    self.fail(led, e)
+                    raise
+                self.resolve(led, [result])
+                return result, False
+            results = await self.await_all(waiting)
+            if key in results:
+                return results[key], True
@@ -0,0 +1,55 @@
+import json
+from typing import Any, Dict, List
+
+
+class JsonArrayStreamParser:
+    """
+    Incremental parser for a streamed JSON array of objects.
+    Text before the opening `[` (e.g. a markdown fence) is skipped, and each
+    top-level object is decoded as soon as its closing brace arrives.
+    """
+
+    def __init__(self):
+        self.started = False
+        self.finished = False
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._buffer: List[str] = []
+
+    def feed(self, text: str) -> List[Dict[str, Any]]:
+        """Consume the next piece of text; returns objects completed by it"""
+        completed = []
+        for char in text:
+            if self.finished:
+                break
+            if not self.started:
+                self.started = char == "["
+                continue
+
+            if self._depth:
+                self._buffer.append(char)
+
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif char == "\\":
+                    self._escape = True
+                elif char == '"':
+                    self._in_string = False
+            elif char == '"':
+                self._in_string = True
+            elif char in "{[":
+                if self._depth == 0:
+                    self._buffer = [char]
+                self._depth += 1
+            elif char in "}]":
+                if self._depth == 0:
+                    # Closing bracket of the top-level array
+                    self.finished = char == "]"
+                    continue
+                self._depth -= 1
+                if self._depth == 0:
+                    completed.append(json.loads("".join(self._buffer)))
+                    self._buffer = []
+        return completed
@@ -0,0 +1,15 @@
+import functools
+
+import tiktoken
+
+ENCODING = "cl100k_base"
+
+
+@functools.lru_cache(maxsize=None)
+def get_tokenizer() -> tiktoken.Encoding:
+    """
+    Shared token counter (tiktoken as an approximation for Gemini).
+    Loaded on first use rather than at import: reading the BPE ranks is a
+    noticeable share of cold start.
+    """
+    return tiktoken.get_encoding(ENCODING)
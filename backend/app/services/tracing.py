@@ -0,0 +1,146 @@
+import json
+import logging
+import threading
+import time
+from contextvars import ContextVar
+from typing import Any, Dict, List, Optional
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+_current_span: ContextVar[Optional["Span"]] = ContextVar("current_span", default=None)
+_current_trace: ContextVar[Optional["Trace"]] = ContextVar("current_trace", default=None)
+
+
+class Span:
+    """
+    One timed stage. On exit its duration, and everything recorded under it,
+    is folded into the parent's per-path totals, so a stage that runs once
+    per batch costs one entry rather than one object per call.
+    """
+
+    __slots__ = ("name", "parent", "start", "totals", "_lock", "_previous")
+
+    def __init__(self, name: str, parent: Optional["Span"] = None):
+        self.name = name
+        self.parent = parent
+        self.start = time.perf_counter()
+        # Path ("retrieval/search") -> [seconds, count]
+        self.totals: Dict[str, List[float]] = {}
+        # Children may exit on worker threads (see StageLimiter.offload)
+        self._lock = threading.Lock()
+        self._previous: Optional[Span] = None
+
+    def __enter__(self) -> "Span":
+        self._previous = _current_span.get()
+        _current_span.set(self)
+        return self
+
+    def __exit__(self, *exc):
+        seconds = time.perf_counter() - self.start
+        # set() rather than reset(): streaming responses may exit in a copied context
+        _current_span.set(self._previous)
+        if self.parent is not None:
+            self.parent._fold(self.name, seconds, self.totals)
+
+    def _fold(self, name: str, seconds: float, totals: Dict[str, List[float]]):
+        with self._lock:
+            entry = self.totals.setdefault(name, [0.0, 0])
+            entry[0] += seconds
+            entry[1] += 1
+            for path, (child_seconds, count) in totals.items():
+                entry = self.totals.setdefault(f"{name}/{path}", [0.0, 0])
+                entry[0] += child_seconds
+                entry[1] += count
+
+    def breakdown(self) -> Dict[str, Dict[str, float]]:
+        """Total milliseconds and call count per span path, for finished spans"""
+        with self._lock:
+            return {path: {"ms": round(seconds * 1000, 3), "count": count} for path, (seconds, count) in self.totals.items()}
+
+
+class _NoopSpan:
+    """Returned by `span` outside a trace, so disabled tracing costs one lookup"""
+
+    __slots__ = ()
+
+    def __enter__(self):
+        return None
+
+    def __exit__(self, *exc):
+        pass
+
+
+_NOOP = _NoopSpan()
+
+
+def span(name: str):
+    """Time a stage as a child of the current span; a no-op when nothing is being traced"""
+    parent = _current_span.get()
+    if parent is None:
+        return _NOOP
+    return Span(name, parent)
+
+
+class Trace(Span):
+    """
+    Root span of a request or ingestion job.
+    On exit, traces slower than `slow_seconds` log their span breakdown.
+    """
+
+    __slots__ = ("slow_seconds", "end", "_previous_trace")
+
+    def __init__(self, name: str, slow_seconds: float = settings.TRACE_SLOW_SECONDS):
+        super().__init__(name)
+        self.slow_seconds = slow_seconds
+        self.end: Optional[float] = None
+        self._previous_trace: Optional[Trace] = None
+
+    def __enter__(self) -> "Trace":
+        self._previous_trace = _current_trace.get()
+        _current_trace.set(self)
+        return super().__enter__()
+
+    def __exit__(self, *exc):
+        self.end = time.perf_counter()
+        super().__exit__(*exc)
+        _current_trace.set(self._previous_trace)
+        if self.slow_seconds and self.duration_ms >= self.slow_seconds * 1000:
+            logger.warning("Slow %s: %.0f ms %s", self.name, self.duration_ms, json.dumps(self.breakdown()))
+
+    @property
+    def duration_ms(self) -> float:
+        return ((self.end or time.perf_counter()) - self.start) * 1000
+
+    def summary(self) -> Dict[str, Any]:
+        """Elapsed time so far and the per-stage breakdown, for response metrics"""
+        return {"total_ms": round(self.duration_ms, 3), "spans": self.breakdown()}
+
+
+def trace(name: str):
+    """Start a root trace when TRACING_ENABLED, else a no-op"""
+    if not settings.TRACING_ENABLED:
+        return _NOOP
+    return Trace(name)
+
+
+def current_trace() -> Optional[Trace]:
+    """The root trace of the running request or job, if any"""
+    return _current_trace.get()
+
+
+class TracingMiddleware:
+    """
+    ASGI middleware that wraps each HTTP request in a trace. Unlike an
+    `@app.middleware` function it stays active while a streaming body is sent.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not settings.TRACING_ENABLED:
+            return await self.app(scope, receive, send)
+        with Trace(f"{scope['method']} {scope['path']}"):
+            await self.app(scope, receive, send)
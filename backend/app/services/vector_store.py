@@ -1,55 +1,744 @@
-from typing import List, Dict, Any
+from typing import Iterable, Iterator, List, Dict, Any, NamedTuple, Optional, Set, Tuple
 import faiss
+import itertools
 import json
+import os
+import threading
+from contextlib import contextmanager
 from pathlib import Path
 import numpy as np
 
+from app.config import settings
+from app.services.index_factory import (
+    build_index,
+    index_ids,
+    index_memory_bytes,
+    remove_ids,
+    search_params,
+    train_from,
+    training_threshold,
+    unwrap,
+    with_ids,
+)
+from app.services.lexical_index import BM25Index
+from app.services.metadata_store import ChunkMetadataStore
+from app.services.wal import FileLock, WriteAheadLog, atomic_write, fcntl
+
+# Store versions are drawn from one process-wide sequence, so a store reopened
+# (e.g. after its collection was evicted) never repeats a version it had before
+_versions = itertools.count(1)
+
+
+class DeltaBuffer:
+    """
+    Vectors added since the index was last rebuilt, with their rows and
+    squared norms. Append-only: rows covered by a `view` are never written
+    again, and growing copies into fresh arrays, so a view stays valid while
+    later rows are appended.
+    """
+
+    def __init__(self, dim: int):
+        self._ids = np.empty(0, dtype=np.int64)
+        self._vectors = np.empty((0, dim), dtype=np.float32)
+        self._norms = np.empty(0, dtype=np.float32)
+        self.size = 0
+
+    def __len__(self) -> int:
+        return self.size
+
+    def append(self, vectors: np.ndarray, ids: np.ndarray):
+        end = self.size + len(vectors)
+        if end > len(self._ids):
+            capacity = 2 * end
+            self._ids = self._grow(self._ids, capacity)
+            self._vectors = self._grow(self._vectors, capacity)
+            self._norms = self._grow(self._norms, capacity)
+        self._ids[self.size : end] = ids
+        self._vectors[self.size : end] = vectors
+        self._norms[self.size : end] = np.einsum("ij,ij->i", vectors, vectors)
+        self.size = end
+
+    def _grow(self, array: np.ndarray, capacity: int) -> np.ndarray:
+        grown = np.empty((capacity,) + array.shape[1:], dtype=array.dtype)
+        grown[: self.size] = array[: self.size]
+        return grown
+
+    def view(self) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """(rows, vectors, squared norms) appended so far"""
+        return self._ids[: self.size], self._vectors[: self.size], self._norms[: self.size]
+
+    def memory_bytes(self) -> int:
+        return self._ids.nbytes + self._vectors.nbytes + self._norms.nbytes
+
+
+class IndexSnapshot(NamedTuple):
+    """
+    What a search runs against: the index last rebuilt by compaction plus
+    the delta of rows added since, minus tombstoned rows. Never modified
+    once published; writers build the next snapshot and swap it in.
+    """
+
+    index: faiss.Index
+    delta_ids: np.ndarray
+    delta_vectors: np.ndarray
+    delta_norms: np.ndarray
+    # FAISS selector passing every row but the tombstoned ones, with the id
+    # batch it wraps, and the tombstoned positions in the delta
+    exclusion: Optional[Tuple[faiss.IDSelector, faiss.IDSelector]]
+    delta_excluded: Optional[np.ndarray]
+
+    @property
+    def ntotal(self) -> int:
+        return self.index.ntotal + len(self.delta_ids)
+
+    def search(
+        self,
+        queries: np.ndarray,
+        k: int,
+        nprobe: Optional[int] = None,
+        ef_search: Optional[int] = None,
+    ) -> np.ndarray:
+        """Rows of the k nearest vectors per query, nearest first; -1 pads missing hits"""
+        if self.index.ntotal:
+            selector = self.exclusion[0] if self.exclusion is not None else None
+            params = search_params(self.index, nprobe=nprobe, ef_search=ef_search, selector=selector)
+            distances, rows = self.index.search(queries, k, params=params)
+        else:
+            distances, rows = np.empty((len(queries), 0), dtype=np.float32), np.empty((len(queries), 0), dtype=np.int64)
+        if not len(self.delta_ids):
+            return rows
+        # The delta is small (compaction folds it in), so it is searched
+        # exactly and merged by distance: squared L2, as the index reports
+        delta_distances = (
+            self.delta_norms[None, :] - 2 * queries @ self.delta_vectors.T + np.einsum("ij,ij->i", queries, queries)[:, None]
+        )
+        if self.delta_excluded is not None:
+            delta_distances[:, self.delta_excluded] = np.inf
+        if delta_distances.shape[1] > k:
+            top = np.argpartition(delta_distances, k - 1, axis=1)[:, :k]
+            delta_rows = self.delta_ids[top]
+            delta_distances = np.take_along_axis(delta_distances, top, axis=1)
+        else:
+            delta_rows = np.broadcast_to(self.delta_ids, delta_distances.shape)
+        distances = np.hstack([distances, delta_distances])
+        rows = np.hstack([rows, delta_rows])
+        order = np.argsort(distances, axis=1, kind="stable")[:, :k]
+        distances = np.take_along_axis(distances, order, axis=1)
+        return np.where(np.isinf(distances), -1, np.take_along_axis(rows, order, axis=1))
+
 
 class VectorStore:
+    """
+    FAISS index persisted as a snapshot (`<name>.faiss`) plus an append-only
+    write-ahead log (`<name>.wal`); chunk metadata lives in SQLite
+    (`<name>.meta.sqlite3`). `save` only writes what changed since the last
+    save; the log is folded back into the snapshot by background compaction.
+    A BM25 index over the chunk text is kept alongside and snapshotted with
+    the FAISS index (`<name>.bm25`); rows newer than its snapshot are
+    re-tokenized from the metadata store on load.
+
+    Each chunk gets a row that is its FAISS id and is never reused. Deleted
+    rows are tombstoned: excluded from both searches at once, and purged from
+    the indexes by the next compaction, which also starts once tombstones
+    reach VECTOR_STORE_TOMBSTONE_RATIO of the index.
+
+    Searches take no lock. They run against an IndexSnapshot: the FAISS
+    index, which is never modified once searchable, plus a delta holding
+    the rows added since it was built (the WAL's rows), searched exactly.
+    Writers append to the delta and swap in a new snapshot that covers the
+    new rows; compaction builds the next index aside from the current one
+    and swaps it in with an empty delta. A row's metadata and BM25 entry
+    exist before any snapshot holding its vector is published.
+
+    With `mmap`, the snapshot is memory-mapped rather than read, so opening
+    the store costs the same for any corpus size; the index compaction
+    builds is mapped again once written. The BM25 index and the
+    ingested-file list are loaded on first use (or `warm_up`).
+
+    With `shared`, several processes open the same store (MULTI_WORKER).
+    Writes go through `writing`, which holds the store's lock file and ends
+    by folding them into a new snapshot and bumping a version stamp; the
+    other processes only read, and `refresh` reloads them when the stamp
+    moves. Opening a shared store changes no files unless the calling
+    thread holds the lock.
+    """
+
+    # Attributes loaded from disk, swapped in as a whole by refresh; the
+    # snapshot goes last, so a search never meets rows its metadata lacks
+    _LOADED_STATE = (
+        "metadata_store",
+        "_lexical_index",
+        "_ingested_files",
+        "_delta",
+        "_wal_rows",
+        "_snapshot_rows",
+        "_persisted_rows",
+        "_tombstones",
+        "_exclusion",
+        "_loaded_version",
+        "_snapshot",
+    )
+
     def __init__(
         self,
         dim: int,
         storage_dir: Path,
         index_name: str = "documents",
+        index_type: str = settings.VECTOR_INDEX_TYPE,
+        nlist: int = settings.IVF_NLIST,
+        quantization: str = settings.VECTOR_QUANTIZATION,
+        mmap: bool = settings.FAST_START,
+        shared: bool = settings.MULTI_WORKER,
     ):
+        if shared and fcntl is None:
+            raise ValueError("A shared vector store needs fcntl file locks, which this platform lacks")
         self.dim = dim
+        self.index_type = index_type
+        self.nlist = nlist
+        self.quantization = quantization
+        self.mmap = mmap
+        self.shared = shared
         self.storage_dir = storage_dir
+        self.index_name = index_name
         self.index_path = storage_dir / f"{index_name}.faiss"
-        self.meta_path = storage_dir / f"{index_name}.json"
+        self.meta_db_path = storage_dir / f"{index_name}.meta.sqlite3"
+        self.lexical_path = storage_dir / f"{index_name}.bm25"
+        # Pre-SQLite metadata files, imported once on first load
+        self.legacy_meta_path = storage_dir / f"{index_name}.json"
+        self.legacy_files_path = storage_dir / f"{index_name}.files.json"
+        self.wal_path = storage_dir / f"{index_name}.wal"
+        # WAL segment being folded into the snapshot by an in-progress compaction
+        self.compacting_wal_path = storage_dir / f"{index_name}.wal.compacting"
+        self.lock_path = storage_dir / f"{index_name}.lock"
 
         self.storage_dir.mkdir(parents=True, exist_ok=True)
 
+        self._lock = threading.RLock()
+        # Changed on every change to the indexed content; lets caches detect staleness
+        self.version = next(_versions)
+        self._compaction_lock = threading.Lock()
+        self._compaction_thread: Optional[threading.Thread] = None
+        self._wal = WriteAheadLog(self.wal_path)
+        self._write_lock = FileLock.for_path(self.lock_path)
+        # Nesting depth of writing() and whether it has changes to publish
+        self._writing = 0
+        self._unpublished = False
+        self._refresh_lock = threading.Lock()
+
+        self.metadata_store = ChunkMetadataStore(self.meta_db_path)
+        # Read first: a change published while the rest loads is picked up
+        # by the next refresh
+        self._loaded_version = self.metadata_store.state("version")
+        self._migrate_legacy_metadata()
+
         if self.index_path.exists():
-            self.index = faiss.read_index(str(self.index_path))
-            self.metadata = self._load_metadata()
+            index = self._read_index()
+        elif training_threshold(index_type, nlist, quantization):
+            # Indexes that need training start as a flat buffer (see _merged_index)
+            index = with_ids(build_index("flat", dim, nlist, quantization="none"))
         else:
-            self.index = faiss.IndexFlatL2(dim)
-            self.metadata: List[Dict[str, Any]] = []
+            index = with_ids(build_index(index_type, dim, nlist, quantization))
+
+        # Loaded on first use; see the lexical_index and ingested_files properties
+        self._lexical_index: Optional[BM25Index] = None
+        self._ingested_files: Optional[Dict[str, str]] = None
+
+        # Rows/files added since the last save, and how many rows the WAL holds
+        self._pending_vectors: List[np.ndarray] = []
+        self._pending_files: Dict[str, str] = {}
+        self._wal_rows = 0
+        self._snapshot_rows = index.ntotal
+
+        # An existing snapshot's dimension wins over the configured one
+        self.dim = index.d
+        # Rows in the WAL but not the snapshot file
+        self._delta = DeltaBuffer(self.dim)
+        self._replay_wal(index)
+        # Deleted rows whose vectors are still in the index, and the FAISS
+        # selector excluding them from searches (rebuilt after each delete)
+        self._tombstones: Set[int] = set(self.metadata_store.deleted_rows(purged=False))
+        self._exclusion: Optional[Tuple[faiss.IDSelector, faiss.IDSelector]] = None
+        self._swap_snapshot(index)
+
+    @property
+    def index(self) -> faiss.Index:
+        """The index searches currently use; rows added since it was built are in the delta"""
+        return self._snapshot.index
+
+    @property
+    def ntotal(self) -> int:
+        """Vectors searches currently cover, tombstoned ones included"""
+        return self._snapshot.ntotal
+
+    def _read_index(self) -> faiss.Index:
+        return with_ids(faiss.read_index(str(self.index_path), faiss.IO_FLAG_MMAP_IFC if self.mmap else 0))
+
+    def _swap_snapshot(self, index: Optional[faiss.Index] = None):
+        """
+        Publish the index (by default the current one), the delta and the
+        tombstones as the snapshot searches use. It is a single reference
+        assignment, so a search runs against the old snapshot or the new
+        one, never a mix; the caller holds the lock.
+        """
+        delta_ids, delta_vectors, delta_norms = self._delta.view()
+        exclusion, delta_excluded = None, None
+        if self._tombstones:
+            if self._exclusion is None:
+                batch = faiss.IDSelectorBatch(np.fromiter(self._tombstones, dtype=np.int64))
+                self._exclusion = (faiss.IDSelectorNot(batch), batch)
+            exclusion = self._exclusion
+            if len(delta_ids):
+                delta_excluded = np.isin(delta_ids, np.fromiter(self._tombstones, dtype=np.int64))
+        self._snapshot = IndexSnapshot(
+            index if index is not None else self._snapshot.index,
+            delta_ids,
+            delta_vectors,
+            delta_norms,
+            exclusion,
+            delta_excluded,
+        )
+
+    @property
+    def lexical_index(self) -> BM25Index:
+        if self._lexical_index is None:
+            with self._lock:
+                if self._lexical_index is None:
+                    self._lexical_index = self._load_lexical_index()
+        return self._lexical_index
+
+    @property
+    def ingested_files(self) -> Dict[str, str]:
+        """Content hash -> filename of every file already ingested"""
+        if self._ingested_files is None:
+            with self._lock:
+                if self._ingested_files is None:
+                    self._ingested_files = self.metadata_store.ingested_files()
+        return self._ingested_files
+
+    def warm_up(self):
+        """Load everything deferred at open, so the first query does not pay for it"""
+        self.lexical_index
+        self.ingested_files
+
+    def memory_bytes(self) -> int:
+        """Estimated memory held by the index, plus the BM25 index once loaded"""
+        lexical = self._lexical_index.memory_bytes() if self._lexical_index is not None else 0
+        return index_memory_bytes(self.index) + self._delta.memory_bytes() + lexical
+
+    @property
+    def next_row(self) -> int:
+        """Row the next added chunk gets"""
+        return len(self.metadata_store)
 
     def add(self, embeddings: List[List[float]], metadatas: List[Dict[str, Any]]):
-        vectors = np.array(embeddings).astype("float32")
-        self.index.add(vectors)
-        self.metadata.extend(metadatas)
+        """
+        Append rows. They go to the delta and become searchable when the
+        next snapshot is swapped in, after their metadata and BM25 entries
+        exist; searches never wait for this.
+        """
+        vectors = np.array(embeddings).astype("float32").reshape(len(embeddings), -1)
+        if vectors.shape[1] != self.dim:
+            raise ValueError(f"Expected {self.dim}-dimensional embeddings, got {vectors.shape[1]}")
+        with self._lock:
+            start = self.next_row
+            # Loaded before the rows exist, or it would index them twice
+            lexical_index = self.lexical_index
+            self.metadata_store.append(metadatas)
+            lexical_index.add(start, [meta.get("text", "") for meta in metadatas])
+            self._delta.append(vectors, np.arange(start, start + len(vectors), dtype=np.int64))
+            self._swap_snapshot()
+            self._pending_vectors.append(vectors)
+            self.version = next(_versions)
+            self._unpublished = True
+
+    def _train_due(self, num_vectors: int) -> bool:
+        """Whether the flat buffer, at `num_vectors`, can be replaced by the trained IVF (or int8) index"""
+        threshold = training_threshold(self.index_type, self.nlist, self.quantization)
+        return bool(threshold) and isinstance(unwrap(self.index), faiss.IndexFlat) and num_vectors >= threshold
+
+    def _merged_index(self, purged: Set[int]) -> faiss.Index:
+        """
+        A new index holding the current one's vectors plus the delta, less
+        `purged`, built aside while searches keep using the current one.
+        Once enough vectors exist, the flat buffer is replaced by the
+        trained index of the configured type.
+        """
+        index = faiss.deserialize_index(faiss.serialize_index(self.index))
+        delta_ids, delta_vectors, _ = self._delta.view()
+        if len(delta_ids):
+            index.add_with_ids(delta_vectors, delta_ids)
+        if purged:
+            index = remove_ids(index, purged)
+        if self._train_due(index.ntotal):
+            index = train_from(index, self.index_type, self.nlist, self.quantization)
+        return index
 
     def save(self):
-        faiss.write_index(self.index, str(self.index_path))
-        with open(self.meta_path, "w", encoding="utf-8") as f:
-            json.dump(self.metadata, f, indent=2)
+        """
+        Persist rows and files added since the last save.
+        Cost depends on the size of the change, not of the corpus.
+        """
+        with self._lock:
+            self._flush()
+            self._maybe_compact()
+
+    def _flush(self):
+        with self._lock:
+            if not self._pending_vectors and not self._pending_files:
+                return
+            # Metadata rows are committed before their vectors reach the WAL;
+            # rows without vectors are trimmed on load (see _replay_wal)
+            self.metadata_store.commit()
+            if self._pending_vectors:
+                vectors = np.concatenate(self._pending_vectors)
+                self._wal.append(self._persisted_rows, vectors, {})
+                self._persisted_rows += len(vectors)
+                self._wal_rows += len(vectors)
+                self._pending_vectors = []
+                # Once purged rows have left the snapshot, neither it nor the
+                # WAL can tell how many rows exist; see _replay_wal
+                self.metadata_store.set_state("persisted_rows", self._persisted_rows)
+            # Files are registered last so a crash never marks a file as
+            # ingested without its chunks; a file name maps to the content
+            # last ingested under it
+            self.metadata_store.remove_files(set(self._pending_files.values()))
+            self.metadata_store.add_files(self._pending_files)
+            self.metadata_store.commit()
+            self._pending_files = {}
+
+    def _maybe_compact(self):
+        # A shared store compacts when writing() publishes
+        if not self.shared and self._should_compact():
+            self._compaction_thread = threading.Thread(target=self.compact, daemon=True)
+            self._compaction_thread.start()
+
+    def _should_compact(self) -> bool:
+        if self._compaction_thread is not None and self._compaction_thread.is_alive():
+            return False
+        if self._purge_due() or self._train_due(self.ntotal - len(self._tombstones)):
+            return True
+        threshold = max(
+            settings.VECTOR_STORE_COMPACT_MIN_ROWS,
+            settings.VECTOR_STORE_COMPACT_RATIO * self._snapshot_rows,
+        )
+        return self._wal_rows >= threshold
+
+    def _purge_due(self) -> bool:
+        return bool(self._tombstones) and len(self._tombstones) >= settings.VECTOR_STORE_TOMBSTONE_RATIO * self.ntotal
+
+    def compact(self):
+        """
+        Fold the WAL into a new snapshot, purging tombstoned rows.
+        The live WAL is rotated aside under the lock so writers can keep
+        appending to a fresh one while the snapshot is written; each file is
+        replaced atomically, so a crash at any point leaves a loadable store.
+        """
+        with self._compaction_lock:
+            if self.shared:
+                with self.writing():
+                    self._compact()
+                    self._unpublished = True
+            else:
+                self._compact()
+
+    def _compact(self, purge: bool = True):
+        with self._lock:
+            # Only snapshot rows whose metadata and vectors are durable
+            self._flush()
+            if self.compacting_wal_path.exists():
+                # A previous compaction died before finishing; its segment is
+                # already part of the in-memory state, so rotate into it.
+                self._append_wal_to(self.compacting_wal_path)
+            else:
+                self._wal.close()
+                if self.wal_path.exists():
+                    os.replace(self.wal_path, self.compacting_wal_path)
+            purged = set(self._tombstones) if purge else set()
+            index = self._merged_index(purged)
+            if purged:
+                self.lexical_index.purge()
+                self._tombstones = set()
+                self._exclusion = None
+            self._delta = DeltaBuffer(self.dim)
+            self._swap_snapshot(index)
+            index_bytes = faiss.serialize_index(index)
+            lexical_bytes = self.lexical_index.serialize()
+            self._wal_rows = 0
+            self._snapshot_rows = index.ntotal
+
+        atomic_write(self.lexical_path, lexical_bytes)
+        atomic_write(self.index_path, index_bytes.tobytes())
+        self.compacting_wal_path.unlink(missing_ok=True)
+        if self.mmap:
+            # Searches move to the mapped file, releasing the RAM copy
+            with self._lock:
+                if self.index is index:
+                    self._swap_snapshot(self._read_index())
+        if purged:
+            # Until here a reload still finds these rows in the old snapshot
+            self.metadata_store.mark_purged(purged)
+
+    def close(self):
+        """Flush pending writes and wait for any background compaction"""
+        self.save()
+        if self._compaction_thread is not None:
+            self._compaction_thread.join()
+        self._wal.close()
+        self.metadata_store.close()
+
+    def _writer(self) -> bool:
+        """Whether the calling thread may change the store's files"""
+        return not self.shared or self._write_lock.held()
+
+    @contextmanager
+    def writing(self) -> Iterator["VectorStore"]:
+        """
+        Scope of a group of writes (an ingestion job, a delete). For a shared
+        store it holds the lock file, so one process writes at a time: the
+        store is first reloaded if another process published changes, and on
+        exit the writes are published (see _publish). Otherwise it does
+        nothing; writes are serialized by the in-process lock alone.
+        """
+        if not self.shared:
+            yield self
+            return
+        with self._write_lock:
+            self._writing += 1
+            try:
+                if self._writing == 1:
+                    self.refresh()
+                yield self
+            finally:
+                self._writing -= 1
+                if self._writing == 0:
+                    self._publish()
+
+    def _publish(self):
+        """
+        Fold this process's writes into a new snapshot (purging tombstones
+        once due) and bump the version stamp the other processes watch. The
+        snapshot is then memory-mapped again, so every process shares its
+        pages instead of holding a private copy.
+        """
+        with self._lock:
+            if not self._unpublished:
+                return
+            self._flush()
+            if self._wal_rows or self._purge_due():
+                self._compact(purge=self._purge_due())
+            self._loaded_version = self.metadata_store.state("version") + 1
+            self.metadata_store.set_state("version", self._loaded_version)
+            self.metadata_store.commit()
+            self._unpublished = False
+
+    def refresh(self) -> bool:
+        """
+        Reload a shared store if another process published changes since it
+        was loaded; returns whether it did. The new state is loaded and warmed
+        up aside, then swapped in at once, so searches keep running against
+        the old one meanwhile.
+        """
+        if not self.shared or self.metadata_store.state("version") == self._loaded_version:
+            return False
+        with self._refresh_lock:
+            if self.metadata_store.state("version") == self._loaded_version:
+                return False
+            fresh = VectorStore(
+                self.dim,
+                self.storage_dir,
+                self.index_name,
+                self.index_type,
+                self.nlist,
+                self.quantization,
+                self.mmap,
+                shared=True,
+            )
+            fresh.warm_up()
+            with self._lock:
+                # The WAL may have been rotated by another process's compaction
+                self._wal.close()
+                for name in self._LOADED_STATE:
+                    setattr(self, name, getattr(fresh, name))
+                self.version = next(_versions)
+        return True
+
+    def has_file(self, content_hash: str) -> bool:
+        return content_hash in self.ingested_files
+
+    def register_file(self, content_hash: str, filename: str):
+        with self._lock:
+            self._forget_file(filename)
+            self.ingested_files[content_hash] = filename
+            self._pending_files[content_hash] = filename
+            self._unpublished = True
 
-    def search(self, query_embedding: List[float], k: int = 5):
-        vector = np.array([query_embedding]).astype("float32")
-        distances, indices = self.index.search(vector, k)
+    def _forget_file(self, filename: str):
+        for files in (self.ingested_files, self._pending_files):
+            for content_hash in [h for h, name in files.items() if name == filename]:
+                del files[content_hash]
 
-        results = []
-        for idx in indices[0]:
-            if idx == -1:
-                continue
-            results.append(self.metadata[idx])
+    def has_source(self, source: str) -> bool:
+        return bool(self.metadata_store.source_chunks(source))
 
-        return results
+    def source_chunks(self, source: str, before_row: Optional[int] = None) -> List[Tuple[str, int]]:
+        """(chunk id, row) of the source's live chunks, optionally only rows below `before_row`"""
+        return self.metadata_store.source_chunks(source, before_row)
 
-    def _load_metadata(self) -> List[Dict[str, Any]]:
-        if not self.meta_path.exists():
+    def update_metadata(self, rows: List[int], metadatas: List[Dict[str, Any]]):
+        """Replace the non-core fields (e.g. character spans) of existing rows"""
+        with self._lock:
+            self.metadata_store.update(rows, metadatas)
+            self.metadata_store.commit()
+            self._unpublished = True
+
+    def delete(self, rows: Iterable[int]) -> int:
+        """
+        Tombstone live rows. They are excluded from searches at once and
+        purged from the indexes by a later compaction. Returns how many rows
+        were deleted.
+        """
+        with self._lock:
+            rows = [row for row in rows if row not in self._tombstones]
+            if not rows:
+                return 0
+            self.metadata_store.mark_deleted(rows)
+            self.metadata_store.commit()
+            self._tombstones.update(rows)
+            self._exclusion = None
+            self._swap_snapshot()
+            if self._lexical_index is not None:
+                self._lexical_index.delete(rows)
+            self.version = next(_versions)
+            self._unpublished = True
+            self._maybe_compact()
+        return len(rows)
+
+    def delete_source(self, source: str) -> int:
+        """Delete every chunk of a source and forget its file, so it can be uploaded again"""
+        with self._lock:
+            deleted = self.delete(row for _, row in self.source_chunks(source))
+            filename = Path(source).name
+            self._forget_file(filename)
+            self.metadata_store.remove_files([filename])
+            self.metadata_store.commit()
+        return deleted
+
+    def search(
+        self,
+        query_embedding: List[float],
+        k: int = 5,
+        nprobe: Optional[int] = None,
+        ef_search: Optional[int] = None,
+    ):
+        """
+        Return metadata for the k nearest chunks.
+        `nprobe` (IVF) and `ef_search` (HNSW) override the index defaults
+        for this query only, trading recall for latency.
+        """
+        # Text is only read from disk for the hits actually returned
+        return self.metadata_store.get(self.search_rows(query_embedding, k, nprobe, ef_search))
+
+    def search_rows(
+        self,
+        query_embedding: List[float],
+        k: int = 5,
+        nprobe: Optional[int] = None,
+        ef_search: Optional[int] = None,
+    ) -> List[int]:
+        """Rows of the k nearest chunks, nearest first"""
+        return self.search_rows_batch([query_embedding], k, nprobe, ef_search)[0]
+
+    def search_rows_batch(
+        self,
+        query_embeddings: List[List[float]],
+        k: int = 5,
+        nprobe: Optional[int] = None,
+        ef_search: Optional[int] = None,
+    ) -> List[List[int]]:
+        """`search_rows` for many queries with a single multi-row FAISS search"""
+        if not query_embeddings:
             return []
-        with open(self.meta_path, "r", encoding="utf-8") as f:
-            return json.load(f)
+        vectors = np.array(query_embeddings).astype("float32")
+        # One read of the snapshot reference; writers swap in a new one
+        # rather than changing it, so no lock is taken
+        indices = self._snapshot.search(vectors, k, nprobe=nprobe, ef_search=ef_search)
+        return [[int(idx) for idx in row if idx != -1] for row in indices]
+
+    def lexical_search_rows(self, query: str, k: int = 5) -> List[int]:
+        """Rows of the k best BM25 matches for the query text, best first"""
+        return [row for row, _ in self.lexical_index.search(query, k)]
+
+    def get_rows(self, rows: List[int]) -> List[Dict[str, Any]]:
+        return self.metadata_store.get(rows)
+
+    def _load_lexical_index(self) -> BM25Index:
+        """Load the BM25 snapshot and index any rows added after it was written"""
+        lexical_index = BM25Index(k1=settings.BM25_K1, b=settings.BM25_B)
+        num_rows = self.next_row
+        if self.lexical_path.exists():
+            snapshot = BM25Index.deserialize(self.lexical_path.read_bytes(), k1=settings.BM25_K1, b=settings.BM25_B)
+            if len(snapshot) <= num_rows:
+                lexical_index = snapshot
+
+        missing = num_rows - len(lexical_index)
+        for start in range(len(lexical_index), num_rows, 10_000):
+            rows = list(range(start, min(start + 10_000, num_rows)))
+            lexical_index.add(start, [meta.get("text", "") for meta in self.metadata_store.get(rows)])
+        # Rows deleted since the snapshot, or re-indexed just above
+        lexical_index.delete(self.metadata_store.deleted_rows())
+        if missing >= settings.VECTOR_STORE_COMPACT_MIN_ROWS and self._writer():
+            # e.g. the first load of a store from before the BM25 index
+            atomic_write(self.lexical_path, lexical_index.serialize())
+        return lexical_index
+
+    def _append_wal_to(self, target: Path):
+        """Move the live WAL's records onto the end of `target`"""
+        self._wal.close()
+        if self.wal_path.exists():
+            with open(target, "ab") as dst, open(self.wal_path, "rb") as src:
+                dst.write(src.read())
+                dst.flush()
+                os.fsync(dst.fileno())
+            self.wal_path.unlink()
+
+    def _replay_wal(self, index: faiss.Index):
+        """
+        Re-apply WAL records on top of the snapshot `index`, into the delta.
+        Records carry their starting row, so rows already in the snapshot
+        (e.g. after a crash between compaction steps) are skipped. Metadata
+        rows past the last row with durable vectors are dropped.
+        """
+        writer = self._writer()
+        ids = index_ids(index)
+        next_row = int(ids.max()) + 1 if len(ids) else 0
+        for segment in (self.compacting_wal_path, self.wal_path):
+            for start_row, vectors, payload in WriteAheadLog(segment).replay(repair=writer):
+                end_row = start_row + len(vectors)
+                if end_row > next_row:
+                    skip = max(0, next_row - start_row)
+                    self._delta.append(vectors[skip:], np.arange(start_row + skip, end_row, dtype=np.int64))
+                    next_row = end_row
+                self._wal_rows += len(vectors)
+        # Purged rows at the end are in neither the snapshot nor the WAL
+        self._persisted_rows = max(next_row, self.metadata_store.state("persisted_rows"))
+        if writer:
+            self.metadata_store.truncate(self._persisted_rows)
+
+    def _migrate_legacy_metadata(self):
+        """Import `<name>.json` / `<name>.files.json` from before the SQLite store"""
+        if not self.legacy_meta_path.exists() and not self.legacy_files_path.exists():
+            return
+        with self._write_lock:
+            self._import_legacy_metadata()
+
+    def _import_legacy_metadata(self):
+        if self.legacy_meta_path.exists() and len(self.metadata_store) == 0:
+            with open(self.legacy_meta_path, "r", encoding="utf-8") as f:
+                self.metadata_store.append(json.load(f))
+            self.metadata_store.commit()
+            os.replace(self.legacy_meta_path, self.legacy_meta_path.with_name(self.legacy_meta_path.name + ".migrated"))
+        if self.legacy_files_path.exists():
+            with open(self.legacy_files_path, "r", encoding="utf-8") as f:
+                self.metadata_store.add_files(json.load(f))
+            self.metadata_store.commit()
+            os.replace(self.legacy_files_path, self.legacy_files_path.with_name(self.legacy_files_path.name + ".migrated"))
@@ -0,0 +1,188 @@
+import json
+import os
+import struct
+import threading
+import zlib
+from pathlib import Path
+from typing import Any, Dict, Iterator, Optional, Tuple
+
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:  # Windows: file locks only coordinate threads (see lock_file)
+    fcntl = None
+
+# magic, start_row, num_vectors, dim, payload_json_length
+_HEADER = struct.Struct("<4sQIII")
+_CRC = struct.Struct("<I")
+_MAGIC = b"WAL1"
+
+
+def atomic_write(path: Path, data: bytes):
+    """Write `data` to `path` so readers only ever see the old or the new file"""
+    tmp_path = path.with_name(path.name + ".tmp")
+    with open(tmp_path, "wb") as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+    fsync_dir(path.parent)
+
+
+def fsync_dir(directory: Path):
+    # Makes the rename itself durable; not supported on every platform
+    try:
+        fd = os.open(directory, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+def lock_file(path: Path, blocking: bool = True) -> Optional[int]:
+    """
+    Take an exclusive advisory lock (flock) on `path`, creating it if needed.
+    Returns the descriptor to pass to `unlock_file`, or None if `blocking` is
+    off and another holder has it. The lock dies with the process holding it.
+    Without fcntl (Windows) nothing is locked across processes.
+    """
+    fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+    if fcntl is not None:
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX if blocking else fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            os.close(fd)
+            return None
+    return fd
+
+
+def unlock_file(fd: int):
+    # Closing the descriptor releases the lock
+    os.close(fd)
+
+
+class FileLock:
+    """
+    Re-entrant lock held across threads of this process and, through a lock
+    file, across processes. Use `for_path` so every user of a path in the
+    process shares one instance.
+    """
+
+    _instances: Dict[Path, "FileLock"] = {}
+    _instances_lock = threading.Lock()
+
+    @classmethod
+    def for_path(cls, path: Path) -> "FileLock":
+        path = Path(os.path.abspath(path))
+        with cls._instances_lock:
+            if path not in cls._instances:
+                cls._instances[path] = cls(path)
+            return cls._instances[path]
+
+    def __init__(self, path: Path):
+        self.path = path
+        self._lock = threading.RLock()
+        self._depth = 0
+        self._fd: Optional[int] = None
+        self._owner: Optional[int] = None
+
+    def acquire(self):
+        self._lock.acquire()
+        if self._depth == 0:
+            try:
+                self._fd = lock_file(self.path)
+            except BaseException:
+                self._lock.release()
+                raise
+            self._owner = threading.get_ident()
+        self._depth += 1
+
+    def release(self):
+        self._depth -= 1
+        if self._depth == 0:
+            unlock_file(self._fd)
+            self._fd = None
+            self._owner = None
+        self._lock.release()
+
+    def held(self) -> bool:
+        """Whether the calling thread holds the lock"""
+        return self._owner == threading.get_ident()
+
+    def __enter__(self) -> "FileLock":
+        self.acquire()
+        return self
+
+    def __exit__(self, *exc):
+        self.release()
+
+
+class WriteAheadLog:
+    """
+    Append-only segment of vectors and their JSON payload.
+    Each record is checksummed; a torn record at the tail (crash mid-append)
+    is detected on replay and truncated away.
+    """
+
+    def __init__(self, path: Path):
+        self.path = path
+        self._file = None
+
+    def append(self, start_row: int, vectors: np.ndarray, payload: Dict[str, Any]) -> int:
+        """Durably append one record; returns the number of bytes written"""
+        vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+        num_vectors, dim = vectors.shape if vectors.size else (0, 0)
+        body = vectors.tobytes() + json.dumps(payload, separators=(",", ":")).encode("utf-8")
+        header = _HEADER.pack(_MAGIC, start_row, num_vectors, dim, len(body) - vectors.nbytes)
+        record = header + body + _CRC.pack(zlib.crc32(header + body))
+
+        if self._file is None:
+            self._file = open(self.path, "ab")
+        self._file.write(record)
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        return len(record)
+
+    def replay(self, repair: bool = True) -> Iterator[Tuple[int, np.ndarray, Dict[str, Any]]]:
+        """
+        Yield (start_row, vectors, payload) for every intact record. A reader
+        that does not own the log passes `repair=False`: what looks like a
+        torn tail may be a record its writer is still appending.
+        """
+        try:
+            f = open(self.path, "rb")
+        except FileNotFoundError:
+            # Never written, or (for a reader) rotated away by a compaction
+            return
+        valid_end = 0
+        with f:
+            while True:
+                header = f.read(_HEADER.size)
+                if len(header) < _HEADER.size:
+                    break
+                magic, start_row, num_vectors, dim, payload_len = _HEADER.unpack(header)
+                if magic != _MAGIC:
+                    break
+                body = f.read(num_vectors * dim * 4 + payload_len)
+                crc = f.read(_CRC.size)
+                if len(crc) < _CRC.size or _CRC.unpack(crc)[0] != zlib.crc32(header + body):
+                    break
+                vectors = np.frombuffer(body[: num_vectors * dim * 4], dtype=np.float32).reshape(num_vectors, dim)
+                payload = json.loads(body[num_vectors * dim * 4 :])
+                valid_end = f.tell()
+                yield start_row, vectors, payload
+
+        if repair and valid_end < self.path.stat().st_size:
+            # Drop the torn tail so later appends follow a valid record
+            with open(self.path, "r+b") as f:
+                f.truncate(valid_end)
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
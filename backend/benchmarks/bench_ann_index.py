@@ -0,0 +1,101 @@
+"""
+Recall / latency benchmark for the VectorStore index types.
+
+Builds each index type from app.services.index_factory over synthetic
+clustered vectors and reports recall@k and single-query p50/p99 latency
+against the exact flat baseline, sweeping nprobe (IVF) and efSearch (HNSW).
+
+Usage (from backend/):
+    python -m benchmarks.bench_ann_index --sizes 10000 100000 1000000 --dim 128
+
+Note: 1M vectors at the production dimension (3072) need ~12 GB for the flat
+baseline alone, so the default dimension here is smaller.
+"""
+import argparse
+import math
+import time
+
+import faiss
+import numpy as np
+
+from app.services.index_factory import POINTS_PER_CENTROID, PQ_CENTROIDS, build_index
+
+
+def synthetic_vectors(n: int, dim: int, rng: np.random.Generator, clusters: int = 1000) -> np.ndarray:
+    """Gaussian clusters, closer to real embedding distributions than uniform noise"""
+    centers = rng.standard_normal((clusters, dim)).astype("float32")
+    assignment = rng.integers(0, clusters, n)
+    return centers[assignment] + 0.3 * rng.standard_normal((n, dim)).astype("float32")
+
+
+def timed_search(index, queries: np.ndarray, k: int, params=None):
+    latencies = []
+    labels = np.empty((len(queries), k), dtype="int64")
+    for i, query in enumerate(queries):
+        start = time.perf_counter()
+        _, found = index.search(query[None, :], k, params=params)
+        latencies.append(time.perf_counter() - start)
+        labels[i] = found[0]
+    latencies_ms = np.array(latencies) * 1000
+    return labels, np.percentile(latencies_ms, 50), np.percentile(latencies_ms, 99)
+
+
+def recall_at_k(found: np.ndarray, truth: np.ndarray) -> float:
+    k = truth.shape[1]
+    return float(np.mean([len(set(f) & set(t)) / k for f, t in zip(found, truth)]))
+
+
+def build(index_type: str, vectors: np.ndarray, nlist: int, rng: np.random.Generator):
+    start = time.perf_counter()
+    index = build_index(index_type, vectors.shape[1], nlist)
+    if not index.is_trained:
+        needed = max(nlist, PQ_CENTROIDS if index_type == "ivf_pq" else 0) * POINTS_PER_CENTROID
+        sample = vectors[rng.choice(len(vectors), min(len(vectors), needed), replace=False)]
+        index.train(sample)
+    index.add(vectors)
+    return index, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    parser.add_argument("--dim", type=int, default=128)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--types", nargs="+", default=["ivf_flat", "ivf_pq", "hnsw"])
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    faiss.omp_set_num_threads(1)  # single-query latency, not batch throughput
+
+    for n in args.sizes:
+        vectors = synthetic_vectors(n, args.dim, rng)
+        queries = vectors[rng.choice(n, args.queries, replace=False)] + 0.1 * rng.standard_normal(
+            (args.queries, args.dim)
+        ).astype("float32")
+        nlist = max(16, min(int(4 * math.sqrt(n)), n // POINTS_PER_CENTROID))
+
+        flat, build_s = build("flat", vectors, nlist, rng)
+        truth, p50, p99 = timed_search(flat, queries, args.k)
+        print(f"\n=== {n:,} vectors, dim={args.dim}, k={args.k}, nlist={nlist} ===")
+        print(f"{'index':<10}{'param':<14}{'recall@k':>10}{'p50 ms':>10}{'p99 ms':>10}{'build s':>10}")
+        print(f"{'flat':<10}{'-':<14}{1.0:>10.3f}{p50:>10.3f}{p99:>10.3f}{build_s:>10.1f}")
+
+        for index_type in args.types:
+            index, build_s = build(index_type, vectors, nlist, rng)
+            if index_type == "hnsw":
+                sweep = [("efSearch", v, faiss.SearchParametersHNSW(efSearch=v)) for v in (16, 64, 256)]
+            else:
+                sweep = [("nprobe", v, faiss.SearchParametersIVF(nprobe=v)) for v in (1, 8, 32, 128) if v <= nlist]
+            for name, value, params in sweep:
+                found, p50, p99 = timed_search(index, queries, args.k, params)
+                label = f"{name}={value}"
+                print(
+                    f"{index_type:<10}{label:<14}{recall_at_k(found, truth):>10.3f}"
+                    f"{p50:>10.3f}{p99:>10.3f}{build_s:>10.1f}"
+                )
+            del index
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+"""
+Chunking throughput benchmark.
+
+Compares the previous chunker (encode, then decode every overlapping
+window) with TextChunker (encode once, slice the original string at
+boundary-aware token offsets) on multi-MB synthetic documents. Also reports
+how many chunks end mid-sentence.
+
+Usage (from backend/):
+    python -m benchmarks.bench_chunking --mb 1 4 16
+"""
+import argparse
+import random
+import re
+import time
+
+from app.config import settings
+from app.services.chunking import TextChunker
+from app.services.tokenizer import get_tokenizer
+
+tokenizer = get_tokenizer()
+
+WORDS = ["rome", "senate", "legion", "empire", "caesar", "forum", "republic", "consul", "aqueduct", "província", "könig"]
+
+SENTENCE_END = re.compile(r"[.!?][\"')\]]*\s*$")
+
+
+def synthetic_document(megabytes: float) -> str:
+    rng = random.Random(0)
+    parts, size, section = [], 0, 0
+    while size < megabytes * 1024 * 1024:
+        if rng.random() < 0.05:
+            section += 1
+            part = f"\n\n## Section {section}\n\n"
+        else:
+            sentence = " ".join(rng.choice(WORDS) for _ in range(rng.randint(6, 30)))
+            part = sentence.capitalize() + rng.choice([". ", ". ", "! ", "? ", ".\n\n"])
+        parts.append(part)
+        size += len(part.encode("utf-8"))
+    return "".join(parts)
+
+
+def decode_windows(text: str, chunk_size: int, overlap: int):
+    """The previous implementation of chunk_text"""
+    tokens = tokenizer.encode(text, disallowed_special=())
+    chunks = []
+    start = 0
+    while start < len(tokens):
+        chunk_tokens = tokens[start : start + chunk_size]
+        chunks.append((tokenizer.decode(chunk_tokens), len(chunk_tokens)))
+        start += chunk_size - overlap
+    return chunks
+
+
+def best_of(repeat: int, fn):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - start)
+    return result, best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--mb", type=float, nargs="+", default=[1, 4, 16], help="Document sizes in MB")
+    parser.add_argument("--chunk-size", type=int, default=settings.CHUNK_SIZE)
+    parser.add_argument("--overlap", type=int, default=settings.CHUNK_OVERLAP)
+    parser.add_argument("--repeat", type=int, default=3, help="Report the best of N runs")
+    args = parser.parse_args()
+
+    chunker = TextChunker(args.chunk_size, args.overlap, tokenizer)
+    chunker.chunk("warm up the token length table")
+
+    print(f"{'MB':>6}  {'chunker':<16}{'seconds':>9}{'MB/s':>8}{'chunks':>8}{'mid-sentence':>14}")
+    for mb in args.mb:
+        text = synthetic_document(mb)
+        size = len(text.encode("utf-8")) / (1024 * 1024)
+
+        legacy, legacy_s = best_of(args.repeat, lambda: decode_windows(text, args.chunk_size, args.overlap))
+        chunks, new_s = best_of(args.repeat, lambda: chunker.chunk(text))
+        assert all(text[c.start_char : c.end_char] == c.text for c in chunks)
+
+        for name, seconds, texts in (
+            ("decode windows", legacy_s, [t for t, _ in legacy]),
+            ("TextChunker", new_s, [c.text for c in chunks]),
+        ):
+            mid = sum(1 for t in texts[:-1] if not SENTENCE_END.search(t))
+            print(f"{size:>6.1f}  {name:<16}{seconds:>9.2f}{size / seconds:>8.2f}{len(texts):>8}{mid / max(len(texts) - 1, 1):>13.0%}")
+
+
+if __name__ == "__main__":
+    main()
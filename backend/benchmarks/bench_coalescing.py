@@ -0,0 +1,88 @@
+"""
+Request coalescing benchmark.
+
+Runs the FastAPI app in-process against benchmarks.fake_gemini and fires
+--requests identical /generate-quiz requests at once (a class pressing
+"generate" on the same topic), --rounds times, with coalescing of
+identical in-flight calls on and off. Each round uses a fresh topic, so
+the embedding and semantic quiz caches never answer. Reports per mode:
+
+    embeds    texts sent to the embedding API
+    llm       generation calls
+    p50/p99   request latency
+
+and the coalescing counters /metrics reports.
+
+Usage (from backend/):
+    python -m benchmarks.bench_coalescing --requests 30 --llm-latency 1.0
+"""
+import argparse
+import asyncio
+import sys
+import time
+
+from benchmarks.fake_gemini import FakeGeminiClient, install, offline_environment
+
+offline_environment()
+
+import httpx  # noqa: E402
+import numpy as np  # noqa: E402
+
+from app import main  # noqa: E402
+from app.services.single_flight import SingleFlight  # noqa: E402
+
+
+async def burst(client: httpx.AsyncClient, topic: str, requests: int) -> list:
+    async def one() -> float:
+        start = time.perf_counter()
+        response = await client.post("/generate-quiz", json={"topic": topic, "num_questions": 5, "use_rag": False})
+        response.raise_for_status()
+        return time.perf_counter() - start
+
+    return await asyncio.gather(*(one() for _ in range(requests)))
+
+
+async def run(args):
+    fake = install(FakeGeminiClient(embed_latency=args.embed_latency, generate_latency=args.llm_latency))
+    main.startup()
+    try:
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+            print(f"{args.requests} identical requests at once, {args.rounds} rounds\n")
+            print(f"{'coalescing':<12}{'requests':>9}{'embeds':>8}{'llm':>6}{'p50 ms':>9}{'p99 ms':>9}")
+            for coalesce in (False, True):
+                record = main.metrics_tracker.record_coalescing
+                main.embedding_service.in_flight = SingleFlight("embed", record=record) if coalesce else None
+                main.quiz_generator.in_flight = SingleFlight("llm", record=record) if coalesce else None
+                embedded, generated = fake.stats.embedded_texts, fake.stats.generate_calls
+                latencies = []
+                for round_ in range(args.rounds):
+                    topic = f"coalescing {'on' if coalesce else 'off'} round {round_}"
+                    latencies += await burst(client, topic, args.requests)
+                ms = np.array(latencies) * 1000
+                print(
+                    f"{'on' if coalesce else 'off':<12}{len(latencies):>9}"
+                    f"{fake.stats.embedded_texts - embedded:>8}{fake.stats.generate_calls - generated:>6}"
+                    f"{np.percentile(ms, 50):>9.1f}{np.percentile(ms, 99):>9.1f}"
+                )
+            coalescing = (await client.get("/metrics")).json()["coalescing"]
+            print("\n/metrics coalescing:")
+            for kind, stats in coalescing.items():
+                print(f"  {kind:<6} calls {stats['calls']:.0f}, coalesced {stats['coalesced']:.0f} ({stats['coalesced_rate']:.0%})")
+    finally:
+        main.shutdown()
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=30, help="Identical requests per burst")
+    parser.add_argument("--rounds", type=int, default=3)
+    parser.add_argument("--embed-latency", type=float, default=0.05, help="Simulated seconds per embedding call")
+    parser.add_argument("--llm-latency", type=float, default=0.5, help="Simulated seconds per generation call")
+    args = parser.parse_args()
+    print("running ...", file=sys.stderr)
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main_cli()
@@ -0,0 +1,185 @@
+"""
+Named collections benchmark.
+
+Builds --collections collections of --rows synthetic chunks each, plus one
+shared store holding all of them (the single-index layout), then reports:
+
+    search   vector and lexical query latency against one collection and
+             against the shared store
+    memory   estimated index memory (VectorStore.memory_bytes) and the
+             resident memory added by opening each, measured in a fresh
+             interpreter
+    lru      a skewed access pattern (--hot of the acquisitions go to two
+             collections) through a CollectionManager whose budget fits
+             about --budget-collections collections: evictions, and acquire
+             latency when the collection was still loaded vs reopened
+
+Usage (from backend/):
+    python -m benchmarks.bench_collections --collections 8 --rows 20000 --dim 256
+"""
+import argparse
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import List
+
+import numpy as np
+
+CHILD = """
+import sys
+from pathlib import Path
+
+def resident_mb():
+    with open("/proc/self/status") as f:
+        return next(int(line.split()[1]) for line in f if line.startswith("VmRSS")) / 1024
+
+from app.services.collection_manager import INDEX_NAME
+from app.services.vector_store import VectorStore
+
+before = resident_mb()
+store = VectorStore(dim=int(sys.argv[2]), storage_dir=Path(sys.argv[1]), index_name=INDEX_NAME)
+store.warm_up()
+print(resident_mb() - before)
+"""
+
+
+def opened_rss_mb(path: Path, dim: int) -> float:
+    """Resident memory added by opening the store at `path` in a fresh interpreter"""
+    result = subprocess.run(
+        [sys.executable, "-W", "ignore", "-c", CHILD, str(path), str(dim)],
+        env=os.environ,
+        capture_output=True,
+        text=True,
+    )
+    if result.returncode:
+        raise RuntimeError(f"Opening {path} failed:\n{result.stderr}")
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def build_store(path: Path, dim: int, batches: List[tuple]):
+    from app.services.collection_manager import INDEX_NAME
+    from app.services.vector_store import VectorStore
+
+    store = VectorStore(dim=dim, storage_dir=path, index_name=INDEX_NAME, mmap=False)
+    for vectors, metadata in batches:
+        store.add(vectors, metadata)
+        store.save()
+    store.compact()
+    store.close()
+
+
+def synthetic_batch(rng: np.random.Generator, words: np.ndarray, name: str, start: int, n: int, dim: int) -> tuple:
+    vectors = rng.standard_normal((n, dim)).astype("float32")
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    metadata = [
+        {"id": f"{name}-{start + i}", "text": " ".join(rng.choice(words, 60)), "source": f"{name}/doc{(start + i) // 100}"}
+        for i in range(n)
+    ]
+    return vectors, metadata
+
+
+def time_queries(store, queries: np.ndarray, terms: List[str], k: int) -> dict:
+    vector, lexical = [], []
+    for query, text in zip(queries, terms):
+        start = time.perf_counter()
+        store.search_rows(query.tolist(), k=k)
+        vector.append(time.perf_counter() - start)
+        start = time.perf_counter()
+        store.lexical_search_rows(text, k=k)
+        lexical.append(time.perf_counter() - start)
+    return {"vector": np.median(vector) * 1000, "lexical": np.median(lexical) * 1000}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--collections", type=int, default=8)
+    parser.add_argument("--rows", type=int, default=20_000, help="Chunks per collection")
+    parser.add_argument("--dim", type=int, default=256)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--acquisitions", type=int, default=500)
+    parser.add_argument("--hot", type=float, default=0.8)
+    parser.add_argument("--budget-collections", type=float, default=2.5)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        root = Path(tmp)
+        os.environ.setdefault("GEMINI_API_KEY", "offline-benchmark")
+        os.environ["EMBEDDING_BACKEND"] = "fake"
+        os.environ["EMBEDDING_DIMENSION"] = str(args.dim)
+        os.environ["EMBEDDING_CACHE_ENABLED"] = "false"
+        # Whole indexes in RAM, so resident memory reflects their size
+        os.environ["FAST_START"] = "false"
+        from app.services.collection_manager import INDEX_NAME, CollectionManager
+        from app.services.embeddings import EmbeddingService
+        from app.services.vector_store import VectorStore
+
+        rng = np.random.default_rng(0)
+        words = np.array([f"w{i}" for i in range(5000)])
+        names = [f"c{i}" for i in range(args.collections)]
+        manager = CollectionManager(root / "collections-root", EmbeddingService())
+        shared_batches = []
+        for name in names:
+            batches = [
+                synthetic_batch(rng, words, name, start, min(10_000, args.rows - start), args.dim)
+                for start in range(0, args.rows, 10_000)
+            ]
+            build_store(manager.path(name), args.dim, batches)
+            shared_batches.extend(batches)
+        build_store(root / "shared", args.dim, shared_batches)
+        del shared_batches
+        print(f"{args.collections} collections x {args.rows} rows x {args.dim} dims\n")
+
+        queries = rng.standard_normal((args.queries, args.dim)).astype("float32")
+        terms = [" ".join(rng.choice(words, 3)) for _ in range(args.queries)]
+
+        with manager.use(names[0]) as collection:
+            collection.store.warm_up()
+            one = time_queries(collection.store, queries, terms, args.k)
+            one_bytes = collection.store.memory_bytes()
+        manager.close()
+        one_rss = opened_rss_mb(manager.path(names[0]), args.dim)
+
+        shared = VectorStore(dim=args.dim, storage_dir=root / "shared", index_name=INDEX_NAME)
+        shared.warm_up()
+        everything = time_queries(shared, queries, terms, args.k)
+        shared_bytes = shared.memory_bytes()
+        shared.close()
+        shared_rss = opened_rss_mb(root / "shared", args.dim)
+
+        print(f"{'search':<16}{'vector ms':>12}{'lexical ms':>12}{'index MB':>12}{'+rss MB':>12}")
+        for label, latency, size, rss in (
+            ("one collection", one, one_bytes, one_rss),
+            ("shared index", everything, shared_bytes, shared_rss),
+        ):
+            print(f"{label:<16}{latency['vector']:>12.3f}{latency['lexical']:>12.3f}{size / 2**20:>12.1f}{rss:>12.1f}")
+
+        manager = CollectionManager(
+            root / "collections-root", EmbeddingService(), memory_budget_bytes=int(one_bytes * args.budget_collections)
+        )
+        pick = random.Random(0)
+        hits, misses = [], []
+        for _ in range(args.acquisitions):
+            name = pick.choice(names[:2]) if pick.random() < args.hot else pick.choice(names[2:] or names)
+            loaded = name in manager.stats()["loaded"]
+            start = time.perf_counter()
+            with manager.use(name) as collection:
+                collection.store.warm_up()
+                (hits if loaded else misses).append(time.perf_counter() - start)
+        stats = manager.stats()
+        manager.close()
+        print(
+            f"\nlru: budget {stats['memory_budget_bytes'] / 2**20:.1f} MB, {len(hits)} hits "
+            f"({np.median(hits) * 1000 if hits else 0:.3f} ms), {len(misses)} reopens "
+            f"({np.median(misses) * 1000 if misses else 0:.1f} ms), {stats['evictions']} evictions, "
+            f"{len(stats['loaded'])} loaded at the end"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+"""
+Concurrency load test for the async request path.
+
+Drives the FastAPI app in-process with N concurrent /generate-quiz requests
+while the Gemini client is replaced by benchmarks.fake_gemini, which sleeps
+for a fixed latency. If requests overlap, wall time stays
+close to a single request's latency instead of N times it, and the peak
+number of in-flight LLM calls approaches N (capped by STAGE_LIMIT_LLM).
+
+Usage (from backend/):
+    python -m benchmarks.bench_concurrency --requests 20 --latency 0.5
+"""
+import argparse
+import asyncio
+import time
+
+from benchmarks.fake_gemini import FakeGeminiClient, install, offline_environment
+
+offline_environment()
+
+import httpx  # noqa: E402
+
+from app import main  # noqa: E402
+
+
+async def wait_for_job(client: httpx.AsyncClient, job_id: str):
+    while True:
+        job = (await client.get(f"/jobs/{job_id}")).json()
+        if job["status"] == "completed":
+            return
+        if job["status"] == "failed":
+            raise RuntimeError(f"Ingestion job failed: {job['error']}")
+        await asyncio.sleep(0.05)
+
+
+async def run(num_requests: int, latency: float, use_rag: bool):
+    fake = install(FakeGeminiClient(embed_latency=latency / 5, generate_latency=latency))
+
+    transport = httpx.ASGITransport(app=main.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+        if use_rag:
+            files = [("files", ("rome.md", b"# Rome\n\nRome was founded in 753 BCE. " * 50))]
+            response = await client.post("/upload", files=files)
+            await wait_for_job(client, response.json()["job_id"])
+
+        async def one(i: int):
+            start = time.perf_counter()
+            response = await client.post(
+                "/generate-quiz", json={"topic": f"topic {i}", "num_questions": 1, "use_rag": use_rag}
+            )
+            response.raise_for_status()
+            return time.perf_counter() - start
+
+        start = time.perf_counter()
+        latencies = await asyncio.gather(*(one(i) for i in range(num_requests)))
+        wall = time.perf_counter() - start
+    return wall, max(latencies), fake.stats.peak_in_flight
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=20)
+    parser.add_argument("--latency", type=float, default=0.5, help="Simulated seconds per LLM call")
+    args = parser.parse_args()
+
+    print(f"{args.requests} concurrent requests, {args.latency:.2f}s simulated LLM latency\n")
+    print(f"{'mode':<10}{'wall s':>10}{'serial s':>10}{'max req s':>11}{'peak LLM':>10}")
+    # ASGITransport does not send lifespan events, and uploads need the job workers
+    main.startup()
+    try:
+        for use_rag in (False, True):
+            wall, slowest, peak = asyncio.run(run(args.requests, args.latency, use_rag))
+            label = "rag" if use_rag else "no_rag"
+            print(f"{label:<10}{wall:>10.2f}{args.requests * args.latency:>10.2f}{slowest:>11.2f}{peak:>10}")
+    finally:
+        main.shutdown()
+
+
+if __name__ == "__main__":
+    main_cli()
@@ -0,0 +1,52 @@
+"""
+Embedding throughput benchmark (offline).
+
+Runs EmbeddingService against the deterministic FakeEmbeddingBackend with a
+simulated per-call latency, comparing the old one-call-per-text behaviour
+with batched, concurrent requests.
+
+Usage (from backend/):
+    python -m benchmarks.bench_embeddings --texts 2000 --latency 0.05
+"""
+import argparse
+import time
+
+from app.services.embeddings import EmbeddingService, FakeEmbeddingBackend
+
+
+def run(num_texts: int, latency: float, batch_size: int, concurrency: int, dim: int):
+    backend = FakeEmbeddingBackend(dim=dim, latency=latency)
+    service = EmbeddingService(backend=backend, batch_size=batch_size, max_concurrency=concurrency)
+    texts = [f"chunk {i} of a synthetic document" for i in range(num_texts)]
+
+    start = time.perf_counter()
+    embeddings = service.embed_texts(texts)
+    elapsed = time.perf_counter() - start
+
+    assert len(embeddings) == num_texts
+    assert embeddings[7] == backend.embed_text(texts[7]), "output order not preserved"
+    return elapsed, backend.calls
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--texts", type=int, default=2000)
+    parser.add_argument("--latency", type=float, default=0.05, help="Simulated seconds per backend call")
+    parser.add_argument("--dim", type=int, default=768)
+    args = parser.parse_args()
+
+    configs = [
+        ("serial, 1 text/call", 1, 1),
+        ("batched, 100 texts/call", 100, 1),
+        ("batched + 4 in flight", 100, 4),
+        ("batched + 8 in flight", 100, 8),
+    ]
+    print(f"{args.texts} texts, {args.latency * 1000:.0f} ms simulated latency per call\n")
+    print(f"{'mode':<28}{'calls':>8}{'seconds':>10}{'texts/s':>12}")
+    for label, batch_size, concurrency in configs:
+        elapsed, calls = run(args.texts, args.latency, batch_size, concurrency, args.dim)
+        print(f"{label:<28}{calls:>8}{elapsed:>10.2f}{args.texts / elapsed:>12.0f}")
+
+
+if __name__ == "__main__":
+    main()
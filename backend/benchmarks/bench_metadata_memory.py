@@ -0,0 +1,86 @@
+"""
+Chunk metadata memory / load-time benchmark.
+
+Compares the old representation (a JSON file loaded into a list of dicts
+holding every chunk's text) with ChunkMetadataStore (SQLite on disk, only
+interned source names in memory, metadata fetched lazily for top-k hits).
+
+Usage (from backend/):
+    python -m benchmarks.bench_metadata_memory --chunks 100000
+"""
+import argparse
+import gc
+import json
+import random
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+from app.services.metadata_store import ChunkMetadataStore
+
+
+def synthetic_metadata(num_chunks: int, text_chars: int):
+    words = ["rome", "senate", "legion", "empire", "caesar", "forum", "republic", "consul", "aqueduct", "province"]
+    rng = random.Random(0)
+    for i in range(num_chunks):
+        text = " ".join(rng.choice(words) for _ in range(text_chars // 7))[:text_chars]
+        yield {"id": f"doc{i // 200}_{i % 200}", "text": text, "source": f"uploads/doc{i // 200}.pdf", "token_count": 500}
+
+
+def measure(load):
+    gc.collect()
+    tracemalloc.start()
+    start = time.perf_counter()
+    obj = load()
+    elapsed = time.perf_counter() - start
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return obj, elapsed, current, peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--chunks", type=int, default=100_000)
+    parser.add_argument("--text-chars", type=int, default=2000, help="~500 tokens of English")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        json_path = Path(tmp) / "meta.json"
+        db_path = Path(tmp) / "meta.sqlite3"
+
+        metadata = list(synthetic_metadata(args.chunks, args.text_chars))
+        with open(json_path, "w", encoding="utf-8") as f:
+            json.dump(metadata, f, indent=2)
+        store = ChunkMetadataStore(db_path)
+        for i in range(0, len(metadata), 10_000):
+            store.append(metadata[i : i + 10_000])
+        store.commit()
+        store.close()
+        del metadata, store
+
+        def load_json():
+            with open(json_path, "r", encoding="utf-8") as f:
+                return json.load(f)
+
+        legacy, json_s, json_mem, json_peak = measure(load_json)
+        del legacy
+        store, db_s, db_mem, db_peak = measure(lambda: ChunkMetadataStore(db_path))
+
+        rows = random.Random(1).sample(range(args.chunks), 5)
+        start = time.perf_counter()
+        for _ in range(100):
+            store.get(rows)
+        fetch_ms = (time.perf_counter() - start) / 100 * 1000
+
+        mb = 1024 * 1024
+        print(f"{args.chunks:,} chunks x {args.text_chars} chars\n")
+        print(f"{'representation':<24}{'resident MB':>12}{'peak MB':>10}{'load s':>10}")
+        print(f"{'JSON list of dicts':<24}{json_mem / mb:>12.1f}{json_peak / mb:>10.1f}{json_s:>10.2f}")
+        print(f"{'ChunkMetadataStore':<24}{db_mem / mb:>12.1f}{db_peak / mb:>10.1f}{db_s:>10.2f}")
+        print(f"\nLazy top-5 text fetch: {fetch_ms:.3f} ms")
+        store.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+"""
+Parallel document parsing benchmark.
+
+Extracts text from a corpus with `extract_texts` at increasing worker
+counts and reports documents/sec and speedup over a single process. By
+default a synthetic corpus of markdown files and multi-page PDFs is
+generated; pass --docs to parse a real directory instead.
+
+Usage (from backend/):
+    python -m benchmarks.bench_parsing --markdown 200 --pdfs 20 --pages 60
+    python -m benchmarks.bench_parsing --docs ../docs
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+import zlib
+from pathlib import Path
+from typing import List
+
+from app.services.ingestion import extract_texts
+
+WORDS = ["rome", "senate", "legion", "empire", "caesar", "forum", "republic", "consul", "aqueduct", "province"]
+
+
+def write_markdown(path: Path, rng: random.Random, sections: int):
+    lines = []
+    for s in range(sections):
+        lines.append(f"## Section {s}\n")
+        for _ in range(8):
+            lines.append("- **" + rng.choice(WORDS) + "** " + " ".join(rng.choice(WORDS) for _ in range(40)))
+        lines.append("")
+    path.write_text("\n".join(lines), encoding="utf-8")
+
+
+def write_pdf(path: Path, rng: random.Random, pages: int):
+    """Minimal text PDF (one Helvetica text block per page), written by hand"""
+    objects: List[bytes] = [b"<< /Type /Catalog /Pages 2 0 R >>", b"", b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"]
+    kids = []
+    for _ in range(pages):
+        text_ops = "".join(
+            f"({' '.join(rng.choice(WORDS) for _ in range(12))}) Tj T* " for _ in range(40)
+        )
+        stream = zlib.compress(f"BT /F1 10 Tf 12 TL 40 760 Td {text_ops}ET".encode("latin-1"))
+        objects.append(b"<< /Length %d /Filter /FlateDecode >>\nstream\n" % len(stream) + stream + b"\nendstream")
+        content_id = len(objects)
+        objects.append(
+            b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] "
+            b"/Resources << /Font << /F1 3 0 R >> >> /Contents %d 0 R >>" % content_id
+        )
+        kids.append(len(objects))
+    objects[1] = b"<< /Type /Pages /Kids [%s] /Count %d >>" % (b" ".join(b"%d 0 R" % k for k in kids), pages)
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(out))
+        out += b"%d 0 obj\n" % number + body + b"\nendobj\n"
+    xref = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    out += b"".join(b"%010d 00000 n \n" % offset for offset in offsets)
+    out += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref)
+    path.write_bytes(bytes(out))
+
+
+def synthetic_corpus(root: Path, markdown: int, pdfs: int, pages: int) -> List[Path]:
+    rng = random.Random(0)
+    files = []
+    for i in range(markdown):
+        files.append(root / f"doc{i:04d}.md")
+        write_markdown(files[-1], rng, sections=20)
+    for i in range(pdfs):
+        files.append(root / f"doc{i:04d}.pdf")
+        write_pdf(files[-1], rng, pages)
+    return files
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--docs", type=Path, help="Parse this directory instead of a synthetic corpus")
+    parser.add_argument("--markdown", type=int, default=200)
+    parser.add_argument("--pdfs", type=int, default=20)
+    parser.add_argument("--pages", type=int, default=60, help="Pages per synthetic PDF")
+    parser.add_argument("--workers", type=int, nargs="+", help="Worker counts to try (default: 1, 2, 4, ... up to CPU count)")
+    args = parser.parse_args()
+
+    cpus = os.cpu_count() or 1
+    workers = args.workers or sorted({1, *(2**i for i in range(1, cpus.bit_length()) if 2**i <= cpus), cpus})
+
+    with tempfile.TemporaryDirectory() as tmp:
+        if args.docs:
+            files = sorted(p for p in args.docs.rglob("*") if p.suffix.lower() in (".md", ".pdf", ".txt"))
+        else:
+            files = synthetic_corpus(Path(tmp), args.markdown, args.pdfs, args.pages)
+
+        print(f"{len(files)} documents, {cpus} CPUs\n")
+        print(f"{'workers':>8}{'seconds':>10}{'docs/sec':>10}{'speedup':>9}")
+        baseline, reference = None, None
+        for n in workers:
+            start = time.perf_counter()
+            texts = [text for _, text in extract_texts(files, workers=n)]
+            elapsed = time.perf_counter() - start
+            baseline = baseline or elapsed
+            if reference is None:
+                reference = texts
+            elif texts != reference:
+                raise SystemExit(f"Output with {n} workers differs from the single-process run")
+            print(f"{n:>8}{elapsed:>10.2f}{len(files) / elapsed:>10.1f}{baseline / elapsed:>8.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+"""
+Reduced-dimension / quantized storage benchmark.
+
+Indexes the same embeddings at several output dimensions (truncate and
+renormalize, as EMBEDDING_OUTPUT_DIMENSION does) and with float32, fp16 and
+int8 storage, and reports index size, single-query latency and top-k
+overlap with full-dimension float32 search.
+
+Synthetic vectors have a decaying per-dimension spectrum, so most of the
+signal sits in the leading dimensions as in Matryoshka-trained embeddings;
+pass --storage to use the vectors of an existing snapshot instead.
+
+Usage (from backend/):
+    python -m benchmarks.bench_quantization --vectors 50000 --dim 768 --dims 768 512 256 128
+    python -m benchmarks.bench_quantization --storage storage --dims 3072 1536 768
+"""
+import argparse
+from pathlib import Path
+
+import faiss
+import numpy as np
+
+from app.services.embeddings import reduce_dimension
+from app.services.index_factory import QUANTIZATIONS, SQ_TRAINING_POINTS, build_index, vectors_with_ids
+from benchmarks.bench_ann_index import recall_at_k, synthetic_vectors, timed_search
+
+
+def matryoshka_vectors(n: int, dim: int, rng: np.random.Generator) -> np.ndarray:
+    vectors = synthetic_vectors(n, dim, rng) * (1.0 / np.sqrt(1 + np.arange(dim) / 16)).astype("float32")
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def reduce(vectors: np.ndarray, dim: int) -> np.ndarray:
+    if dim == vectors.shape[1]:
+        return vectors
+    return np.asarray(reduce_dimension(vectors, dim), dtype="float32")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--vectors", type=int, default=50_000)
+    parser.add_argument("--dim", type=int, default=768, help="Full dimension of the synthetic vectors")
+    parser.add_argument("--dims", type=int, nargs="+", help="Output dimensions to compare (default: full, 1/2, 1/4, 1/8)")
+    parser.add_argument("--storage", type=Path, help="Benchmark the vectors in <storage>/documents.faiss instead")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=5)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    faiss.omp_set_num_threads(1)  # single-query latency, not batch throughput
+
+    if args.storage:
+        _, vectors = vectors_with_ids(faiss.read_index(str(args.storage / "documents.faiss")))
+    else:
+        vectors = matryoshka_vectors(args.vectors, args.dim, rng)
+    n, full_dim = vectors.shape
+    queries = vectors[rng.choice(n, min(args.queries, n), replace=False)]
+    queries = queries + 0.05 * rng.standard_normal(queries.shape).astype("float32")
+    queries /= np.linalg.norm(queries, axis=1, keepdims=True)
+    dims = args.dims or [full_dim, full_dim // 2, full_dim // 4, full_dim // 8]
+
+    truth_index = build_index("flat", full_dim, quantization="none")
+    truth_index.add(vectors)
+    truth, _, _ = timed_search(truth_index, queries, args.k)
+    baseline_bytes = faiss.serialize_index(truth_index).nbytes
+    del truth_index
+
+    print(f"{n:,} vectors, full dim={full_dim}, k={args.k}\n")
+    print(f"{'dim':>6}  {'storage':<8}{'size MB':>9}{'vs full':>9}{'overlap@k':>11}{'p50 ms':>9}{'p99 ms':>9}")
+    for dim in dims:
+        reduced, reduced_queries = reduce(vectors, dim), reduce(queries, dim)
+        for quantization in QUANTIZATIONS:
+            index = build_index("flat", dim, quantization=quantization)
+            if not index.is_trained:
+                index.train(reduced[rng.choice(n, min(n, SQ_TRAINING_POINTS * 10), replace=False)])
+            index.add(reduced)
+            found, p50, p99 = timed_search(index, reduced_queries, args.k)
+            size = faiss.serialize_index(index).nbytes
+            print(
+                f"{dim:>6}  {quantization:<8}{size / 2**20:>9.1f}{size / baseline_bytes:>8.1%}"
+                f"{recall_at_k(found, truth):>11.3f}{p50:>9.3f}{p99:>9.3f}"
+            )
+            del index
+
+
+if __name__ == "__main__":
+    main()
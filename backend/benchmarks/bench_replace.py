@@ -0,0 +1,141 @@
+"""
+Document replacement and deletion benchmark.
+
+Runs the real FastAPI app in-process against benchmarks.fake_gemini and
+uploads one synthetic markdown document of --sections sections, then:
+
+    reupload  uploads it again with --edits list items rewritten: chunks
+              re-embedded and wall time, against the first upload (what a
+              full re-index of the document costs)
+    delete    DELETE /documents/{source} latency, and vector search latency
+              while the deleted chunks are tombstoned vs after the
+              compaction that purges them
+
+Usage (from backend/):
+    python -m benchmarks.bench_replace --sections 200 --edits 3
+"""
+import argparse
+import asyncio
+import os
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from benchmarks.fake_gemini import FakeGeminiClient, install, offline_environment
+
+offline_environment()
+# Compaction is run by hand below, to time searches with tombstones first
+os.environ.setdefault("VECTOR_STORE_TOMBSTONE_RATIO", "2")
+
+import httpx  # noqa: E402
+import numpy as np  # noqa: E402
+
+from app import main  # noqa: E402
+from benchmarks.bench_parsing import WORDS, write_markdown  # noqa: E402
+
+
+def edit(text: str, rng: random.Random, edits: int) -> str:
+    """The document with `edits` random list items rewritten"""
+    lines = text.split("\n")
+    items = [i for i, line in enumerate(lines) if line.startswith("- ")]
+    for i in rng.sample(items, min(edits, len(items))):
+        lines[i] = "- **" + rng.choice(WORDS) + "** " + " ".join(rng.choice(WORDS) for _ in range(40))
+    return "\n".join(lines)
+
+
+async def upload(client: httpx.AsyncClient, fake: FakeGeminiClient, name: str, text: str) -> dict:
+    embedded = fake.stats.embedded_texts
+    start = time.perf_counter()
+    response = await client.post("/upload", files=[("files", (name, text.encode("utf-8")))])
+    response.raise_for_status()
+    job_id = response.json()["job_id"]
+    while True:
+        job = (await client.get(f"/jobs/{job_id}")).json()
+        if job["status"] in ("completed", "failed"):
+            break
+        await asyncio.sleep(0.02)
+    if job["status"] != "completed":
+        raise RuntimeError(f"Ingestion job failed: {job['error']}")
+    job["embedded"] = fake.stats.embedded_texts - embedded
+    job["seconds"] = time.perf_counter() - start
+    return job
+
+
+def search_ms(store, queries: np.ndarray, k: int) -> float:
+    times = []
+    for query in queries:
+        start = time.perf_counter()
+        store.search_rows(query.tolist(), k=k)
+        times.append(time.perf_counter() - start)
+    return float(np.median(times)) * 1000
+
+
+async def run(args):
+    fake = install(FakeGeminiClient(embed_latency=args.embed_latency))
+    rng = random.Random(0)
+    texts = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        # Other documents, so searches run over more than the deleted one
+        for name in [f"background{i}.md" for i in range(args.background_docs)] + ["bench_replace.md"]:
+            path = Path(tmp) / name
+            write_markdown(path, rng, sections=args.sections)
+            texts[name] = path.read_text(encoding="utf-8")
+    original = texts.pop("bench_replace.md")
+    edited = edit(original, rng, args.edits)
+
+    main.startup()
+    try:
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+            for name, text in texts.items():
+                await upload(client, fake, name, text)
+            first = await upload(client, fake, "bench_replace.md", original)
+            second = await upload(client, fake, "bench_replace.md", edited)
+
+            print(f"{'upload':<12}{'chunks':>8}{'embedded':>10}{'unchanged':>11}{'removed':>9}{'seconds':>10}")
+            for label, job in (("first", first), ("edited", second)):
+                print(
+                    f"{label:<12}{job['total_chunks']:>8}{job['embedded']:>10}{job['unchanged']:>11}"
+                    f"{job['removed']:>9}{job['seconds']:>10.2f}"
+                )
+
+            with main.collections.use() as collection:
+                store = collection.store
+                queries = np.random.default_rng(0).standard_normal((args.queries, store.dim)).astype("float32")
+                before = search_ms(store, queries, args.k)
+                start = time.perf_counter()
+                response = await client.delete("/documents/bench_replace.md")
+                response.raise_for_status()
+                deleted_ms = (time.perf_counter() - start) * 1000
+                during = search_ms(store, queries, args.k)
+                start = time.perf_counter()
+                store.compact()
+                compact_ms = (time.perf_counter() - start) * 1000
+                after = search_ms(store, queries, args.k)
+
+            print(
+                f"\ndelete: {response.json()['chunks_deleted']} chunks in {deleted_ms:.1f} ms, "
+                f"purged by compaction in {compact_ms:.1f} ms"
+            )
+            print(f"search ms: {before:.3f} before, {during:.3f} tombstoned, {after:.3f} purged")
+    finally:
+        main.shutdown()
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sections", type=int, default=200)
+    parser.add_argument("--edits", type=int, default=3, help="List items rewritten before the re-upload")
+    parser.add_argument("--background-docs", type=int, default=4)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--embed-latency", type=float, default=0.05, help="Simulated seconds per embedding call")
+    args = parser.parse_args()
+    print(f"{args.sections} sections, {args.edits} edits", file=sys.stderr)
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main_cli()
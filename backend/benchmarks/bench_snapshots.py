@@ -0,0 +1,175 @@
+"""
+Concurrent search / write stress test for the vector store.
+
+Builds a store of --rows random vectors, then runs --readers search threads
+for --seconds while a writer thread ingests batches the way an ingestion
+job's index stage does (add + save per --batch rows), deletes a source
+every --delete-every batches, and compacts every --compact-every batches.
+
+Each reader queries with the exact vector of a random row it knows is
+searchable and checks the answer:
+
+    misaligned  a hit whose metadata is missing or belongs to another row
+    missed      (flat index) the row itself is not the top hit, and it was
+                not deleted meanwhile
+
+and records its latency, split by whether a write (add, save, delete or
+compaction) was in progress. It runs twice: with lock-free snapshot reads,
+and with every search taking the store's write lock, as a store that
+serializes reads and writes would.
+
+Usage (from backend/):
+    python -m benchmarks.bench_snapshots --rows 50000 --dim 384 --readers 4
+"""
+import argparse
+import os
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+import numpy as np
+
+os.environ.setdefault("GEMINI_API_KEY", "offline-benchmark")
+
+from app.services.vector_store import VectorStore  # noqa: E402
+
+
+class Stress:
+    def __init__(self, store: VectorStore, vectors: np.ndarray, args, locked: bool):
+        self.store = store
+        self.vectors = vectors
+        self.args = args
+        self.locked = locked
+        self.stop = threading.Event()
+        # Rows below this have been added and swapped in; rows are deleted a
+        # source (one batch) at a time
+        self.visible = args.rows
+        self.deleted = set()
+        self.writing = 0
+        self.latencies = {False: [], True: []}
+        self.searches = 0
+        self.misaligned = 0
+        self.missed = 0
+        self.written = 0
+        self.counts_lock = threading.Lock()
+
+    def read(self, seed: int):
+        rng = np.random.default_rng(seed)
+        store, k = self.store, self.args.k
+        while not self.stop.is_set():
+            row = int(rng.integers(self.visible))
+            during_write = self.writing > 0
+            start = time.perf_counter()
+            if self.locked:
+                with store._lock:
+                    rows = store.search_rows(self.vectors[row].tolist(), k=k)
+                    metas = store.get_rows(rows)
+            else:
+                rows = store.search_rows(self.vectors[row].tolist(), k=k)
+                metas = store.get_rows(rows)
+            elapsed = time.perf_counter() - start
+            misaligned = sum(meta["id"] != f"c{hit}" for hit, meta in zip(rows, metas))
+            missed = self.args.index_type == "flat" and (not rows or rows[0] != row) and row // self.args.batch not in self.deleted
+            with self.counts_lock:
+                self.latencies[during_write or self.writing > 0].append(elapsed)
+                self.searches += 1
+                self.misaligned += misaligned
+                self.missed += int(missed)
+
+    def write(self):
+        store, batch = self.store, self.args.batch
+        rng = np.random.default_rng(1)
+        batches = 0
+        while not self.stop.is_set() and self.visible + batch <= len(self.vectors):
+            time.sleep(self.args.pause)
+            start = self.visible
+            self.writing += 1
+            try:
+                store.add(self.vectors[start : start + batch], metadata(start, batch, self.args.batch))
+                store.save()
+                self.visible = start + batch
+                self.written += batch
+                batches += 1
+                if batches % self.args.delete_every == 0:
+                    source = int(rng.integers(self.visible // self.args.batch))
+                    self.deleted.add(source)
+                    store.delete_source(f"source{source}")
+                if batches % self.args.compact_every == 0:
+                    store.compact()
+            finally:
+                self.writing -= 1
+
+    def run(self) -> dict:
+        threads = [threading.Thread(target=self.read, args=(seed,)) for seed in range(self.args.readers)]
+        writer = threading.Thread(target=self.write)
+        start = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        time.sleep(self.args.warmup)
+        writer.start()
+        writer.join(self.args.seconds)
+        self.stop.set()
+        writer.join()
+        for thread in threads:
+            thread.join()
+        return {"seconds": time.perf_counter() - start}
+
+
+def metadata(start: int, count: int, batch: int) -> list:
+    # Chunk ids name their row, so a reader can tell a hit's metadata is its own
+    return [{"id": f"c{row}", "text": f"chunk {row}", "source": f"source{row // batch}"} for row in range(start, start + count)]
+
+
+def percentiles(latencies: list) -> str:
+    if not latencies:
+        return f"{'-':>8}{'-':>8}{'-':>9}"
+    ms = np.array(latencies) * 1000
+    return f"{np.percentile(ms, 50):>8.2f}{np.percentile(ms, 99):>8.2f}{ms.max():>9.1f}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=50_000)
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--index-type", default="flat", choices=("flat", "ivf_flat", "ivf_pq", "hnsw"))
+    parser.add_argument("--readers", type=int, default=4)
+    parser.add_argument("--seconds", type=float, default=10.0, help="How long the writer runs")
+    parser.add_argument("--warmup", type=float, default=1.0, help="Seconds of reads before the writer starts")
+    parser.add_argument("--batch", type=int, default=256, help="Rows per add, like INGEST_BATCH_SIZE")
+    parser.add_argument("--pause", type=float, default=0.01, help="Seconds between batches (embedding time)")
+    parser.add_argument("--delete-every", type=int, default=5)
+    parser.add_argument("--compact-every", type=int, default=20)
+    parser.add_argument("--k", type=int, default=5)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    # Room for everything the writer could add in --seconds
+    capacity = args.rows + args.batch * int(args.seconds / max(args.pause, 0.001) + 1)
+    vectors = rng.standard_normal((min(capacity, args.rows * 10), args.dim)).astype("float32")
+    print(f"{args.rows} rows x {args.dim} dims ({args.index_type}), {args.readers} readers, {args.batch} rows per write\n")
+    print(
+        f"{'reads':<11}{'searches':>9}{'idle p50':>9}{'p99':>8}{'max':>9}"
+        f"{'writing p50':>12}{'p99':>8}{'max':>9}{'rows/s':>8}{'misaligned':>11}{'missed':>7}"
+    )
+    for locked in (False, True):
+        with tempfile.TemporaryDirectory() as tmp:
+            store = VectorStore(dim=args.dim, storage_dir=Path(tmp), index_name="bench", index_type=args.index_type)
+            for start in range(0, args.rows, 10_000):
+                count = min(10_000, args.rows - start)
+                store.add(vectors[start : start + count], metadata(start, count, args.batch))
+            store.save()
+            store.compact()
+            store.warm_up()
+            stress = Stress(store, vectors, args, locked)
+            seconds = stress.run()["seconds"]
+            store.close()
+        print(
+            f"{'locked' if locked else 'snapshot':<11}{stress.searches:>9}"
+            f" {percentiles(stress.latencies[False])}   {percentiles(stress.latencies[True])}"
+            f"{stress.written / seconds:>8.0f}{stress.misaligned:>11}{stress.missed:>7}"
+        )
+
+
+if __name__ == "__main__":
+    main()
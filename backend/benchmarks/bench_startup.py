@@ -0,0 +1,127 @@
+"""
+Cold start benchmark.
+
+Builds a store of --rows synthetic chunks (FAISS snapshot, BM25 snapshot and
+SQLite metadata), then starts the app in a fresh interpreter with
+FAST_START on and off and reports, for each:
+
+    import     seconds to import app.main (services constructed, store opened)
+    accepting  seconds until startup returns and the server takes connections
+    ready      seconds until GET /ready answers 200
+    first      seconds for the first hybrid retrieval after ready
+    rss        peak resident memory in MB at accepting and at ready
+
+With fast start the snapshot is memory-mapped and warm-up runs in the
+background, so `accepting` should stay flat as --rows grows while `ready`
+still pays for the BM25 load.
+
+Usage (from backend/):
+    python -m benchmarks.bench_startup --rows 100000 --dim 768
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+import numpy as np
+
+CHILD = """
+import json
+import time
+
+def peak_rss_mb():
+    # VmHWM rather than ru_maxrss, which Linux carries over from the parent across exec
+    with open("/proc/self/status") as f:
+        return next(int(line.split()[1]) for line in f if line.startswith("VmHWM")) / 1024
+
+start = time.perf_counter()
+from app import main
+imported = time.perf_counter() - start
+main.startup()
+accepting = time.perf_counter() - start
+accepting_rss = peak_rss_mb()
+main.ready.wait()
+ready = time.perf_counter() - start
+ready_rss = peak_rss_mb()
+first = time.perf_counter()
+with main.collections.use() as collection:
+    collection.retrieval.retrieve_context("w1 w2 w3", mode="hybrid")
+first = time.perf_counter() - first
+main.shutdown()
+print(json.dumps({
+    "import": imported, "accepting": accepting, "ready": ready, "first": first,
+    "accepting_rss": accepting_rss, "ready_rss": ready_rss,
+}))
+"""
+
+
+def build_store(storage: Path, rows: int, dim: int):
+    from app.services.vector_store import VectorStore
+
+    rng = np.random.default_rng(0)
+    words = np.array([f"w{i}" for i in range(5000)])
+    store = VectorStore(dim=dim, storage_dir=storage, index_name="quiz_documents", mmap=False)
+    for start in range(0, rows, 10_000):
+        n = min(10_000, rows - start)
+        vectors = rng.standard_normal((n, dim)).astype("float32")
+        vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+        texts = [" ".join(rng.choice(words, 60)) for _ in range(n)]
+        store.add(vectors, [{"id": f"c{start + i}", "text": text, "source": f"doc{(start + i) // 100}"} for i, text in enumerate(texts)])
+        store.save()
+    store.compact()
+    store.close()
+
+
+def start_app(storage: Path, dim: int, fast_start: bool) -> dict:
+    env = {
+        **os.environ,
+        "STORAGE_PATH": str(storage),
+        "UPLOAD_PATH": str(storage / "uploads"),
+        "EMBEDDING_BACKEND": "fake",
+        "EMBEDDING_DIMENSION": str(dim),
+        "EMBEDDING_CACHE_ENABLED": "false",
+        "GEMINI_API_KEY": os.environ.get("GEMINI_API_KEY", "offline-benchmark"),
+        "FAST_START": str(fast_start).lower(),
+    }
+    result = subprocess.run(
+        [sys.executable, "-W", "ignore", "-c", CHILD],
+        env=env,
+        capture_output=True,
+        text=True,
+    )
+    if result.returncode:
+        raise RuntimeError(f"App failed to start:\n{result.stderr}")
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--dim", type=int, default=768)
+    parser.add_argument("--repeat", type=int, default=3, help="Starts per mode; the fastest is reported")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        storage = Path(tmp)
+        os.environ.setdefault("GEMINI_API_KEY", "offline-benchmark")
+        os.environ["EMBEDDING_DIMENSION"] = str(args.dim)
+        build_store(storage, args.rows, args.dim)
+        size = sum(f.stat().st_size for f in storage.iterdir() if f.is_file()) / 2**20
+        print(f"{args.rows} rows x {args.dim} dims, {size:.0f} MB on disk\n")
+        print(f"{'mode':<12}{'import s':>10}{'accept s':>10}{'ready s':>10}{'first s':>10}{'rss MB':>14}")
+        for fast_start in (False, True):
+            runs = [start_app(storage, args.dim, fast_start) for _ in range(args.repeat)]
+            best = {key: min(run[key] for run in runs) for key in runs[0]}
+            label = "fast_start" if fast_start else "eager"
+            rss = f"{best['accepting_rss']:.0f} / {best['ready_rss']:.0f}"
+            print(
+                f"{label:<12}{best['import']:>10.3f}{best['accepting']:>10.3f}{best['ready']:>10.3f}"
+                f"{best['first']:>10.4f}{rss:>14}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,268 @@
+"""
+Offline end-to-end benchmark suite.
+
+Runs the real FastAPI app in-process with the Gemini client replaced by
+benchmarks.fake_gemini (deterministic output, simulated latency), so the
+numbers are reproducible and cost nothing. Scenarios:
+
+    ingest  upload a synthetic markdown corpus through /upload and wait for
+            the job: documents/sec, chunks/sec, embedding calls
+    search  retrieval latency (vector, lexical, hybrid) at growing index
+            sizes, with the query embedding precomputed
+    quiz    /generate-quiz throughput and latency percentiles at several
+            client concurrency levels
+
+Results are written as JSON. With --baseline, every throughput (*_per_sec)
+and latency (*_ms) figure is compared with an earlier results file and the
+run exits with status 1 if any regressed by more than --tolerance.
+
+Usage (from backend/):
+    python -m benchmarks.bench_suite --output bench-results.json
+    python -m benchmarks.bench_suite --scenarios search --sizes 1000 100000
+    python -m benchmarks.bench_suite --baseline bench-results.json --tolerance 0.25
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List
+
+from benchmarks.fake_gemini import FakeGeminiClient, fake_embedding, install, offline_environment
+
+offline_environment()
+
+import httpx  # noqa: E402
+import numpy as np  # noqa: E402
+
+from app import main  # noqa: E402
+from app.config import settings  # noqa: E402
+from app.services.retrieval import RETRIEVAL_MODES, RetrievalService  # noqa: E402
+from app.services.vector_store import VectorStore  # noqa: E402
+from benchmarks.bench_parsing import write_markdown  # noqa: E402
+
+SCENARIOS = ("ingest", "search", "quiz")
+
+
+def percentiles(seconds: List[float]) -> Dict[str, float]:
+    ms = np.array(seconds) * 1000
+    return {f"p{q}_ms": round(float(np.percentile(ms, q)), 3) for q in (50, 95, 99)}
+
+
+def synthetic_texts(n: int, rng: random.Random, vocabulary: int = 5000) -> List[str]:
+    words = [f"w{i}" for i in range(vocabulary)]
+    # Zipf-like word frequencies, so BM25 sees common and rare terms
+    weights = [1 / (i + 1) for i in range(vocabulary)]
+    return [" ".join(rng.choices(words, weights, k=rng.randint(40, 120))) for _ in range(n)]
+
+
+async def bench_ingest(client: httpx.AsyncClient, fake: FakeGeminiClient, args) -> Dict[str, Any]:
+    rng = random.Random(0)
+    with tempfile.TemporaryDirectory() as tmp:
+        files = []
+        for i in range(args.docs):
+            path = Path(tmp) / f"bench_doc{i:04d}.md"
+            write_markdown(path, rng, sections=args.sections)
+            files.append(("files", (path.name, path.read_bytes())))
+
+        embed_calls = fake.stats.embed_calls
+        start = time.perf_counter()
+        response = await client.post("/upload", files=files)
+        response.raise_for_status()
+        job_id = response.json()["job_id"]
+        while True:
+            job = (await client.get(f"/jobs/{job_id}")).json()
+            if job["status"] in ("completed", "failed"):
+                break
+            await asyncio.sleep(0.05)
+        elapsed = time.perf_counter() - start
+
+    if job["status"] != "completed":
+        raise RuntimeError(f"Ingestion job failed: {job['error']}")
+    return {
+        "documents": args.docs,
+        "chunks": job["num_chunks"],
+        "seconds": round(elapsed, 3),
+        "documents_per_sec": round(args.docs / elapsed, 2),
+        "chunks_per_sec": round(job["num_chunks"] / elapsed, 2),
+        "embed_calls": fake.stats.embed_calls - embed_calls,
+        "stage_busy_seconds": {stage: s["busy_seconds"] for stage, s in job["stages"].items()},
+    }
+
+
+async def bench_search(args) -> Dict[str, Any]:
+    rng = random.Random(1)
+    results: Dict[str, Any] = {}
+    queries = [" ".join(text.split()[:6]) for text in synthetic_texts(args.queries, rng)]
+    query_embeddings = [fake_embedding(query, settings.EMBEDDING_DIMENSION) for query in queries]
+
+    for size in args.sizes:
+        with tempfile.TemporaryDirectory() as tmp:
+            store = VectorStore(dim=settings.EMBEDDING_DIMENSION, storage_dir=Path(tmp), index_name="bench")
+            texts = synthetic_texts(size, rng)
+            for i in range(0, size, 1000):
+                batch = texts[i : i + 1000]
+                store.add(
+                    [fake_embedding(text, settings.EMBEDDING_DIMENSION) for text in batch],
+                    [{"id": f"c{i + j}", "text": text, "source": f"doc{(i + j) // 50}"} for j, text in enumerate(batch)],
+                )
+            retrieval = RetrievalService(store, main.embedding_service)
+
+            for mode in RETRIEVAL_MODES:
+                latencies = []
+                for query, embedding in zip(queries, query_embeddings):
+                    start = time.perf_counter()
+                    await retrieval.aretrieve_context(query, top_k=5, query_embedding=embedding, mode=mode)
+                    latencies.append(time.perf_counter() - start)
+                results[f"{mode}@{size}"] = {"index_size": size, "mode": mode, **percentiles(latencies)}
+            store.close()
+    return results
+
+
+async def bench_quiz(client: httpx.AsyncClient, fake: FakeGeminiClient, args) -> Dict[str, Any]:
+    results: Dict[str, Any] = {}
+    for concurrency in args.concurrency:
+        semaphore = asyncio.Semaphore(concurrency)
+        generate_calls = fake.stats.generate_calls
+        fake.stats.peak_in_flight = 0
+
+        async def one(i: int) -> float:
+            async with semaphore:
+                start = time.perf_counter()
+                response = await client.post(
+                    "/generate-quiz",
+                    # Distinct topics, so the semantic quiz cache never answers
+                    json={"topic": f"benchmark topic {concurrency}-{i}", "num_questions": 5, "use_rag": True},
+                )
+                response.raise_for_status()
+                return time.perf_counter() - start
+
+        start = time.perf_counter()
+        latencies = await asyncio.gather(*(one(i) for i in range(args.requests)))
+        elapsed = time.perf_counter() - start
+        results[f"concurrency_{concurrency}"] = {
+            "concurrency": concurrency,
+            "requests": args.requests,
+            "requests_per_sec": round(args.requests / elapsed, 2),
+            **percentiles(latencies),
+            "llm_calls": fake.stats.generate_calls - generate_calls,
+            "peak_llm_in_flight": fake.stats.peak_in_flight,
+        }
+    return results
+
+
+async def run(args) -> Dict[str, Any]:
+    fake = install(
+        FakeGeminiClient(
+            embed_latency=args.embed_latency,
+            generate_latency=args.llm_latency,
+            per_token_latency=args.token_latency,
+            jitter=args.jitter,
+        )
+    )
+    results: Dict[str, Any] = {}
+    # ASGITransport does not send lifespan events
+    main.startup()
+    try:
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+            for scenario in args.scenarios:
+                print(f"running {scenario} ...", file=sys.stderr)
+                if scenario == "ingest":
+                    results["ingest"] = await bench_ingest(client, fake, args)
+                elif scenario == "search":
+                    results["search"] = await bench_search(args)
+                else:
+                    results["quiz"] = await bench_quiz(client, fake, args)
+    finally:
+        main.shutdown()
+    return results
+
+
+def environment(args) -> Dict[str, Any]:
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        "timestamp": datetime.now().isoformat(),
+        "commit": commit,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "index_type": settings.VECTOR_INDEX_TYPE,
+        "embedding_dimension": settings.EMBEDDING_DIMENSION,
+        "args": {k: v for k, v in vars(args).items() if k not in ("output", "baseline")},
+    }
+
+
+def flatten(results: Dict[str, Any], prefix: str = "") -> Dict[str, float]:
+    flat = {}
+    for key, value in results.items():
+        if isinstance(value, dict):
+            flat.update(flatten(value, f"{prefix}{key}."))
+        elif isinstance(value, (int, float)):
+            flat[prefix + key] = value
+    return flat
+
+
+def regressions(current: Dict[str, Any], baseline: Dict[str, Any], tolerance: float) -> List[str]:
+    """Throughput that dropped, or latency that grew, by more than `tolerance`"""
+    found = []
+    before, after = flatten(baseline), flatten(current)
+    for key, old in before.items():
+        new = after.get(key)
+        if new is None or not old:
+            continue
+        if key.endswith("_per_sec") and new < old * (1 - tolerance):
+            found.append(f"{key}: {old} -> {new} ({new / old - 1:+.0%})")
+        elif key.endswith("_ms") and new > old * (1 + tolerance):
+            found.append(f"{key}: {old} -> {new} ({new / old - 1:+.0%})")
+    return found
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scenarios", nargs="+", choices=SCENARIOS, default=list(SCENARIOS))
+    parser.add_argument("--output", type=Path, default=Path("bench-results.json"))
+    parser.add_argument("--baseline", type=Path, help="Earlier results file to check for regressions")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Allowed relative regression")
+    parser.add_argument("--embed-latency", type=float, default=0.05, help="Simulated seconds per embedding call")
+    parser.add_argument("--llm-latency", type=float, default=0.5, help="Simulated seconds per generation call")
+    parser.add_argument("--token-latency", type=float, default=0.0, help="Extra simulated seconds per output token")
+    parser.add_argument("--jitter", type=float, default=0.1, help="Relative latency jitter (seeded)")
+    parser.add_argument("--docs", type=int, default=50, help="Documents in the ingestion corpus")
+    parser.add_argument("--sections", type=int, default=20, help="Sections per synthetic document")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1_000, 10_000, 50_000], help="Index sizes to search")
+    parser.add_argument("--queries", type=int, default=200, help="Queries per index size and mode")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8, 32], help="Concurrent quiz clients")
+    parser.add_argument("--requests", type=int, default=64, help="Quiz requests per concurrency level")
+    args = parser.parse_args()
+
+    results = asyncio.run(run(args))
+    report = {"environment": environment(args), "results": results}
+    args.output.write_text(json.dumps(report, indent=2))
+    print(json.dumps(results, indent=2))
+    print(f"\nwrote {args.output}", file=sys.stderr)
+
+    if args.baseline:
+        baseline = json.loads(args.baseline.read_text())["results"]
+        found = regressions(results, baseline, args.tolerance)
+        for line in found:
+            print(f"REGRESSION {line}", file=sys.stderr)
+        if found:
+            raise SystemExit(1)
+        print(f"no regressions beyond {args.tolerance:.0%} against {args.baseline}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main_cli()
@@ -0,0 +1,180 @@
+"""
+Multi-worker benchmark.
+
+Builds a store of --rows synthetic chunks, then opens it as a shared store
+(MULTI_WORKER) in --workers processes at once, with the snapshot
+memory-mapped and read into private memory, and reports per worker:
+
+    rss    resident MB, counting mapped snapshot pages each worker touched
+    pss    proportional MB: shared pages split between the workers mapping
+           them, so the sum over workers is what the machine actually holds
+
+Then one process makes --writes small ingestions under `writing()` while
+another polls `refresh()` every --poll seconds, and reports how long each
+write took to publish and to become searchable in the other process.
+
+Usage (from backend/):
+    python -m benchmarks.bench_workers --rows 100000 --dim 768 --workers 4
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+from benchmarks.bench_startup import build_store
+
+READER = """
+import json
+import sys
+from pathlib import Path
+
+import numpy as np
+
+from app.services.vector_store import VectorStore
+
+def memory_mb():
+    with open("/proc/self/smaps_rollup") as f:
+        fields = {line.split(":")[0]: int(line.split()[1]) for line in f if line.split()[-1] == "kB"}
+    return fields["Rss"] / 1024, fields["Pss"] / 1024
+
+storage, dim, mmap, queries = sys.argv[1], int(sys.argv[2]), sys.argv[3] == "1", int(sys.argv[4])
+store = VectorStore(dim=dim, storage_dir=Path(storage), index_name="quiz_documents", mmap=mmap, shared=True)
+store.warm_up()
+for query in np.random.default_rng(0).standard_normal((queries, dim)).astype("float32"):
+    store.search_rows(query.tolist(), k=5)
+print("ready", flush=True)
+# Measured once every worker is loaded, so shared pages are split between them
+sys.stdin.read()
+rss, pss = memory_mb()
+print(json.dumps({"rss": rss, "pss": pss}), flush=True)
+"""
+
+WRITER = """
+import json
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+from app.services.vector_store import VectorStore
+
+storage, dim, writes, interval = sys.argv[1], int(sys.argv[2]), int(sys.argv[3]), float(sys.argv[4])
+store = VectorStore(dim=dim, storage_dir=Path(storage), index_name="quiz_documents", shared=True)
+rng = np.random.default_rng(1)
+for i in range(writes):
+    time.sleep(interval)
+    vectors = rng.standard_normal((20, dim)).astype("float32")
+    start = time.time()
+    with store.writing():
+        store.add(vectors, [{"id": f"w{i}_{j}", "text": "written", "source": f"write{i}"} for j in range(20)])
+        store.save()
+    print(json.dumps({"write": i, "started": start, "published": time.time()}), flush=True)
+store.close()
+"""
+
+
+def child_env(dim: int) -> dict:
+    return {
+        **os.environ,
+        "EMBEDDING_DIMENSION": str(dim),
+        "GEMINI_API_KEY": os.environ.get("GEMINI_API_KEY", "offline-benchmark"),
+        "MULTI_WORKER": "true",
+    }
+
+
+def worker_memory(storage: Path, dim: int, workers: int, mmap: bool, queries: int) -> list:
+    """(rss, pss) of `workers` concurrent processes each holding the store open"""
+    procs = [
+        subprocess.Popen(
+            [sys.executable, "-W", "ignore", "-c", READER, str(storage), str(dim), "1" if mmap else "0", str(queries)],
+            env=child_env(dim),
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            text=True,
+        )
+        for _ in range(workers)
+    ]
+    for proc in procs:
+        if proc.stdout.readline().strip() != "ready":
+            raise RuntimeError("Worker failed to open the store")
+    results = []
+    for proc in procs:
+        out, _ = proc.communicate("")
+        results.append(json.loads(out.strip().splitlines()[-1]))
+    return results
+
+
+def visibility(storage: Path, dim: int, writes: int, poll: float) -> list:
+    """Per write: (seconds to publish, seconds until this process's refresh sees it)"""
+    from app.services.vector_store import VectorStore
+
+    reader = VectorStore(dim=dim, storage_dir=storage, index_name="quiz_documents", shared=True)
+    writer = subprocess.Popen(
+        [sys.executable, "-W", "ignore", "-c", WRITER, str(storage), str(dim), str(writes), str(poll * 5)],
+        env=child_env(dim),
+        stdout=subprocess.PIPE,
+        text=True,
+    )
+    base = reader.ntotal
+    # Time at which each write (20 rows) first showed up here
+    seen = []
+    while True:
+        running = writer.poll() is None
+        if reader.refresh():
+            now = time.time()
+            while len(seen) < (reader.ntotal - base) // 20:
+                seen.append(now)
+        if not running:
+            break
+        time.sleep(poll)
+    published = [json.loads(line) for line in writer.stdout.read().splitlines()]
+    reader.close()
+    return [
+        (write["published"] - write["started"], seen[write["write"]] - write["published"])
+        for write in published
+        if write["write"] < len(seen)
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--dim", type=int, default=768)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--queries", type=int, default=200, help="Searches per worker before measuring memory")
+    parser.add_argument("--writes", type=int, default=10)
+    parser.add_argument("--poll", type=float, default=0.05, help="Seconds between refresh checks")
+    args = parser.parse_args()
+
+    os.environ.setdefault("GEMINI_API_KEY", "offline-benchmark")
+    os.environ["EMBEDDING_DIMENSION"] = str(args.dim)
+    os.environ["MULTI_WORKER"] = "true"
+    with tempfile.TemporaryDirectory() as tmp:
+        storage = Path(tmp)
+        build_store(storage, args.rows, args.dim)
+        size = (storage / "quiz_documents.faiss").stat().st_size / 2**20
+        print(f"{args.rows} rows x {args.dim} dims, {size:.0f} MB FAISS snapshot, {args.workers} workers\n")
+
+        print(f"{'snapshot':<10}{'rss MB/worker':>15}{'pss MB/worker':>15}{'pss MB total':>14}")
+        for mmap in (False, True):
+            results = worker_memory(storage, args.dim, args.workers, mmap, args.queries)
+            rss = np.mean([r["rss"] for r in results])
+            pss = [r["pss"] for r in results]
+            print(f"{'mmap' if mmap else 'private':<10}{rss:>15.0f}{np.mean(pss):>15.0f}{sum(pss):>14.0f}")
+
+        latencies = visibility(storage, args.dim, args.writes, args.poll)
+        publish, visible = (np.array(column) * 1000 for column in zip(*latencies))
+        print(f"\n{len(latencies)} writes of 20 chunks, polling every {args.poll * 1000:.0f} ms")
+        print(f"publish ms: p50 {np.median(publish):.1f}, max {publish.max():.1f}")
+        print(f"visible ms after publish: p50 {np.median(visible):.1f}, max {visible.max():.1f}")
+
+
+if __name__ == "__main__":
+    main()
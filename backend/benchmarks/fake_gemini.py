@@ -0,0 +1,195 @@
+"""
+Deterministic stand-in for the google-genai client used by the benchmarks.
+
+`FakeGeminiClient` mimics the parts of `genai.Client` the app calls —
+`models.embed_content`, `models.generate_content` and their `aio`
+variants, plus `aio.models.generate_content_stream` — with no network
+access. Embeddings are seeded from the text, so the same input always
+gives the same vector, and generations are valid Jeopardy JSON arrays
+with as many questions as the prompt asks for. Every call sleeps for a
+configurable latency (optionally jittered and per-output-token) and is
+counted, so benchmarks can check how many remote calls a path makes.
+
+    offline_environment()     # before importing anything from `app`
+    fake = install(FakeGeminiClient(generate_latency=0.5))
+"""
+import asyncio
+import hashlib
+import json
+import os
+import random
+import re
+import tempfile
+import time
+from types import SimpleNamespace
+from typing import Any, Dict, List, Optional
+
+_NUM_QUESTIONS = re.compile(r"create (\d+) Jeopardy-style questions")
+_CATEGORIES = ["History", "Geography", "Science", "Literature", "Politics"]
+
+
+def offline_environment(embedding_dimension: int = 256):
+    """
+    Default settings for an offline run: a dummy API key, the Gemini
+    embedding backend (so the fake client is exercised) and throwaway
+    storage. Must run before `app.config` is imported; explicit
+    environment variables still win.
+    """
+    os.environ.setdefault("GEMINI_API_KEY", "offline-benchmark")
+    os.environ.setdefault("EMBEDDING_BACKEND", "gemini")
+    os.environ.setdefault("EMBEDDING_DIMENSION", str(embedding_dimension))
+    os.environ.setdefault("STORAGE_PATH", tempfile.mkdtemp(prefix="bench-storage-"))
+    os.environ.setdefault("UPLOAD_PATH", tempfile.mkdtemp(prefix="bench-uploads-"))
+
+
+def fake_embedding(text: str, dim: int) -> List[float]:
+    """The vector FakeEmbeddingBackend gives `text`, so both fakes agree"""
+    # Imported here: app.config must not load before offline_environment
+    from app.services.embeddings import FakeEmbeddingBackend
+
+    return FakeEmbeddingBackend(dim).embed_text(text)
+
+
+def fake_questions(prompt: str) -> str:
+    """A JSON array of as many questions as the prompt asks for"""
+    match = _NUM_QUESTIONS.search(prompt)
+    count = int(match.group(1)) if match else 5
+    digest = hashlib.blake2b(prompt.encode("utf-8"), digest_size=4).hexdigest()
+    return json.dumps(
+        [
+            {
+                "category": _CATEGORIES[i % len(_CATEGORIES)],
+                "points": 200 * (i % 5 + 1),
+                "clue": f"This answer is number {i + 1} for prompt {digest}",
+                "answer": f"What is answer {i + 1}?",
+            }
+            for i in range(count)
+        ],
+        indent=2,
+    )
+
+
+class _Latency:
+    """Simulated round trip: base + per-token time, with seeded jitter"""
+
+    def __init__(self, base: float, per_token: float, jitter: float, seed: int):
+        self.base = base
+        self.per_token = per_token
+        self.jitter = jitter
+        self._rng = random.Random(seed)
+
+    def seconds(self, tokens: int = 0) -> float:
+        seconds = self.base + self.per_token * tokens
+        if self.jitter:
+            seconds *= 1 + self._rng.uniform(-self.jitter, self.jitter)
+        return max(0.0, seconds)
+
+
+class _Stats:
+    def __init__(self):
+        self.embed_calls = 0
+        self.embedded_texts = 0
+        self.generate_calls = 0
+        self.in_flight = 0
+        self.peak_in_flight = 0
+
+
+class _Models:
+    def __init__(self, client: "FakeGeminiClient"):
+        self._client = client
+
+    def embed_content(self, model: str, contents: Any, config: Any = None) -> SimpleNamespace:
+        texts = self._client._record_embed(contents)
+        time.sleep(self._client.embed_latency.seconds())
+        return self._client._embed_response(texts, config)
+
+    def generate_content(self, model: str, contents: Any, config: Any = None) -> SimpleNamespace:
+        text = fake_questions(str(contents))
+        self._client.stats.generate_calls += 1
+        time.sleep(self._client.generate_latency.seconds(len(text) // 4))
+        return SimpleNamespace(text=text)
+
+
+class _AsyncModels:
+    def __init__(self, client: "FakeGeminiClient"):
+        self._client = client
+
+    async def embed_content(self, model: str, contents: Any, config: Any = None) -> SimpleNamespace:
+        texts = self._client._record_embed(contents)
+        await asyncio.sleep(self._client.embed_latency.seconds())
+        return self._client._embed_response(texts, config)
+
+    async def generate_content(self, model: str, contents: Any, config: Any = None) -> SimpleNamespace:
+        text = fake_questions(str(contents))
+        stats = self._client.stats
+        stats.generate_calls += 1
+        stats.in_flight += 1
+        stats.peak_in_flight = max(stats.peak_in_flight, stats.in_flight)
+        try:
+            await asyncio.sleep(self._client.generate_latency.seconds(len(text) // 4))
+        finally:
+            stats.in_flight -= 1
+        return SimpleNamespace(text=text)
+
+    async def generate_content_stream(self, model: str, contents: Any, config: Any = None):
+        text = fake_questions(str(contents))
+        pieces = [text[i : i + 64] for i in range(0, len(text), 64)]
+        latency = self._client.generate_latency
+        stats = self._client.stats
+        stats.generate_calls += 1
+
+        async def chunks():
+            stats.in_flight += 1
+            stats.peak_in_flight = max(stats.peak_in_flight, stats.in_flight)
+            try:
+                # Time to first token, then the per-token cost spread over the pieces
+                await asyncio.sleep(latency.seconds())
+                for piece in pieces:
+                    await asyncio.sleep(latency.per_token * len(piece) / 4)
+                    yield SimpleNamespace(text=piece)
+            finally:
+                stats.in_flight -= 1
+
+        return chunks()
+
+
+class FakeGeminiClient:
+    def __init__(
+        self,
+        embed_latency: float = 0.05,
+        generate_latency: float = 0.5,
+        per_token_latency: float = 0.0,
+        jitter: float = 0.0,
+        dim: Optional[int] = None,
+        seed: int = 0,
+    ):
+        from app.config import settings
+
+        self.dim = dim or settings.EMBEDDING_DIMENSION
+        self.embed_latency = _Latency(embed_latency, 0.0, jitter, seed)
+        self.generate_latency = _Latency(generate_latency, per_token_latency, jitter, seed + 1)
+        self.stats = _Stats()
+        self.models = _Models(self)
+        self.aio = SimpleNamespace(models=_AsyncModels(self))
+
+    def _record_embed(self, contents: Any) -> List[str]:
+        texts = [contents] if isinstance(contents, str) else list(contents)
+        self.stats.embed_calls += 1
+        self.stats.embedded_texts += len(texts)
+        return texts
+
+    def _embed_response(self, texts: List[str], config: Any) -> SimpleNamespace:
+        dim = getattr(config, "output_dimensionality", None) or self.dim
+        return SimpleNamespace(embeddings=[SimpleNamespace(values=fake_embedding(text, dim)) for text in texts])
+
+    def summary(self) -> Dict[str, int]:
+        return dict(vars(self.stats))
+
+
+def install(client: FakeGeminiClient) -> FakeGeminiClient:
+    """Point the embedding and generation services at `client`"""
+    from app.services import embeddings, generation
+
+    embeddings.client = client
+    generation.client = client
+    return client
@@ -0,0 +1,102 @@
+"""
+Rebuild an existing vector store at a reduced dimension and/or quantization.
+
+Every stored vector is decoded, truncated to --dim and renormalized (the same
+transform EmbeddingService applies with EMBEDDING_OUTPUT_DIMENSION), then
+added to a freshly built index. Rows keep their ids, so the metadata
+store and BM25 snapshot stay valid. The previous snapshot is kept as
+`<name>.faiss.bak`. Stop the server first, and set EMBEDDING_OUTPUT_DIMENSION
+and VECTOR_QUANTIZATION to the new values before starting it again.
+
+The default collection is migrated unless --collection names another one;
+every collection has its own index, so migrate each of them.
+
+Usage (from backend/):
+    python -m scripts.migrate_index --dim 256 --quantization int8
+    python -m scripts.migrate_index --dim 768 --index-type hnsw --quantization fp16
+    python -m scripts.migrate_index --dim 256 --quantization int8 --collection history
+"""
+import argparse
+import shutil
+from pathlib import Path
+
+import numpy as np
+
+from app.config import settings
+from app.services.collection_manager import COLLECTION_NAME, INDEX_NAME, collection_path
+from app.services.embeddings import reduce_dimension, storage_dimension
+from app.services.index_factory import (
+    INDEX_TYPES,
+    QUANTIZATIONS,
+    build_index,
+    training_threshold,
+    vectors_with_ids,
+    with_ids,
+)
+from app.services.vector_store import VectorStore
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--storage", type=Path, default=settings.STORAGE_PATH)
+    parser.add_argument("--collection", default=settings.DEFAULT_COLLECTION)
+    parser.add_argument("--index-name", default=INDEX_NAME)
+    parser.add_argument("--dim", type=int, help="New dimension (default: keep the current one)")
+    parser.add_argument("--index-type", choices=INDEX_TYPES, default=settings.VECTOR_INDEX_TYPE)
+    parser.add_argument("--quantization", choices=QUANTIZATIONS, default=settings.VECTOR_QUANTIZATION)
+    parser.add_argument("--nlist", type=int, default=settings.IVF_NLIST)
+    args = parser.parse_args()
+
+    if not COLLECTION_NAME.fullmatch(args.collection):
+        raise SystemExit(f"Invalid collection name: {args.collection!r}")
+    storage = collection_path(args.storage, args.collection)
+    if not (storage / f"{args.index_name}.faiss").exists() and not (storage / f"{args.index_name}.wal").exists():
+        raise SystemExit(f"No vector store named {args.index_name!r} in {storage}")
+
+    # Opening the store replays the WAL; flat/none keeps compaction from retraining it.
+    # The dimension only matters when there is no snapshot yet, and is the
+    # one the WAL was written with under the current settings.
+    store = VectorStore(
+        dim=storage_dimension(),
+        storage_dir=storage,
+        index_name=args.index_name,
+        index_type="flat",
+        quantization="none",
+    )
+    try:
+        if store.index_path.exists():
+            shutil.copy2(store.index_path, store.index_path.with_name(store.index_path.name + ".bak"))
+        # Fold the WAL into the index first, so it holds every vector
+        store.compact()
+        old_dim, rows = store.index.d, store.index.ntotal
+        dim = args.dim or old_dim
+        if dim > old_dim:
+            raise SystemExit(f"Cannot grow vectors from {old_dim} to {dim} dimensions")
+        ids, vectors = vectors_with_ids(store.index)
+        if dim != old_dim:
+            vectors = np.asarray(reduce_dimension(vectors, dim), dtype=np.float32)
+
+        # Like VectorStore: too few vectors to train keeps a flat buffer
+        if rows < training_threshold(args.index_type, args.nlist, args.quantization):
+            index = build_index("flat", dim, args.nlist, quantization="none")
+        else:
+            index = build_index(args.index_type, dim, args.nlist, args.quantization)
+            if not index.is_trained:
+                index.train(vectors)
+        index = with_ids(index)
+        index.add_with_ids(vectors, ids)
+
+        with store._lock:
+            store.dim = dim
+            store._swap_snapshot(index)
+        # Writes the new snapshot atomically
+        store.compact()
+    finally:
+        store.close()
+
+    print(f"Migrated {rows} vectors: {old_dim} -> {dim} dims, {args.index_type}/{args.quantization}")
+    print(f"Set EMBEDDING_OUTPUT_DIMENSION={dim if dim != settings.EMBEDDING_DIMENSION else 0} VECTOR_QUANTIZATION={args.quantization}")
+
+
+if __name__ == "__main__":
+    main()
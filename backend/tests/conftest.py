@@ -0,0 +1,52 @@
+import os
+import tempfile
+
+import pytest
+
+# Settings are read when app.config is first imported: run offline, with
+# small vectors and throwaway storage, whatever .env says
+os.environ.setdefault("GEMINI_API_KEY", "offline-tests")
+os.environ["EMBEDDING_BACKEND"] = "fake"
+os.environ["EMBEDDING_DIMENSION"] = "32"
+os.environ["EMBEDDING_OUTPUT_DIMENSION"] = "0"
+os.environ["MULTI_WORKER"] = "false"
+os.environ["STORAGE_PATH"] = tempfile.mkdtemp(prefix="tests-storage-")
+os.environ["UPLOAD_PATH"] = tempfile.mkdtemp(prefix="tests-uploads-")
+
+
+@pytest.fixture
+def open_store(tmp_path):
+    """
+    Open (or reopen) a flat, unmapped VectorStore in the test's directory.
+    Stores still open at the end are closed; `open_store.crash(store)`
+    drops one instead, losing whatever it had not written.
+    """
+    from app.services.vector_store import VectorStore
+    from tests.helpers import DIM
+
+    stores = []
+
+    def open_store(**options) -> VectorStore:
+        defaults = {
+            "dim": DIM,
+            "storage_dir": tmp_path,
+            "index_name": "test",
+            "index_type": "flat",
+            "quantization": "none",
+            "mmap": False,
+            "shared": False,
+        }
+        store = VectorStore(**{**defaults, **options})
+        stores.append(store)
+        return store
+
+    def crash(store):
+        stores.remove(store)
+        store._wal.close()
+        # Uncommitted metadata is rolled back
+        store.metadata_store.close()
+
+    open_store.crash = crash
+    yield open_store
+    for store in stores:
+        store.close()
@@ -0,0 +1,40 @@
+import random
+from typing import Any, Dict, List
+
+import numpy as np
+
+# Matches EMBEDDING_DIMENSION set in conftest
+DIM = 32
+
+
+def unit_vectors(count: int, seed: int = 0) -> np.ndarray:
+    """Random unit vectors; a row's own vector finds it first in an exact search"""
+    vectors = np.random.default_rng(seed).standard_normal((count, DIM)).astype("float32")
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def chunk_metadata(start: int, count: int, source: str = "doc.txt") -> List[Dict[str, Any]]:
+    """Metadata for rows start..start+count-1; chunk ids name their row"""
+    return [
+        {"id": f"c{row}", "text": f"chunk number {row} of {source}", "source": source}
+        for row in range(start, start + count)
+    ]
+
+
+WORDS = (
+    "river mountain senate harbour treaty legion grain merchant temple road bridge consul "
+    "province tribute colony fleet market forum aqueduct villa citizen law court scroll"
+).split()
+
+
+def passage(seed: int, length: int = 200) -> str:
+    """Random prose; passages of different seeds are not near-duplicates"""
+    rng = random.Random(seed)
+    return " ".join(rng.choice(WORDS) for _ in range(length))
+
+
+def revised(text: str) -> str:
+    """The same passage with one word in the middle changed"""
+    words = text.split()
+    words[len(words) // 2] = "revision"
+    return " ".join(words)
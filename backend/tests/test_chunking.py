@@ -0,0 +1,69 @@
+import pytest
+
+from app.services.chunking import TextChunker
+from app.services.tokenizer import get_tokenizer
+
+SENTENCES = [
+    "The Roman Republic was founded in 509 BC after the last king was expelled.",
+    "Its government balanced two consuls against the Senate and the assemblies.",
+    "Café owners in Lyon still argue about who serves the best crème brûlée — naïvely or not.",
+    "Carthage fought three wars against Rome and lost every one of them.",
+    "日本語のテキストも正しく切り出されるべきです。",
+]
+
+
+def document(paragraphs: int = 12) -> str:
+    parts = []
+    for i in range(paragraphs):
+        parts.append(f"# Section {i}\n\n" + " ".join(SENTENCES[j % len(SENTENCES)] for j in range(i, i + 6)))
+    return "\n\n".join(parts)
+
+
+@pytest.fixture(scope="module")
+def chunker():
+    return TextChunker(chunk_size=60, overlap=15, tokenizer=get_tokenizer())
+
+
+def test_spans_slice_the_original_text(chunker):
+    text = document()
+    chunks = chunker.chunk(text)
+
+    assert len(chunks) > 3
+    for chunk in chunks:
+        assert chunk.text == text[chunk.start_char : chunk.end_char]
+
+
+def test_chunks_cover_the_document_and_overlap(chunker):
+    text = document()
+    chunks = chunker.chunk(text)
+
+    assert chunks[0].start_char == 0
+    assert chunks[-1].end_char == len(text)
+    for previous, chunk in zip(chunks, chunks[1:]):
+        assert previous.start_char < chunk.start_char < previous.end_char
+
+
+def test_token_counts_respect_the_budget(chunker):
+    tokenizer = get_tokenizer()
+    for chunk in chunker.chunk(document()):
+        assert 0 < chunk.token_count <= chunker.chunk_size
+        # Counted in the document's encoding; re-encoding the slice alone may differ slightly at the edges
+        assert abs(len(tokenizer.encode(chunk.text)) - chunk.token_count) <= 2
+
+
+def test_chunks_end_at_heading_paragraph_or_sentence_boundaries(chunker):
+    text = document()
+    for chunk in chunker.chunk(text)[:-1]:
+        after = text[chunk.end_char :]
+        assert after.startswith(("\n", "#")) or chunk.text[-1] in ".。", repr(chunk.text[-40:])
+
+
+def test_short_and_empty_documents(chunker):
+    assert chunker.chunk("") == []
+    (chunk,) = chunker.chunk("A single short sentence.")
+    assert (chunk.start_char, chunk.end_char) == (0, len("A single short sentence."))
+
+
+def test_overlap_must_be_smaller_than_chunk_size():
+    with pytest.raises(ValueError):
+        TextChunker(chunk_size=50, overlap=50, tokenizer=get_tokenizer())
@@ -0,0 +1,39 @@
+import pytest
+
+from app.services.context_packing import SEPARATOR, ContextPacker
+from app.services.tokenizer import get_tokenizer
+from tests.helpers import passage
+
+
+def candidates(count: int = 6):
+    """Two documents' chunks with overlapping neighbours, best first"""
+    chunks = []
+    for doc in range(2):
+        text = passage(doc, length=600)
+        for start in range(0, count // 2 * 800, 800):
+            end = start + 1000
+            chunks.append({"text": text[start:end], "source": f"doc{doc}.txt", "start_char": start, "end_char": end})
+    return chunks
+
+
+@pytest.mark.parametrize("token_budget", [50, 300, 100_000])
+def test_baseline_covers_the_candidates_packing_chose_from(token_budget):
+    packer = ContextPacker(token_budget=token_budget, mmr_lambda=0.7, tokenizer=get_tokenizer())
+    chunks = candidates()
+
+    packed = packer.pack(chunks)
+
+    assert packed.baseline_tokens == packer.count_tokens(SEPARATOR.join(chunk["text"] for chunk in chunks))
+    assert 0 < packed.tokens <= min(token_budget, packed.baseline_tokens)
+
+
+def test_overlapping_neighbours_are_merged():
+    packer = ContextPacker(token_budget=100_000, mmr_lambda=0.7, tokenizer=get_tokenizer())
+    chunks = candidates()
+
+    packed = packer.pack(chunks)
+
+    assert len(packed.chunks) == len(chunks)
+    # Each document's overlapping chunks became one span of its text
+    assert packed.context.count(SEPARATOR) == 1
+    assert packed.tokens < packed.baseline_tokens
@@ -0,0 +1,125 @@
+import pytest
+
+from app.services.dedup import NearDuplicateDetector
+from app.services.embeddings import EmbeddingService, FakeEmbeddingBackend
+from app.services.jobs import restore_linked_chunks
+from tests.helpers import DIM, passage, revised
+
+
+@pytest.fixture
+def detector(tmp_path):
+    detector = NearDuplicateDetector(tmp_path / "dedup.sqlite3")
+    yield detector
+    detector.close()
+
+
+def index(detector, job_id, chunk_id, source, text):
+    detector.add(job_id, [(chunk_id, source, detector.signature(text))])
+
+
+def lookup(detector, text, **exclude):
+    signature = detector.signature(text)
+    return detector.find(signature, detector.bucket_keys(signature), **exclude)
+
+
+def test_near_identical_text_matches_and_distinct_text_does_not(detector):
+    original = passage(0)
+    index(detector, "job-1", "c0", "a.txt", original)
+
+    match = lookup(detector, revised(original))
+    assert match is not None
+    assert (match.chunk_id, match.source) == ("c0", "a.txt")
+    assert match.similarity >= detector.threshold
+    assert lookup(detector, passage(1)) is None
+
+
+def test_signatures_persist_for_later_jobs(tmp_path):
+    original = passage(0)
+    first = NearDuplicateDetector(tmp_path / "dedup.sqlite3")
+    index(first, "job-1", "c0", "a.txt", original)
+    first.close()
+
+    detector = NearDuplicateDetector(tmp_path / "dedup.sqlite3")
+    try:
+        assert len(detector) == 1
+        _, match = detector.session("job-2").check("c9", "b.txt", revised(original))
+        assert match is not None and match.chunk_id == "c0"
+        # A resumed run of the job that indexed the chunk does not match itself
+        _, match = detector.session("job-1").check("c9", "b.txt", revised(original))
+        assert match is None
+    finally:
+        detector.close()
+
+
+def test_earlier_revision_of_the_same_source_is_excluded(detector):
+    original = passage(0)
+    index(detector, "job-1", "c0", "a.txt", original)
+
+    assert lookup(detector, revised(original), exclude_source="a.txt") is None
+    assert lookup(detector, revised(original), exclude_source="b.txt") is not None
+
+
+def test_remove_forgets_a_source(detector):
+    original = passage(0)
+    index(detector, "job-1", "c0", "a.txt", original)
+    index(detector, "job-1", "c1", "b.txt", passage(1))
+
+    detector.remove("a.txt")
+
+    assert len(detector) == 1
+    assert lookup(detector, original) is None
+    assert lookup(detector, passage(1)).source == "b.txt"
+
+
+def test_session_matches_chunks_kept_earlier_in_the_run(detector):
+    session = detector.session("job-1")
+    original = passage(0)
+
+    _, first = session.check("c0", "a.txt", original)
+    _, second = session.check("c1", "a.txt", passage(1))
+    _, duplicate = session.check("c2", "a.txt", revised(original))
+
+    assert first is None and second is None
+    assert duplicate is not None and duplicate.chunk_id == "c0"
+    assert (session.checked, session.duplicates) == (3, 1)
+    # Nothing was persisted yet
+    assert len(detector) == 0
+
+
+def test_linked_duplicate_is_indexed_when_its_canonical_chunk_is_removed(detector, open_store):
+    store = open_store()
+    service = EmbeddingService(backend=FakeEmbeddingBackend(dim=DIM), cache=None, output_dimension=0)
+    original, copy = passage(0), revised(passage(0))
+    # A is ingested, then B, whose near-copy of A's passage is only linked
+    store.add(service.embed_texts([original]), [{"id": "a0", "text": original, "source": "a.txt"}])
+    index(detector, "job-a", "a0", "a.txt", original)
+    _, match = detector.session("job-b").check("b0", "b.txt", copy)
+    detector.add_links([({"id": "b0", "text": copy, "source": "b.txt"}, match)])
+    assert detector.links("a0", "a.txt") == [{"id": "b0", "source": "b.txt", "similarity": match.similarity}]
+
+    store.delete_source("a.txt")
+    orphaned = detector.remove("a.txt")
+
+    assert [meta["id"] for meta in orphaned] == ["b0"]
+    assert restore_linked_chunks(store, detector, service, orphaned) == 1
+    rows = store.search_rows(service.embed_texts([copy])[0], k=1)
+    assert store.get_rows(rows)[0]["text"] == copy
+    # B's passage is now the copy later revisions match
+    assert lookup(detector, original).chunk_id == "b0"
+
+
+def test_restored_duplicates_of_each_other_are_indexed_once(detector, open_store):
+    store = open_store()
+    service = EmbeddingService(backend=FakeEmbeddingBackend(dim=DIM), cache=None, output_dimension=0)
+    original = passage(0)
+    index(detector, "job-a", "a0", "a.txt", original)
+    match = lookup(detector, revised(original))
+    detector.add_links(
+        [({"id": f"{name}0", "text": revised(original), "source": f"{name}.txt"}, match) for name in ("b", "c")]
+    )
+
+    assert restore_linked_chunks(store, detector, service, detector.remove("a.txt")) == 1
+
+    assert store.ntotal == 1
+    restored = store.get_rows([0])[0]
+    assert detector.links(restored["id"], restored["source"])[0]["id"] in {"b0", "c0"}
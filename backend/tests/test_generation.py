@@ -0,0 +1,33 @@
+import asyncio
+import threading
+
+from app.services import generation
+from app.services.generation import QuizGenerator
+from benchmarks.fake_gemini import FakeGeminiClient
+
+
+def test_async_paths_count_tokens_off_the_event_loop(monkeypatch):
+    monkeypatch.setattr(generation, "client", FakeGeminiClient(generate_latency=0))
+    generator = QuizGenerator()
+    threads = []
+    count_tokens = generator.count_tokens
+
+    def recording(text):
+        threads.append(threading.get_ident())
+        return count_tokens(text)
+
+    monkeypatch.setattr(generator, "count_tokens", recording)
+
+    async def generate():
+        loop_thread = threading.get_ident()
+        result = await generator.agenerate_without_rag("Roman roads", 3)
+        events = [event async for event in generator.astream_without_rag("Roman roads", 3)]
+        return loop_thread, result, events
+
+    loop_thread, result, events = asyncio.run(generate())
+
+    assert result["metrics"]["prompt_tokens"] > 0 and result["metrics"]["completion_tokens"] > 0
+    assert events[-1][0] == "metrics" and events[-1][1]["completion_tokens"] > 0
+    # Prompt and response of each call
+    assert len(threads) == 4
+    assert loop_thread not in threads
@@ -0,0 +1,66 @@
+import sys
+
+import pytest
+
+from app.services.collection_manager import INDEX_NAME, CollectionManager, collection_path
+from app.services.embeddings import EmbeddingService
+from app.services.vector_store import VectorStore
+from scripts import migrate_index
+from tests.helpers import DIM, chunk_metadata, unit_vectors
+
+
+@pytest.fixture
+def collections(tmp_path):
+    """Storage with 20 rows in the default collection and 10 in 'history'"""
+    manager = CollectionManager(tmp_path, EmbeddingService())
+    with manager.use() as default:
+        default.store.add(unit_vectors(20), chunk_metadata(0, 20))
+    with manager.use("history", create=True) as history:
+        history.store.add(unit_vectors(10, seed=1), chunk_metadata(0, 10, source="history.txt"))
+    manager.close()
+    return tmp_path
+
+
+def migrate(monkeypatch, *args):
+    monkeypatch.setattr(sys, "argv", ["migrate_index", *args])
+    migrate_index.main()
+
+
+def reopen(storage_dir, dim=DIM) -> VectorStore:
+    return VectorStore(dim=dim, storage_dir=storage_dir, index_name=INDEX_NAME, mmap=False, shared=False)
+
+
+def test_default_collection_is_migrated_without_naming_the_index(collections, monkeypatch):
+    migrate(monkeypatch, "--storage", str(collections), "--dim", "16")
+
+    store = reopen(collections, dim=16)
+    try:
+        assert store.index.d == 16
+        assert store.ntotal == 20
+        assert store.get_rows([19])[0]["id"] == "c19"
+    finally:
+        store.close()
+    # Named collections are left alone
+    history = reopen(collection_path(collections, "history"))
+    try:
+        assert history.dim == DIM and history.ntotal == 10
+    finally:
+        history.close()
+
+
+def test_named_collection_is_migrated(collections, monkeypatch):
+    migrate(monkeypatch, "--storage", str(collections), "--collection", "history", "--dim", "16")
+
+    store = reopen(collection_path(collections, "history"), dim=16)
+    try:
+        assert store.index.d == 16
+        assert store.ntotal == 10
+        assert store.get_rows([0])[0]["source"] == "history.txt"
+    finally:
+        store.close()
+
+
+@pytest.mark.parametrize("collection", ["missing", "../escape"])
+def test_missing_or_invalid_collection_exits(collections, monkeypatch, collection):
+    with pytest.raises(SystemExit):
+        migrate(monkeypatch, "--storage", str(collections), "--collection", collection, "--dim", "16")
@@ -0,0 +1,58 @@
+import pytest
+
+from app import main
+from app.config import settings
+from app.schema import QuizGenerationRequest
+from app.services.quiz_cache import SemanticQuizCache
+from tests.helpers import unit_vectors
+
+TOPIC = unit_vectors(1, seed=7)[0].tolist()
+QUESTIONS = [{"category": "Rome", "clue": "Its roads all led here", "answer": "What is Rome?"}]
+
+
+@pytest.fixture(autouse=True)
+def quiz_cache(monkeypatch):
+    cache = SemanticQuizCache(similarity_threshold=0.9, ttl_seconds=600, max_entries=10)
+    monkeypatch.setattr(main, "quiz_cache", cache)
+    return cache
+
+
+def request(**fields) -> QuizGenerationRequest:
+    return QuizGenerationRequest(topic="Roman roads", **fields)
+
+
+def cache_quiz(cached: QuizGenerationRequest):
+    main.store_cached_quiz(cached, TOPIC, None, 0, QUESTIONS, {"total_tokens": 100})
+
+
+def lookup(lookup_request: QuizGenerationRequest):
+    return main.lookup_cached_quiz(lookup_request, TOPIC, 0.0, None)
+
+
+@pytest.mark.parametrize(
+    "cached, other",
+    [
+        ({"retrieval_mode": "hybrid"}, {"retrieval_mode": "vector"}),
+        ({"retrieval_mode": "vector"}, {"retrieval_mode": "lexical"}),
+        ({"nprobe": 4}, {"nprobe": 64}),
+        ({"ef_search": 16}, {}),
+    ],
+)
+def test_rag_quiz_only_serves_the_same_retrieval_settings(cached, other):
+    cache_quiz(request(**cached))
+
+    assert lookup(request(**other)) is None
+    questions, metrics = lookup(request(**cached))
+    assert questions == QUESTIONS and metrics["cache_hit"]
+
+
+def test_default_mode_matches_the_explicit_setting():
+    cache_quiz(request())
+
+    assert lookup(request(retrieval_mode=settings.RETRIEVAL_MODE)) is not None
+
+
+def test_retrieval_settings_do_not_split_non_rag_quizzes():
+    cache_quiz(request(use_rag=False, retrieval_mode="vector"))
+
+    assert lookup(request(use_rag=False, retrieval_mode="lexical", nprobe=8)) is not None
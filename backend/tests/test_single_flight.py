@@ -0,0 +1,162 @@
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from app.services import generation
+from app.services.embeddings import EmbeddingService, FakeEmbeddingBackend
+from app.services.generation import QuizGenerator
+from app.services.metrics import MetricsTracker
+from app.services.single_flight import SingleFlight
+from benchmarks.fake_gemini import FakeGeminiClient
+
+# Long enough for every concurrent caller to arrive while the first is in flight
+LATENCY = 0.2
+
+
+def slow(value, calls):
+    def call():
+        calls.append(1)
+        time.sleep(LATENCY)
+        return value
+
+    return call
+
+
+def test_concurrent_threads_share_one_call():
+    flight, calls = SingleFlight("test"), []
+    with ThreadPoolExecutor(8) as pool:
+        results = list(pool.map(lambda _: flight.do("key", slow("value", calls)), range(8)))
+
+    assert len(calls) == 1
+    assert sorted(coalesced for _, coalesced in results) == [False] + [True] * 7
+    assert all(value == "value" for value, _ in results)
+    assert not flight._calls
+
+
+def test_leader_error_is_raised_in_every_waiter():
+    flight, calls, errors = SingleFlight("test"), [], []
+
+    def fail():
+        calls.append(1)
+        time.sleep(LATENCY)
+        raise RuntimeError("upstream down")
+
+    def caller():
+        try:
+            flight.do("key", fail)
+        except RuntimeError as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=caller) for _ in range(5)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(calls) == 1
+    assert len(errors) == 5
+    # Later callers start a new call
+    assert flight.do("key", lambda: "retried") == ("retried", False)
+
+
+def test_waiters_retry_when_the_leader_is_cancelled():
+    flight, calls = SingleFlight("test"), []
+
+    async def call():
+        calls.append(1)
+        await asyncio.sleep(LATENCY)
+        return "value"
+
+    async def scenario():
+        leader = asyncio.create_task(flight.ado("key", call))
+        await asyncio.sleep(0.05)
+        waiter = asyncio.create_task(flight.ado("key", call))
+        await asyncio.sleep(0.05)
+        leader.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await leader
+        return await waiter
+
+    assert asyncio.run(scenario()) == ("value", False)
+    assert len(calls) == 2
+    assert not flight._calls
+
+
+def test_cancelled_waiter_does_not_cancel_the_call():
+    flight, calls = SingleFlight("test"), []
+
+    async def call():
+        calls.append(1)
+        await asyncio.sleep(LATENCY)
+        return "value"
+
+    async def scenario():
+        leader = asyncio.create_task(flight.ado("key", call))
+        await asyncio.sleep(0.05)
+        waiter = asyncio.create_task(flight.ado("key", call))
+        await asyncio.sleep(0.05)
+        waiter.cancel()
+        return await leader
+
+    assert asyncio.run(scenario()) == ("value", False)
+    assert len(calls) == 1
+
+
+def test_embedding_service_coalesces_identical_texts():
+    metrics = MetricsTracker()
+    backend = FakeEmbeddingBackend(dim=8, latency=LATENCY)
+    service = EmbeddingService(
+        backend=backend, cache=None, output_dimension=0, in_flight=SingleFlight("embed", record=metrics.record_coalescing)
+    )
+
+    with ThreadPoolExecutor(8) as pool:
+        results = list(pool.map(lambda _: service.embed_texts(["alpha", "beta"]), range(8)))
+
+    assert backend.calls == 1
+    assert all(result == [backend.embed_text("alpha"), backend.embed_text("beta")] for result in results)
+    assert metrics.get_coalescing_stats()["embed"] == {"calls": 2, "coalesced": 14, "coalesced_rate": 14 / 16}
+
+    async def burst():
+        return await asyncio.gather(*(service.aembed_texts(["gamma"]) for _ in range(6)))
+
+    results = asyncio.run(burst())
+    assert backend.calls == 2
+    assert all(result == [backend.embed_text("gamma")] for result in results)
+
+
+def test_quiz_generator_coalesces_identical_generations(monkeypatch):
+    fake = FakeGeminiClient(generate_latency=LATENCY)
+    monkeypatch.setattr(generation, "client", fake)
+    metrics = MetricsTracker()
+    generator = QuizGenerator(in_flight=SingleFlight("llm", record=metrics.record_coalescing))
+
+    async def burst():
+        return await asyncio.gather(*(generator.agenerate_without_rag("Roman roads", 3) for _ in range(5)))
+
+    results = asyncio.run(burst())
+
+    assert fake.stats.generate_calls == 1
+    assert [result["metrics"]["coalesced"] for result in results].count(False) == 1
+    assert all(result["questions"] == results[0]["questions"] for result in results)
+    # Callers annotate their own metrics
+    assert len({id(result["metrics"]) for result in results}) == 5
+    assert metrics.get_coalescing_stats()["llm"]["coalesced"] == 4
+
+
+def test_coalescing_metrics_merge_and_export():
+    metrics = MetricsTracker()
+    metrics.record_coalescing("embed", 3, 1)
+    metrics.record_coalescing("llm", 1, 4)
+    merged = MetricsTracker()
+    merged.merge_state(metrics.to_state())
+    merged.merge_state(metrics.to_state())
+
+    stats = merged.get_coalescing_stats()
+    assert stats["embed"] == {"calls": 6, "coalesced": 2, "coalesced_rate": 0.25}
+    assert stats["llm"]["coalesced_rate"] == 0.8
+    lines = merged.to_prometheus().splitlines()
+    assert 'quiz_upstream_calls_total{kind="llm",result="coalesced"} 8' in lines
+    assert 'quiz_upstream_calls_total{kind="embed",result="called"} 6' in lines
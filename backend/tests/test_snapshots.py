@@ -0,0 +1,108 @@
+import threading
+
+import faiss
+import numpy as np
+
+from app.services.index_factory import POINTS_PER_CENTROID, unwrap
+from tests.helpers import chunk_metadata, unit_vectors
+
+
+def exact_rows(vectors: np.ndarray, query: np.ndarray, k: int) -> list:
+    return np.argsort(((vectors - query) ** 2).sum(axis=1), kind="stable")[:k].tolist()
+
+
+def test_delta_rows_are_searchable_before_save(open_store):
+    vectors = unit_vectors(50)
+    store = open_store()
+    store.add(vectors[:30], chunk_metadata(0, 30))
+    store.save()
+    store.compact()
+    store.add(vectors[30:], chunk_metadata(30, 20))
+
+    assert store.index.ntotal == 30
+    assert store.ntotal == 50
+    # Index and delta hits merge into the same order an exact search gives
+    for query in unit_vectors(5, seed=1):
+        assert store.search_rows(query.tolist(), k=10) == exact_rows(vectors, query, 10)
+    assert store.search_rows(vectors[42].tolist(), k=1) == [42]
+
+
+def test_published_snapshot_is_unaffected_by_later_writes(open_store):
+    vectors = unit_vectors(40)
+    store = open_store()
+    store.add(vectors[:20], chunk_metadata(0, 20))
+    snapshot = store._snapshot
+
+    store.add(vectors[20:], chunk_metadata(20, 20))
+    store.delete([3])
+    store.save()
+    store.compact()
+
+    assert snapshot.ntotal == 20
+    rows = snapshot.search(vectors[25:26], k=5)[0].tolist()
+    assert all(row < 20 for row in rows)
+    assert snapshot.search(vectors[3:4], k=1)[0].tolist() == [3]
+
+
+def test_tombstoned_delta_rows_are_excluded(open_store):
+    vectors = unit_vectors(20)
+    store = open_store()
+    store.add(vectors, chunk_metadata(0, 20))
+    store.delete([5, 6])
+
+    assert store.index.ntotal == 0
+    rows = store.search_rows(vectors[5].tolist(), k=20)
+    assert len(rows) == 18
+    assert not {5, 6} & set(rows)
+
+
+def test_readers_never_see_rows_without_metadata(open_store):
+    vectors = unit_vectors(400)
+    store = open_store()
+    store.add(vectors[:50], chunk_metadata(0, 50))
+    done = threading.Event()
+    errors = []
+
+    def reader(seed):
+        rng = np.random.default_rng(seed)
+        while not done.is_set():
+            query = vectors[rng.integers(0, 400)]
+            rows = store.search_rows(query.tolist(), k=5)
+            metadatas = store.get_rows(rows)
+            if [meta["id"] for meta in metadatas] != [f"c{row}" for row in rows]:
+                errors.append((rows, metadatas))
+
+    readers = [threading.Thread(target=reader, args=(seed,)) for seed in range(4)]
+    for thread in readers:
+        thread.start()
+    try:
+        for start in range(50, 400, 25):
+            store.add(vectors[start : start + 25], chunk_metadata(start, 25))
+            if start % 100 == 0:
+                store.save()
+                store.compact()
+    finally:
+        done.set()
+        for thread in readers:
+            thread.join()
+
+    assert not errors
+    assert store.search_rows(vectors[399].tolist(), k=1) == [399]
+
+
+def test_ivf_index_is_trained_by_compaction(open_store):
+    nlist = 4
+    count = nlist * POINTS_PER_CENTROID + 20
+    vectors = unit_vectors(count)
+    store = open_store(index_type="ivf_flat", nlist=nlist)
+    store.add(vectors, chunk_metadata(0, count))
+    store.save()
+
+    # Too few vectors to train until compaction folds them in
+    assert isinstance(unwrap(store.index), faiss.IndexFlat)
+    store.compact()
+
+    assert isinstance(unwrap(store.index), faiss.IndexIVFFlat)
+    assert store.index.ntotal == count
+    for row in (0, 77, count - 1):
+        assert store.search_rows(vectors[row].tolist(), k=1, nprobe=nlist) == [row]
@@ -0,0 +1,42 @@
+from app.services.collection_manager import CollectionManager
+from app.services.embeddings import EmbeddingService
+from app.services.quiz_cache import SemanticQuizCache
+from tests.helpers import chunk_metadata, unit_vectors
+
+TOPIC = unit_vectors(1, seed=99)[0].tolist()
+QUIZ = {"questions": [{"question": "Who?"}]}
+
+
+def test_every_change_gets_a_new_version(open_store):
+    store = open_store()
+    seen = {store.version}
+    store.add(unit_vectors(5), chunk_metadata(0, 5))
+    seen.add(store.version)
+    store.delete_source("doc.txt")
+    seen.add(store.version)
+    other = open_store(index_name="other")
+    seen.add(other.version)
+
+    assert len(seen) == 4
+
+
+def test_reopened_collection_does_not_repeat_a_version(tmp_path):
+    cache = SemanticQuizCache(similarity_threshold=0.9, ttl_seconds=600, max_entries=10)
+    # Nothing fits the budget: every collection is closed as soon as it is released
+    manager = CollectionManager(tmp_path, EmbeddingService(), memory_budget_bytes=0)
+    try:
+        with manager.use() as collection:
+            collection.store.add(unit_vectors(1), chunk_metadata(0, 1))
+            cached_version = collection.store.version
+            cache.put(TOPIC, 5, True, cached_version, QUIZ, collection.name)
+            assert cache.lookup(TOPIC, 5, True, cached_version, collection.name) is not None
+        assert manager.evictions == 1
+
+        # The same number of changes after reopening must not reach the cached version
+        with manager.use() as collection:
+            collection.store.add(unit_vectors(1, seed=1), chunk_metadata(1, 1))
+            assert collection.store.ntotal == 2
+            assert collection.store.version != cached_version
+            assert cache.lookup(TOPIC, 5, True, collection.store.version, collection.name) is None
+    finally:
+        manager.close()
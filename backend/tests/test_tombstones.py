@@ -0,0 +1,148 @@
+import time
+
+import pytest
+
+from app.config import settings
+from app.main import delete_source
+from app.services.collection_manager import CollectionManager
+from app.services.embeddings import EmbeddingService
+from app.services.ingestion import file_content_hash
+from app.services.jobs import IngestionJobManager
+from tests.helpers import chunk_metadata, passage, revised, unit_vectors
+
+
+@pytest.fixture(autouse=True)
+def manual_compaction(monkeypatch):
+    # Deletes alone never trigger a background compaction here
+    monkeypatch.setattr(settings, "VECTOR_STORE_TOMBSTONE_RATIO", 2.0)
+
+
+def two_sources(store):
+    """Rows 0-9 from a.txt (mentioning aqueducts), 10-39 from b.txt; returns the vectors"""
+    vectors = unit_vectors(40)
+    store.add(vectors[:10], [{**meta, "text": meta["text"] + " aqueduct"} for meta in chunk_metadata(0, 10, "a.txt")])
+    store.add(vectors[10:], chunk_metadata(10, 30, "b.txt"))
+    return vectors
+
+
+def test_deleted_rows_disappear_from_searches_at_once(open_store):
+    store = open_store()
+    vectors = two_sources(store)
+    store.save()
+    store.compact()
+    assert set(store.lexical_search_rows("aqueduct", k=20)) == set(range(10))
+
+    assert store.delete_source("a.txt") == 10
+
+    assert not store.has_source("a.txt")
+    assert store.lexical_search_rows("aqueduct", k=20) == []
+    for row in (0, 5, 9):
+        assert not set(store.search_rows(vectors[row].tolist(), k=40)) & set(range(10))
+    assert store.search_rows(vectors[20].tolist(), k=1) == [20]
+
+
+def test_rows_are_purged_only_by_compaction(open_store):
+    store = open_store()
+    vectors = two_sources(store)
+    store.save()
+    store.delete_source("a.txt")
+
+    assert store.ntotal == 40
+    store.compact()
+
+    assert store.ntotal == 30
+    assert store.index.ntotal == 30
+    assert not store._tombstones
+    assert store.search_rows(vectors[25].tolist(), k=1) == [25]
+    # Rows are never renumbered or reused
+    assert store.next_row == 40
+    store.add(unit_vectors(1, seed=1), chunk_metadata(40, 1, "c.txt"))
+    assert store.source_chunks("c.txt") == [("c40", 40)]
+
+
+def test_deletes_survive_a_reopen_before_compaction(open_store):
+    store = open_store()
+    vectors = two_sources(store)
+    store.save()
+    store.delete_source("a.txt")
+    store.close()
+
+    reopened = open_store()
+
+    assert not reopened.has_source("a.txt")
+    assert reopened.source_chunks("b.txt")[0] == ("c10", 10)
+    assert reopened.lexical_search_rows("aqueduct", k=20) == []
+    assert not set(reopened.search_rows(vectors[3].tolist(), k=40)) & set(range(10))
+    reopened.compact()
+    assert reopened.ntotal == 30
+
+
+@pytest.fixture
+def ingestion(tmp_path):
+    """Collections and a running job manager that links near-duplicates, in the test's directory"""
+    embedding_service = EmbeddingService()
+    collections = CollectionManager(tmp_path / "storage", embedding_service)
+    jobs = IngestionJobManager(collections, embedding_service, tmp_path / "jobs", dedup_mode="link", shared=False)
+    jobs.start()
+    yield collections, jobs
+    jobs.stop()
+    collections.close()
+
+
+def upload(jobs, path, text):
+    path.write_text(text, encoding="utf-8")
+    file_info = {"filename": path.name, "path": str(path), "content_hash": file_content_hash(path), "skip": False}
+    job = jobs.submit([file_info])
+    deadline = time.time() + 10
+    while job.status not in ("completed", "failed"):
+        assert time.time() < deadline
+        time.sleep(0.02)
+    assert job.status == "completed", job.error
+    return job
+
+
+def revision_rows(collection):
+    # Only the revised copy of the passage contains the word
+    return collection.store.get_rows(collection.store.lexical_search_rows("revision"))
+
+
+def test_deleting_a_source_indexes_its_linked_duplicates(ingestion, tmp_path):
+    collections, jobs = ingestion
+    first, second = tmp_path / "first.md", tmp_path / "second.md"
+    upload(jobs, first, passage(0))
+    assert upload(jobs, second, revised(passage(0))).duplicates == 1
+
+    with collections.use() as collection:
+        assert not collection.store.has_source(str(second))
+        _, deleted = delete_source(collection, str(first))
+
+        assert deleted == 1
+        assert collection.store.has_source(str(second))
+        assert [meta["source"] for meta in revision_rows(collection)] == [str(second)]
+
+
+def test_replacing_a_source_indexes_duplicates_of_its_dropped_chunks(ingestion, tmp_path):
+    collections, jobs = ingestion
+    first, second = tmp_path / "first.md", tmp_path / "second.md"
+    upload(jobs, first, passage(0))
+    upload(jobs, second, revised(passage(0)))
+
+    assert upload(jobs, first, passage(1)).removed == 1
+
+    with collections.use() as collection:
+        assert [meta["source"] for meta in revision_rows(collection)] == [str(second)]
+
+
+def test_links_of_a_replaced_source_are_forgotten(ingestion, tmp_path):
+    collections, jobs = ingestion
+    first, second = tmp_path / "first.md", tmp_path / "second.md"
+    upload(jobs, first, passage(0))
+    upload(jobs, second, revised(passage(0)))
+    # The new upload no longer has the duplicate
+    upload(jobs, second, passage(2))
+
+    with collections.use() as collection:
+        delete_source(collection, str(first))
+
+        assert revision_rows(collection) == []
+        assert len(collection.store.source_chunks(str(second))) == 1
@@ -0,0 +1,122 @@
+import shutil
+
+import numpy as np
+
+from app.services.wal import WriteAheadLog
+from tests.helpers import chunk_metadata, unit_vectors
+
+
+def test_replay_returns_appended_records(tmp_path):
+    wal = WriteAheadLog(tmp_path / "test.wal")
+    first, second = unit_vectors(3), unit_vectors(2, seed=1)
+    wal.append(0, first, {})
+    wal.append(3, second, {"files": {"abc": "doc.txt"}})
+    wal.close()
+
+    records = list(WriteAheadLog(tmp_path / "test.wal").replay())
+
+    assert [(start, payload) for start, _, payload in records] == [(0, {}), (3, {"files": {"abc": "doc.txt"}})]
+    np.testing.assert_array_equal(records[0][1], first)
+    np.testing.assert_array_equal(records[1][1], second)
+
+
+def test_torn_tail_is_truncated_and_appends_continue(tmp_path):
+    path = tmp_path / "test.wal"
+    wal = WriteAheadLog(path)
+    size = wal.append(0, unit_vectors(3), {})
+    wal.close()
+    # A crash halfway through the next record
+    with open(path, "ab") as f:
+        f.write(b"WAL1" + b"\x00" * 20)
+
+    assert [start for start, _, _ in WriteAheadLog(path).replay()] == [0]
+    assert path.stat().st_size == size
+
+    wal = WriteAheadLog(path)
+    wal.append(3, unit_vectors(2), {})
+    wal.close()
+    assert [start for start, _, _ in WriteAheadLog(path).replay()] == [0, 3]
+
+
+def test_reader_does_not_repair(tmp_path):
+    path = tmp_path / "test.wal"
+    wal = WriteAheadLog(path)
+    wal.append(0, unit_vectors(3), {})
+    wal.close()
+    with open(path, "ab") as f:
+        f.write(b"WAL1")
+    size = path.stat().st_size
+
+    assert len(list(WriteAheadLog(path).replay(repair=False))) == 1
+    assert path.stat().st_size == size
+
+
+def test_saved_rows_are_replayed_on_reopen(open_store):
+    vectors = unit_vectors(50)
+    store = open_store()
+    store.add(vectors, chunk_metadata(0, 50))
+    store.save()
+    store.close()
+
+    reopened = open_store()
+
+    # Still in the WAL, not in a snapshot file
+    assert not reopened.index_path.exists()
+    assert reopened.ntotal == 50
+    assert reopened.search_rows(vectors[42].tolist(), k=1) == [42]
+    assert reopened.get_rows([42])[0]["id"] == "c42"
+
+
+def test_rows_without_durable_vectors_are_dropped(open_store):
+    vectors = unit_vectors(30)
+    store = open_store()
+    store.add(vectors[:20], chunk_metadata(0, 20))
+    store.save()
+    store.add(vectors[20:], chunk_metadata(20, 10))
+    # Metadata committed, then the process dies before the vectors reach the WAL
+    store.metadata_store.commit()
+    open_store.crash(store)
+
+    reopened = open_store()
+
+    assert reopened.ntotal == 20
+    assert reopened.next_row == 20
+    reopened.add(vectors[20:], chunk_metadata(20, 10))
+    assert reopened.search_rows(vectors[25].tolist(), k=1) == [25]
+    assert reopened.get_rows([25])[0]["id"] == "c25"
+
+
+def test_replay_skips_rows_already_in_the_snapshot(open_store, tmp_path):
+    vectors = unit_vectors(40)
+    store = open_store()
+    store.add(vectors, chunk_metadata(0, 40))
+    store.save()
+    wal_copy = tmp_path / "copy.wal"
+    shutil.copy(store.wal_path, wal_copy)
+    store.compact()
+    store.close()
+    # A crash after the snapshot was written but before the rotated WAL was removed
+    shutil.copy(wal_copy, store.compacting_wal_path)
+
+    reopened = open_store()
+
+    assert reopened.ntotal == 40
+    assert reopened.index.ntotal == 40
+    assert reopened.search_rows(vectors[7].tolist(), k=2)[0] == 7
+
+
+def test_compaction_folds_the_wal_into_the_snapshot(open_store):
+    vectors = unit_vectors(60)
+    store = open_store()
+    store.add(vectors[:40], chunk_metadata(0, 40))
+    store.save()
+    store.compact()
+    store.add(vectors[40:], chunk_metadata(40, 20))
+    store.save()
+    store.close()
+
+    reopened = open_store()
+
+    assert reopened.index.ntotal == 40
+    assert reopened.ntotal == 60
+    assert [reopened.search_rows(vectors[row].tolist(), k=1)[0] for row in (3, 55)] == [3, 55]
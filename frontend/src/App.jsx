@@ -1,6 +1,7 @@
 import React, { useState, useCallback, useEffect } from 'react';
 import { useDropzone } from 'react-dropzone';
 import MetricsDisplay from './components/MetricsDisplay';
+import { waitForJob } from './api';
 import './App.css';
 
 // Animated dots component
@@ -76,11 +77,12 @@ function App() {
       const data = await response.json();
 
       if (response.ok) {
+        const job = await waitForJob(data.job_id);
         setUploadStage('generating');
         setUploadStatus({
           success: true,
           message: 'File Processed successfully',
-          details: `${data.num_chunks} chunks from ${data.files_processed.length} file(s)`
+          details: `${job.num_chunks} chunks from ${data.files_queued.length} file(s)`
         });
 
         // 2. Generate with RAG
@@ -0,0 +1,11 @@
+// Poll a background ingestion job until it finishes
+export async function waitForJob(jobId) {
+  while (true) {
+    const response = await fetch(`http://localhost:8000/jobs/${jobId}`);
+    const job = await response.json();
+    if (!response.ok) throw new Error(job.detail || 'Could not fetch job status');
+    if (job.status === 'completed') return job;
+    if (job.status === 'failed') throw new Error(job.error || 'Ingestion failed');
+    await new Promise(resolve => setTimeout(resolve, 1000));
+  }
+}
@@ -1,5 +1,6 @@
 import React, { useCallback } from 'react';
 import { useDropzone } from 'react-dropzone';
+import { waitForJob } from '../api';
 import './DocumentUpload.css';
 
 const DocumentUpload = ({ onUploadComplete }) => {
@@ -24,12 +25,13 @@ const DocumentUpload = ({ onUploadComplete }) => {
             const data = await response.json();
 
             if (response.ok) {
+                const job = await waitForJob(data.job_id);
                 setUploadStatus({
                     success: true,
                     message: data.message,
-                    details: `Processed ${data.num_chunks} chunks from ${data.files_processed.length} file(s)`
+                    details: `Processed ${job.num_chunks} chunks from ${data.files_queued.length} file(s)`
                 });
-                onUploadComplete(data);
+                onUploadComplete(job);
             } else {
                 setUploadStatus({
                     success: false,